@@ -1,133 +1,14 @@
-import sounddevice as sd
-import soundfile as sf
 import tkinter as tk
 from tkinter import filedialog
-import numpy as np
 import os
-import json
-import nam_binding
-from effects.chorus.chorus_effect import ChorusEffect
-from effects.drive.drive_effect import DriveEffect
-from effects.delay.delay_effect import DelayEffect
-from effects.reverb.reverb_effect import ReverbEffect
-
-class AudioPlayer:
+from engine import AudioEngine
+
+class AudioPlayer(AudioEngine):
+    """The engine with the file dialogs used by the GUI."""
+
     def __init__(self):
-        self.audio_data = None
-        self.sample_rate = 44100  # Standard sample rate for audio
-        self.playing = False
-        self.stream = None
+        super().__init__()
         self.last_directory = os.path.expanduser('~')
-        self.effect_chain = []
-        self.input_stream = None
-        self.output_stream = None
-        self.is_monitoring = False
-        
-        # Initialize effects
-        self.chorus = ChorusEffect(self.sample_rate)
-        self.drive = DriveEffect(self.sample_rate)
-        self.nam_processor = None
-        self.nam_pedal_processor = None
-        self.ir_processor = None
-        self.delay = DelayEffect(self.sample_rate)
-        self.reverb = ReverbEffect(self.sample_rate)
-        
-        # Effect states
-        self.effect_states = {
-            'chorus': False,
-            'drive': False,
-            'nam': False,
-            'nam_pedal': False,
-            'ir': False,
-            'delay': False,
-            'reverb': False
-        }
-
-        # Effect parameters
-        self.effect_params = {
-            'chorus': {
-                'rate': {'value': 1.0, 'min': 0.1, 'max': 5.0, 'label': 'Rate (Hz)'},
-                'depth': {'value': 0.002, 'min': 0.0001, 'max': 0.01, 'label': 'Depth (s)'},
-                'mix': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
-            },
-            'drive': {
-                'drive': {'value': 1.0, 'min': 1.0, 'max': 10.0, 'label': 'Drive'},
-                'tone': {'value': 0.7, 'min': 0.0, 'max': 1.0, 'label': 'Tone'},
-                'level': {'value': 1.0, 'min': 0.0, 'max': 1.0, 'label': 'Level'}
-            },
-            'delay': {
-                'delay_time': {'value': 0.3, 'min': 0.05, 'max': 1.0, 'label': 'Time (s)'},
-                'feedback': {'value': 0.3, 'min': 0.0, 'max': 0.9, 'label': 'Feedback'},
-                'mix': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
-            },
-            'reverb': {
-                'room_size': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Room Size'},
-                'damping': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Damping'},
-                'mix': {'value': 0.3, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
-            },
-            'ir': {
-                'volume': {'value': 1.0, 'min': 0.0, 'max': 2.0, 'label': 'Volume'}
-            }
-        }
-
-    def get_effect_parameters(self, effect_name):
-        """Get the parameters for a specific effect."""
-        return self.effect_params.get(effect_name, {})
-
-    def update_effect_parameter(self, effect_name, param_name, value):
-        """Update a parameter value for a specific effect."""
-        if effect_name not in self.effect_params:
-            return
-        
-        if param_name not in self.effect_params[effect_name]:
-            return
-        
-        # Update the parameter value
-        self.effect_params[effect_name][param_name]['value'] = value
-        
-        # Update the effect instance
-        if effect_name == 'chorus':
-            setattr(self.chorus, param_name, value)
-        elif effect_name == 'drive':
-            setattr(self.drive, param_name, value)
-        elif effect_name == 'delay':
-            setattr(self.delay, param_name, value)
-        elif effect_name == 'reverb':
-            setattr(self.reverb, param_name, value)
-
-    def is_nam_file(self, file_path):
-        return file_path.lower().endswith('.nam')
-
-    def is_ir_file(self, file_path):
-        return file_path.lower().endswith('.wav')
-
-    def load_ir_file(self, file_path):
-        try:
-            self.ir_processor = nam_binding.IRProcessor(file_path, self.sample_rate)
-            self.add_effect('IR', self.ir_processor)
-            print(f'IR file loaded: {file_path}')
-            return True
-        except Exception as e:
-            print(f'Error loading IR file: {e}')
-            return False
-
-    def load_nam_file(self, file_path, is_pedal=False):
-        try:
-            # Load NAM file using C++ implementation
-            if is_pedal:
-                self.nam_pedal_processor = nam_binding.NAMProcessor(file_path)
-                self.nam_pedal_processor.reset(self.sample_rate, 1024)  # Initialize with current sample rate
-                self.add_effect('NAM Pedal', self.nam_pedal_processor)
-                print(f'NAM pedal file loaded: {file_path}')
-            else:
-                self.nam_processor = nam_binding.NAMProcessor(file_path)
-                self.nam_processor.reset(self.sample_rate, 1024)  # Initialize with current sample rate
-                self.add_effect('NAM', self.nam_processor)
-                print(f'NAM file loaded: {file_path}')
-            return True
-        except Exception as e:
-            print(f'Error loading NAM file: {e}')
-            return False
 
     def load_file(self):
         file_path = filedialog.askopenfilename(
@@ -145,168 +26,14 @@ class AudioPlayer:
                 
                 if self.is_nam_file(file_path):
                     return self.load_nam_file(file_path)
-                elif self.is_ir_file(file_path):
-                    if not hasattr(self, 'audio_data') or self.audio_data is None:
-                        return self.load_ir_file(file_path)
-                    else:
-                        self.audio_data, self.sample_rate = sf.read(file_path)
-                        print(f'Audio file loaded: {file_path}')
-                        print(f'Sample rate: {self.sample_rate} Hz')
-                        return True
-                
-                self.audio_data, self.sample_rate = sf.read(file_path)
-                print(f'Audio file loaded: {file_path}')
-                print(f'Sample rate: {self.sample_rate} Hz')
-                return True
+                elif self.is_ir_file(file_path) and self.playback is None:
+                    return self.load_ir_file(file_path)
+                return self.open_audio_file(file_path)
             except Exception as e:
                 print(f'Error loading file: {e}')
                 return False
         return False
 
-    def add_effect(self, effect_name, effect):
-        """Add an effect to the signal chain."""
-        self.effect_chain.append({'name': effect_name, 'effect': effect})
-        print(f'Added {effect_name} to the signal chain')
-
-    def remove_effect(self, effect_name):
-        """Remove an effect from the signal chain by name."""
-        self.effect_chain = [e for e in self.effect_chain if e['name'] != effect_name]
-        print(f'Removed {effect_name} from the signal chain')
-
-    def clear_effects(self):
-        """Remove all effects from the signal chain."""
-        self.effect_chain.clear()
-        print('Cleared all effects from the signal chain')
-
-    def process_audio(self, audio_input):
-        try:
-            processed_audio = audio_input.astype(np.float32)
-            
-            # Process through effects in specified order
-            if self.effect_states['chorus']:
-                processed_audio = self.chorus.process(processed_audio)
-            if self.effect_states['drive']:
-                processed_audio = self.drive.process(processed_audio)
-            if self.effect_states['nam_pedal'] and self.nam_pedal_processor:
-                processed_audio = self.nam_pedal_processor.process(processed_audio)
-            if self.effect_states['nam'] and self.nam_processor:
-                processed_audio = self.nam_processor.process(processed_audio)
-            if self.effect_states['ir'] and self.ir_processor:
-                processed_audio = self.ir_processor.process(processed_audio)
-                # Apply IR volume control
-                ir_volume = self.effect_params['ir']['volume']['value']
-                processed_audio = processed_audio * ir_volume
-            if self.effect_states['delay']:
-                processed_audio = self.delay.process(processed_audio)
-            if self.effect_states['reverb']:
-                processed_audio = self.reverb.process(processed_audio)
-                
-            return processed_audio
-        except Exception as e:
-            print(f'Error in audio processing: {e}')
-            return audio_input
-
-    def toggle_effect(self, effect_name):
-        """Toggle the state of an effect."""
-        self.effect_states[effect_name] = not self.effect_states[effect_name]
-        print(f'{effect_name.capitalize()} effect: {"ON" if self.effect_states[effect_name] else "OFF"}')
-
-    def play(self):
-        if self.audio_data is None:
-            print('No audio file loaded')
-            return
-
-        if self.playing:
-            print('Already playing')
-            return
-
-        def callback(outdata, frames, time, status):
-            if status:
-                print(status)
-            if len(self.audio_data) > 0:
-                if len(self.audio_data.shape) == 1:
-                    data = self.audio_data[:frames]
-                    self.audio_data = self.audio_data[frames:]
-                    outdata[:, 0] = data
-                else:
-                    data = self.audio_data[:frames]
-                    self.audio_data = self.audio_data[frames:]
-                    outdata[:] = data
-            else:
-                self.stop()
-                raise sd.CallbackStop()
-
-        try:
-            self.stream = sd.OutputStream(
-                samplerate=self.sample_rate,
-                channels=2 if len(self.audio_data.shape) > 1 else 1,
-                callback=callback
-            )
-            self.stream.start()
-            self.playing = True
-            print('Playing...')
-        except Exception as e:
-            print(f'Error playing: {e}')
-
-    def stop(self):
-        if self.stream is not None:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
-            self.playing = False
-            print('Playback stopped')
-        self.stop_monitoring()
-
-    def start_monitoring(self):
-        if self.is_monitoring:
-            print('Already monitoring')
-            return
-
-        if self.nam_processor is None:
-            print('Please load a NAM model first')
-            return
-
-        def audio_callback(indata, outdata, frames, time, status):
-            if status:
-                print(status)
-
-            # Convert input to mono if stereo
-            if indata.shape[1] > 1:
-                audio_input = np.mean(indata, axis=1)
-            else:
-                audio_input = indata[:, 0]
-
-            # Process audio through NAM model
-            processed_audio = self.process_audio(audio_input)
-
-            # Convert to stereo if needed
-            if outdata.shape[1] > 1:
-                outdata[:] = np.column_stack((processed_audio, processed_audio))
-            else:
-                outdata[:, 0] = processed_audio
-
-        try:
-            self.input_stream = sd.Stream(
-                channels=2,  # Set to stereo output
-                samplerate=self.sample_rate,
-                blocksize=1024,
-                callback=audio_callback,
-                dtype=np.float32  # Ensure consistent data type
-            )
-            self.input_stream.start()
-            self.is_monitoring = True
-            print('Monitoring started...')
-        except Exception as e:
-            print(f'Error starting monitoring: {e}')
-
-    def stop_monitoring(self):
-        if self.input_stream is not None:
-            self.input_stream.stop()
-            self.input_stream.close()
-            self.input_stream = None
-            self.is_monitoring = False
-            print('Monitoring stopped')
-
 def main():
     # Initialize the audio player instance
     player = AudioPlayer()
@@ -376,6 +103,23 @@ def main():
     )
     stop_button.pack(side=tk.LEFT, padx=5)
 
+    rewind_button = tk.Button(
+        control_frame,
+        text='Rewind',
+        command=lambda: player.seek(0)
+    )
+    rewind_button.pack(side=tk.LEFT, padx=5)
+
+    loop_file = tk.BooleanVar(value=False)
+
+    def toggle_loop():
+        if loop_file.get() and player.playback is not None:
+            player.set_loop(0, player.playback.duration)
+        else:
+            player.set_loop(None, None)
+
+    tk.Checkbutton(control_frame, text='Loop', variable=loop_file, command=toggle_loop).pack(side=tk.LEFT, padx=5)
+
     monitor_button = tk.Button(
         control_frame,
         text='Start Guitar Input',
@@ -383,6 +127,109 @@ def main():
     )
     monitor_button.pack(side=tk.LEFT, padx=5)
 
+    low_latency = tk.BooleanVar(value=False)
+
+    def toggle_low_latency():
+        if player.is_monitoring or player.playing:
+            print('Stop audio before changing the latency mode')
+            low_latency.set(player.block_tuner is not None)
+            return
+        player.set_low_latency(low_latency.get())
+
+    tk.Checkbutton(control_frame, text='Low Latency', variable=low_latency,
+                   command=toggle_low_latency).pack(side=tk.LEFT, padx=5)
+
+    pipelined = tk.BooleanVar(value=False)
+
+    def toggle_pipelined():
+        if player.is_monitoring or player.playing:
+            print('Stop audio before changing the pipelined mode')
+            pipelined.set(bool(player.chain.pipelined))
+            return
+        player.set_pipelined(pipelined.get())
+
+    tk.Checkbutton(control_frame, text='Multi-core', variable=pipelined,
+                   command=toggle_pipelined).pack(side=tk.LEFT, padx=5)
+
+    save_chain_button = tk.Button(
+        control_frame,
+        text='Save Chain',
+        command=lambda: player.save_chain_config(filedialog.asksaveasfilename(
+            title='Save chain config',
+            initialdir=player.last_directory,
+            defaultextension='.json',
+            filetypes=[('Chain Config', '*.json')]
+        ))
+    )
+    save_chain_button.pack(side=tk.LEFT, padx=5)
+
+    def open_library():
+        window = tk.Toplevel(root)
+        window.title('Model Library')
+        window.geometry('700x400')
+
+        search_frame = tk.Frame(window)
+        search_frame.pack(fill=tk.X, padx=5, pady=5)
+        search = tk.StringVar()
+        kind = tk.StringVar(value='All')
+        tk.Label(search_frame, text='Search').pack(side=tk.LEFT)
+        tk.Entry(search_frame, textvariable=search).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        tk.OptionMenu(search_frame, kind, 'All', 'NAM', 'IR').pack(side=tk.LEFT)
+
+        results = tk.Listbox(window, font=('Courier', 9))
+        results.pack(fill=tk.BOTH, expand=True, padx=5)
+        rows = []
+
+        def refresh(*_):
+            selected_kind = {'NAM': 'nam', 'IR': 'ir'}.get(kind.get())
+            rows[:] = player.library.query(kind=selected_kind, text=search.get() or None, limit=500)
+            results.delete(0, tk.END)
+            for row in rows:
+                if row['kind'] == 'nam':
+                    detail = f"{row['architecture'] or '?'} {row['num_weights'] or 0}w"
+                else:
+                    detail = f"IR {row['ir_seconds'] or 0:.2f}s {row['ir_channels']}ch"
+                results.insert(tk.END, f"{detail:18s} {row['name']}")
+
+        def load_selected(is_pedal=False):
+            selection = results.curselection()
+            if not selection:
+                return
+            row = rows[selection[0]]
+            if row['kind'] == 'nam':
+                player.load_nam_file(row['path'], is_pedal)
+            else:
+                player.load_ir_file(row['path'])
+
+        def wait_for_scan(future):
+            if future.done():
+                refresh()
+            else:
+                window.after(200, wait_for_scan, future)
+
+        def add_folder():
+            directory = filedialog.askdirectory(title='Add model folder', initialdir=player.last_directory)
+            if directory:
+                wait_for_scan(player.scan_library(directory))
+
+        button_frame = tk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(button_frame, text='Add Folder', command=add_folder).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text='Load', command=load_selected).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text='Load as Pedal', command=lambda: load_selected(True)).pack(side=tk.LEFT, padx=2)
+
+        search.trace_add('write', refresh)
+        kind.trace_add('write', refresh)
+        results.bind('<Double-Button-1>', lambda event: load_selected())
+        refresh()
+
+    library_button = tk.Button(
+        control_frame,
+        text='Library',
+        command=open_library
+    )
+    library_button.pack(side=tk.LEFT, padx=5)
+
     # Effects frame
     effects_frame = tk.Frame(middle_frame, relief=tk.GROOVE, borderwidth=2)
     effects_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, pady=5, padx=5)
@@ -403,6 +250,8 @@ def main():
         update_parameter_frame(effect_name)
 
     effect_buttons = {
+        'gate': tk.Button(effects_buttons_frame, text='Gate',
+                        command=lambda: [player.toggle_effect('gate'), update_effect_button_state('gate'), on_effect_select('gate')]),
         'chorus': tk.Button(effects_buttons_frame, text='Chorus',
                           command=lambda: [player.toggle_effect('chorus'), update_effect_button_state('chorus'), on_effect_select('chorus')]),
         'drive': tk.Button(effects_buttons_frame, text='Drive',
@@ -451,6 +300,15 @@ def main():
             label = tk.Label(slider_frame, text=param_info['label'], width=15, anchor='w')
             label.pack(side=tk.LEFT)
 
+            if 'options' in param_info:
+                # Discrete settings, like the Drive oversampling factor
+                choice = tk.StringVar(value=str(param_info['value']))
+                menu = tk.OptionMenu(slider_frame, choice, *[str(option) for option in param_info['options']],
+                                     command=lambda value, e=effect_name.lower(), p=param_name:
+                                     player.update_effect_parameter(e, p, int(value)))
+                menu.pack(side=tk.LEFT)
+                continue
+
             slider = tk.Scale(slider_frame, from_=param_info['min'], to=param_info['max'],
                             orient=tk.HORIZONTAL, resolution=0.01,
                             command=lambda value, e=effect_name.lower(), p=param_name:
@@ -476,10 +334,97 @@ def main():
         # Add chain display update logic here if needed
         pass
 
+    # DSP load meter, refreshed from the profiler snapshot
+    meter_frame = tk.Frame(top_frame, relief=tk.GROOVE, borderwidth=2)
+    meter_frame.pack(side=tk.LEFT, pady=5, padx=5)
+    meter_label = tk.Label(meter_frame, text='DSP load: --', font=('Arial', 9), justify=tk.LEFT, width=38, anchor='w')
+    meter_label.pack(side=tk.LEFT, padx=5)
+    tk.Button(meter_frame, text='Reset', command=player.profiler.reset).pack(side=tk.LEFT, padx=2)
+    tk.Button(
+        meter_frame,
+        text='Save Stats',
+        command=lambda: player.dump_dsp_stats(filedialog.asksaveasfilename(
+            title='Save DSP stats',
+            initialdir=player.last_directory,
+            defaultextension='.json',
+            filetypes=[('JSON', '*.json'), ('CSV', '*.csv')]
+        ))
+    ).pack(side=tk.LEFT, padx=2)
+
+    def update_meter():
+        # Releases swapped-out models and runs the block size tuner
+        player.maintain()
+        stats = player.get_dsp_stats()
+        load = stats['dsp_load']
+        xruns = sum(stats['xruns'].values())
+        heaviest, heaviest_us = player.profiler.heaviest_stage(stats)
+        text = f"DSP load: {load['last'] * 100:.0f}% (peak {load['peak'] * 100:.0f}%)  xruns: {xruns}"
+        if player.chain.idle_state.idle:
+            text += '  (idle)'
+        late = player.chain.pipeline_late()
+        if late:
+            text += f'  late blocks: {late}'
+        if heaviest is not None:
+            text += f'\nHeaviest: {heaviest} {heaviest_us:.0f} us'
+        latency = player.get_latency()
+        text += f"\nLatency: {latency['total_ms']:.1f} ms ({latency['device_block_size']} frames)"
+        meter_label.configure(text=text, fg='red' if load['last'] > 0.8 else 'black')
+        root.after(500, update_meter)
+
+    update_meter()
+
+    # Presets: switching recalls cached models, the next ones preload
+    preset_frame = tk.Frame(top_frame, relief=tk.GROOVE, borderwidth=2)
+    preset_frame.pack(side=tk.LEFT, pady=5, padx=5)
+    preset_label = tk.Label(preset_frame, text='Preset: --', font=('Arial', 9), width=20, anchor='w')
+
+    def update_preset_label():
+        if player.preset_index is None:
+            preset_label.configure(text='Preset: --')
+        else:
+            preset_label.configure(text=f"Preset: {player.presets[player.preset_index].get('name')}")
+
+    def switch_preset(switch):
+        switch()
+        for name in effect_buttons:
+            update_effect_button_state(name)
+        update_preset_label()
+        on_effect_select(selected_effect.get() or 'chorus')
+
+    tk.Button(preset_frame, text='<', command=lambda: switch_preset(player.previous_preset)).pack(side=tk.LEFT, padx=2)
+    preset_label.pack(side=tk.LEFT, padx=5)
+    tk.Button(preset_frame, text='>', command=lambda: switch_preset(player.next_preset)).pack(side=tk.LEFT, padx=2)
+    tk.Button(preset_frame, text='Store',
+              command=lambda: [player.store_preset(index=player.preset_index), update_preset_label()]
+              ).pack(side=tk.LEFT, padx=2)
+    tk.Button(preset_frame, text='Store New',
+              command=lambda: [player.store_preset(), update_preset_label()]).pack(side=tk.LEFT, padx=2)
+    tk.Button(
+        preset_frame,
+        text='Save',
+        command=lambda: player.save_presets(filedialog.asksaveasfilename(
+            title='Save presets',
+            initialdir=player.last_directory,
+            defaultextension='.json',
+            filetypes=[('Presets', '*.json')]
+        ))
+    ).pack(side=tk.LEFT, padx=2)
+    tk.Button(
+        preset_frame,
+        text='Open',
+        command=lambda: [player.load_presets(filedialog.askopenfilename(
+            title='Open presets',
+            initialdir=player.last_directory,
+            filetypes=[('Presets', '*.json')]
+        )), update_preset_label()]
+    ).pack(side=tk.LEFT, padx=2)
+
     # Show initial parameters for chorus effect
     on_effect_select('chorus')
 
     root.mainloop()
+    player.stop()
+    player.chain.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""Headless DSP benchmark for the effects and the NAM/IR processors.
+
+Run from the repository root:
+
+    python -m benchmarks.dsp_benchmark -o results.json --nam models/a.nam --ir cabs/b.wav
+    python -m benchmarks.dsp_benchmark -o new.json --compare results.json --threshold 0.1
+
+Every case is fed the same seeded noise at each sample rate and block size.
+Timing and memory are measured in separate passes so tracemalloc does not
+distort the latency numbers. No audio device is opened.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from effects.gate.gate_effect import NoiseGateEffect
+from effects.chorus.chorus_effect import ChorusEffect
+from effects.drive.drive_effect import DriveEffect
+from effects.delay.delay_effect import DelayEffect
+from effects.reverb.reverb_effect import ReverbEffect
+from ir_convolver import PartitionedIRProcessor
+from model_cache import with_process_into
+from nam_reader import NAMReader
+
+try:
+    import nam_binding
+except ImportError:
+    nam_binding = None
+
+try:
+    import nam_engine
+except ImportError:
+    nam_engine = None
+
+BLOCK_SIZES = [32, 64, 128, 256, 512, 1024, 2048, 4096]
+SAMPLE_RATES = [44100, 48000, 96000]
+
+EFFECT_CASES = {
+    'gate': lambda sr: NoiseGateEffect(sr),
+    'chorus': lambda sr: ChorusEffect(sr),
+    'chorus_3voice': lambda sr: ChorusEffect(sr, voices=3),
+    'drive': lambda sr: DriveEffect(sr),
+    'drive_os4': lambda sr: DriveEffect(sr, oversampling=4),
+    'delay': lambda sr: DelayEffect(sr),
+    'reverb': lambda sr: ReverbEffect(sr),
+}
+
+class EffectRunner:
+    """Runs an effect prepared for the block size into its own buffer."""
+
+    def __init__(self, effect, sample_rate, block_size):
+        effect.prepare(sample_rate, block_size)
+        self.effect = effect
+        self.out = np.zeros(effect.output_shape(np.zeros(block_size)), dtype=effect.dtype)
+
+    def __call__(self, block, out):
+        self.effect.process_into(block, self.out)
+
+class NativeRunner:
+    def __init__(self, processor):
+        self.processor = processor
+
+    def __call__(self, block, out):
+        self.processor.process_into(block, out)
+
+class ConvolverRunner:
+    """Runs a PartitionedIRProcessor into its own buffer (stereo IRs output two columns)."""
+
+    def __init__(self, processor, block_size):
+        self.processor = processor
+        shape = (block_size,) if processor.output_channels == 1 else (block_size, processor.output_channels)
+        self.out = np.zeros(shape, dtype=np.float32)
+
+    def __call__(self, block, out):
+        self.processor.process_into(block, self.out)
+
+def build_cases(nam_files, ir_files):
+    """Return {case name: factory(sample_rate, block_size) -> runner}."""
+    cases = {}
+    for name, make_effect in EFFECT_CASES.items():
+        cases[name] = lambda sr, bs, make_effect=make_effect: EffectRunner(make_effect(sr), sr, bs)
+
+    for path in ir_files:
+        name = f'irfft_{os.path.splitext(os.path.basename(path))[0]}'
+        cases[name] = lambda sr, bs, path=path: ConvolverRunner(PartitionedIRProcessor(path, sr, bs), bs)
+
+    if nam_engine is None and nam_files:
+        print('torch is not available; skipping PyTorch NAM cases')
+    for path in nam_files if nam_engine is not None else []:
+        architecture = NAMReader(path).architecture or 'unknown'
+        name = f'torch_{architecture.lower()}_{os.path.splitext(os.path.basename(path))[0]}'
+
+        def make_torch(sr, bs, path=path):
+            processor = nam_engine.TorchNAMProcessor(path)
+            processor.reset(sr, bs)
+            return NativeRunner(processor)
+        cases[name] = make_torch
+
+    if nam_binding is None:
+        if nam_files or ir_files:
+            print('nam_binding is not available; skipping NAM and IR cases')
+        return cases
+
+    for path in nam_files:
+        architecture = NAMReader(path).architecture or 'unknown'
+        name = f'nam_{architecture.lower()}_{os.path.splitext(os.path.basename(path))[0]}'
+
+        def make_nam(sr, bs, path=path):
+            processor = with_process_into(nam_binding.NAMProcessor(path))
+            processor.reset(sr, bs)
+            return NativeRunner(processor)
+        cases[name] = make_nam
+
+    for path in ir_files:
+        name = f'ir_{os.path.splitext(os.path.basename(path))[0]}'
+        cases[name] = lambda sr, bs, path=path: NativeRunner(with_process_into(nam_binding.IRProcessor(path, sr)))
+    return cases
+
+def make_input(sample_rate, seconds, seed=1234):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(sample_rate * seconds)) * 0.1).astype(np.float32)
+
+def run_case(factory, sample_rate, block_size, seconds, warmup_seconds=0.1, memory_blocks=64):
+    """Benchmark one case at one sample rate and block size."""
+    audio = make_input(sample_rate, seconds)
+    num_blocks = len(audio) // block_size
+    blocks = audio[:num_blocks * block_size].reshape(num_blocks, block_size)
+    out = np.zeros(block_size, dtype=np.float32)
+
+    # Timing pass
+    runner = factory(sample_rate, block_size)
+    for i in range(max(int(warmup_seconds * sample_rate) // block_size, 1)):
+        runner(blocks[i % num_blocks], out)
+    times = np.zeros(num_blocks)
+    for i in range(num_blocks):
+        start = time.perf_counter()
+        runner(blocks[i], out)
+        times[i] = time.perf_counter() - start
+
+    # Memory pass on a fresh instance: peak Python-side allocation while
+    # processing (construction is excluded)
+    runner = factory(sample_rate, block_size)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    for i in range(min(memory_blocks, num_blocks)):
+        runner(blocks[i], out)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    audio_seconds = num_blocks * block_size / sample_rate
+    return {
+        'sample_rate': sample_rate,
+        'block_size': block_size,
+        'realtime_factor': audio_seconds / times.sum(),
+        'p50_us': float(np.percentile(times, 50) * 1e6),
+        'p99_us': float(np.percentile(times, 99) * 1e6),
+        'max_us': float(times.max() * 1e6),
+        'budget_us': block_size / sample_rate * 1e6,
+        'peak_kb': (peak - base) / 1024
+    }
+
+def run_benchmarks(cases, sample_rates, block_sizes, seconds):
+    results = []
+    for name, factory in cases.items():
+        for sample_rate in sample_rates:
+            for block_size in block_sizes:
+                result = run_case(factory, sample_rate, block_size, seconds)
+                result['case'] = name
+                results.append(result)
+                print(f"{name:28s} {sample_rate:6d} Hz {block_size:5d}  "
+                      f"{result['realtime_factor']:8.1f}x  p50 {result['p50_us']:8.1f} us  "
+                      f"p99 {result['p99_us']:8.1f} us  peak {result['peak_kb']:8.1f} KiB")
+    return results
+
+def environment():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'nam_binding': nam_binding is not None,
+        'torch': nam_engine is not None
+    }
+
+def compare(results, baseline, threshold):
+    """Print per-case changes against a baseline; return the regressions."""
+    previous = {(r['case'], r['sample_rate'], r['block_size']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['case'], result['sample_rate'], result['block_size'])
+        old = previous.get(key)
+        if old is None:
+            continue
+        speed = result['realtime_factor'] / old['realtime_factor'] - 1
+        p99 = result['p99_us'] / old['p99_us'] - 1 if old['p99_us'] else 0.0
+        regressed = speed < -threshold or p99 > threshold
+        if regressed:
+            regressions.append({'case': key, 'speed_change': speed, 'p99_change': p99})
+        print(f"{'REGRESSION' if regressed else 'ok':10s} {key[0]:28s} {key[1]:6d} Hz {key[2]:5d}  "
+              f"speed {speed * 100:+6.1f}%  p99 {p99 * 100:+6.1f}%")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark effects and NAM/IR processors.')
+    parser.add_argument('-o', '--output', help='Write results to this JSON file')
+    parser.add_argument('--nam', action='append', default=[], help='Reference .nam file (repeatable)')
+    parser.add_argument('--ir', action='append', default=[], help='Reference IR .wav file (repeatable)')
+    parser.add_argument('--cases', nargs='*', help='Only run cases whose name contains one of these')
+    parser.add_argument('--block-sizes', type=int, nargs='*', default=BLOCK_SIZES)
+    parser.add_argument('--sample-rates', type=int, nargs='*', default=SAMPLE_RATES)
+    parser.add_argument('--seconds', type=float, default=2.0, help='Audio seconds per measurement')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown treated as a regression (default 0.1)')
+    args = parser.parse_args()
+
+    cases = build_cases(args.nam, args.ir)
+    if args.cases:
+        cases = {name: f for name, f in cases.items() if any(c in name for c in args.cases)}
+
+    results = run_benchmarks(cases, args.sample_rates, args.block_sizes, args.seconds)
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results saved: {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold * 100:.0f}%')
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
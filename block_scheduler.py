@@ -0,0 +1,64 @@
+"""Device block scheduling for low-latency monitoring.
+
+The device block (frames per audio callback) is decoupled from the
+buffers the stages are prepared for. The chain and the models are
+prepared once for the largest block in LOW_LATENCY_BLOCK_SIZES, and any
+smaller device block runs through them unchanged: every stage accepts
+any call up to the size it was prepared for. BlockSizeTuner steps the
+device block down while the callback has headroom.
+"""
+
+LOW_LATENCY_BLOCK_SIZES = (32, 64, 128, 256)
+
+class BlockSizeTuner:
+    """Finds the smallest device block the audio callback keeps up with.
+
+    Starts at the largest size. After every measurement window it reads
+    the profiler: when the 99th percentile DSP load stayed below
+    ``max_load`` without xruns, it steps one size down. An xrun or a
+    higher load steps back up one size and settles there. A settled tuner
+    keeps watching and steps up again on every new xrun. The profiler is
+    expected to be reset whenever the size changes.
+
+    Args:
+        sizes (tuple): Candidate device block sizes
+        max_load (float): Highest acceptable p99 callback time per block period
+        window (float): Seconds measured at each size
+    """
+
+    def __init__(self, sizes=LOW_LATENCY_BLOCK_SIZES, max_load=0.6, window=2.0):
+        self.sizes = sorted(sizes)
+        self.max_load = max_load
+        self.window = window
+        self.index = len(self.sizes) - 1
+        self.settled = False
+        self.xruns = 0  # Xruns already judged at the current size
+
+    @property
+    def block_size(self):
+        return self.sizes[self.index]
+
+    def update(self, stats, sample_rate):
+        """Judge a profiler snapshot taken at the current size.
+
+        Returns:
+            int: New device block size, or None to keep the current one
+        """
+        xruns = sum(stats['xruns'].values())
+        if self.settled:
+            overloaded = xruns > self.xruns
+        elif stats['callbacks'] * self.block_size < self.window * sample_rate:
+            return None
+        else:
+            overloaded = xruns > 0 or stats['dsp_load']['p99'] > self.max_load
+            self.settled = overloaded or self.index == 0
+
+        if overloaded and self.index < len(self.sizes) - 1:
+            self.index += 1
+        elif not self.settled:
+            self.index -= 1
+        else:
+            self.xruns = xruns
+            return None
+        self.xruns = 0
+        return self.block_size
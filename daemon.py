@@ -0,0 +1,214 @@
+"""Headless engine: guitar in, rig out, controlled over a local UDP socket.
+
+    python daemon.py --presets rig.json --preset 0
+    python daemon.py --config chain.json --port 9870
+
+Audio starts first, with an empty chain, and the rig is loaded while it
+runs; models hot-swap in as they arrive. No GUI module is imported.
+
+Every datagram holds one JSON command or a list of them. A list is a
+batch: its parameter and on/off changes are published to the audio
+thread together and take effect in the same block. Each datagram is
+answered with a JSON list holding one result per command, sent back to
+the sender:
+
+    {"cmd": "load_model", "path": "amp.nam", "slot": "nam"}   slot "nam" or "nam_pedal"
+    {"cmd": "load_ir", "path": "cab.wav"}
+    {"cmd": "toggle", "effect": "reverb"}                     optional "enabled": true/false
+    {"cmd": "set", "effect": "delay", "param": "mix", "value": 0.4}
+    {"cmd": "preset", "index": 2}                             or "step": 1 / -1
+    {"cmd": "meters"}
+    {"cmd": "latency"}                                        round trip, per stage
+    {"cmd": "ping"}
+
+Results are {"ok": true, ...} or {"ok": false, "error": "..."}. Model
+loads are queued on the loader thread and answered straight away.
+"""
+import argparse
+import json
+import socket
+import time
+from engine import AudioEngine
+from model_cache import MODEL_SLOTS
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9870
+MAX_DATAGRAM = 65507
+
+class ControlServer:
+    """Runs control commands against an AudioEngine from one UDP socket.
+
+    ``serve`` is the engine's only control thread, so it is the single
+    writer of the chain's parameter queue. Between datagrams it runs the
+    engine's periodic work (retired models, block size tuning).
+
+    Args:
+        engine (AudioEngine): Engine to control
+        host (str): Address to bind; keep it local, there is no authentication
+        port (int): UDP port, 0 for any free port
+        poll_time (float): Seconds between checks for retired models and stop
+    """
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, poll_time=0.5):
+        self.engine = engine
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.settimeout(poll_time)
+        self.running = False
+        self.handlers = {
+            'load_model': self._load_model,
+            'load_ir': self._load_ir,
+            'toggle': self._toggle,
+            'set': self._set,
+            'preset': self._preset,
+            'meters': lambda command: self.engine.get_meters(),
+            'latency': lambda command: self.engine.get_latency(),
+            'ping': self._ping
+        }
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def serve(self):
+        """Answer datagrams until stop is called."""
+        self.running = True
+        while self.running:
+            try:
+                data, sender = self.socket.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                data = None
+            self.engine.maintain()
+            if data is not None:
+                reply = json.dumps(self.handle(data)).encode()
+                try:
+                    self.socket.sendto(reply, sender)
+                except OSError as e:
+                    print(f'Error replying to {sender}: {e}')
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.socket.close()
+
+    def handle(self, data):
+        """Run one datagram's command or batch; returns the list of results."""
+        try:
+            message = json.loads(data)
+        except ValueError as e:
+            return [{'ok': False, 'error': f'Invalid JSON: {e}'}]
+        commands = message if isinstance(message, list) else [message]
+        parameters = self.engine.chain.parameters
+        parameters.begin_batch()
+        try:
+            return [self._run(command) for command in commands]
+        finally:
+            parameters.end_batch()
+
+    def _run(self, command):
+        handler = self.handlers.get(command.get('cmd')) if isinstance(command, dict) else None
+        if handler is None:
+            return {'ok': False, 'error': f'Unknown command: {command!r}'}
+        try:
+            result = handler(command)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, **result}
+
+    def _load_model(self, command):
+        slot = command.get('slot', 'nam')
+        if slot not in MODEL_SLOTS:
+            raise ValueError(f'Unknown model slot: {slot!r}')
+        self.engine.load_nam_file(command['path'], slot == 'nam_pedal')
+        return {'queued': True}
+
+    def _load_ir(self, command):
+        self.engine.load_ir_file(command['path'])
+        return {'queued': True}
+
+    def _toggle(self, command):
+        name = command['effect']
+        states = self.engine.effect_states
+        if name not in states:
+            raise ValueError(f'Unknown effect: {name!r}')
+        if states[name] != command.get('enabled', not states[name]):
+            self.engine.toggle_effect(name)
+        return {'enabled': states[name]}
+
+    def _set(self, command):
+        effect_name, param_name = command['effect'], command['param']
+        if param_name not in self.engine.effect_params.get(effect_name, {}):
+            raise ValueError(f'Unknown parameter: {effect_name}.{param_name}')
+        value = float(command['value'])
+        self.engine.update_effect_parameter(effect_name, param_name, value)
+        return {'value': value}
+
+    def _preset(self, command):
+        engine = self.engine
+        if 'step' in command:
+            if not engine.presets:
+                raise ValueError('No presets loaded')
+            current = -1 if engine.preset_index is None else engine.preset_index
+            index = (current + int(command['step'])) % len(engine.presets)
+        else:
+            index = int(command['index'])
+        if not engine.apply_preset(index):
+            raise ValueError(f'Could not apply preset {index}')
+        return {'index': index, 'name': engine.presets[index].get('name')}
+
+    def _ping(self, command):
+        engine = self.engine
+        return {
+            'sample_rate': engine.sample_rate,
+            'block_size': engine.device_block_size,
+            'monitoring': engine.is_monitoring,
+            'preset': engine.preset_index
+        }
+
+def main():
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description='Run the NAM rig without a GUI')
+    parser.add_argument('--config', help='Chain config JSON saved from the GUI')
+    parser.add_argument('--presets', help='Presets JSON saved from the GUI')
+    parser.add_argument('--preset', type=int, default=0, help='Preset to start with (default: 0)')
+    parser.add_argument('--low-latency', action='store_true',
+                        help='Tune the device block down from 256 frames while running')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='Run the NAM models on worker threads (one block of latency each)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Control address (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Control port (default: {DEFAULT_PORT})')
+    args = parser.parse_args()
+
+    engine = AudioEngine()
+    server = ControlServer(engine, args.host, args.port)
+    if args.low_latency:
+        engine.set_low_latency(True)
+    if args.pipelined:
+        engine.set_pipelined(True)
+    if not engine.start_monitoring(require_model=False):
+        server.close()
+        return
+    print(f'Audio running after {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    # The rig loads while audio already runs; models are swapped in live
+    if args.presets and engine.load_presets(args.presets):
+        engine.apply_preset(args.preset)
+    elif args.config:
+        engine.load_chain_config(args.config)
+
+    host, port = server.address
+    print(f'Listening for control messages on udp://{host}:{port}')
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        engine.stop()
+        engine.chain.close()
+        engine.model_cache.shutdown()
+        engine.scan_executor.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,248 @@
 import numpy as np
 
+def param_slice(value, start, stop):
+    """Slice a per-sample parameter ramp; scalar values pass through."""
+    return value[start:stop] if isinstance(value, np.ndarray) else value
+
+def per_frame(value, audio):
+    """Shape a scalar or per-sample parameter to broadcast over (frames, channels) audio."""
+    if isinstance(value, np.ndarray) and audio.ndim > 1:
+        return value[:, None]
+    return value
+
+def copy_signal(inp, out):
+    """Copy inp into out, duplicating mono to stereo or folding stereo to mono."""
+    if inp.ndim == out.ndim:
+        out[...] = inp
+    elif out.ndim > 1:
+        out[...] = inp[:, None]
+    else:
+        np.mean(inp, axis=1, out=out)
+
+class OnePoleFilter:
+    """Stateful one-pole filters, y[t] = b * x[t] + a * y[t - 1], on rows of audio.
+
+    Replaces ``scipy.signal.lfilter`` where that would allocate its output
+    and state on every call. A block is split into sub-blocks of
+    ``sub_block`` samples, zero-padded at the end. The end of every
+    sub-block filtered from rest comes from one matrix-vector product,
+    and a small matmul carries those ends, and the state, into the value
+    each sub-block starts from. That value sits in an extra column after
+    the sub-block's samples, so one matmul against a precomputed
+    lower-triangular matrix, with the entry weights as its last row,
+    filters every sub-block. Everything runs in float64 scratch sized for
+    ``max_block``. The coefficient tables are rebuilt only when ``a`` or
+    ``b`` change.
+
+    ``state`` holds the last output of every row.
+
+    Args:
+        rows (int): Independent filters, one per row of the audio
+        max_block (int): Largest block in samples
+        sub_block (int): Samples filtered per matmul row
+    """
+
+    def __init__(self, rows, max_block, sub_block=32):
+        self.rows = rows
+        self.max_block = max_block
+        self.sub_block = L = sub_block
+        blocks = -(-max_block // L)
+        self.state = np.zeros(rows)
+        self.coefficients = None
+
+        # Exponents and masks of the tables, evaluated for new coefficients;
+        # masked entries get exponent 0 so they stay finite for any a
+        i, j = np.indices((L, L))
+        self._within_exponent = np.maximum(j - i, 0).astype(np.float64)
+        self._within_mask = (j >= i).astype(np.float64)
+        m, k = np.indices((blocks + 1, blocks))
+        self._carry_exponent = np.maximum(L * (k - m), 0).astype(np.float64)
+        self._carry_mask = (k >= m).astype(np.float64)
+        self._entry_exponent = np.arange(1, L + 1, dtype=np.float64)
+        # weights[i, j]: weight of input i on output j of a sub-block, and
+        # in the last row, of the value the sub-block starts from
+        self._weights = np.zeros((L + 1, L))
+        # last[i]: weight of input i on the end of a sub-block at rest
+        self._last = np.zeros(L)
+        # carry[m, k]: weight of end m - 1 on the start of sub-block k,
+        # with the state as end -1
+        self._carry = np.zeros((blocks + 1, blocks))
+
+        # Flat, so every block size has contiguous views; every sub-block
+        # of the input is followed by the value it starts from
+        self._input = np.zeros(rows * blocks * (L + 1))
+        self._output = np.zeros(rows * blocks * L)
+        self._rest = np.zeros(rows * blocks)
+        self._ends = np.zeros((rows, blocks + 1))
+        self._starts = np.zeros(rows * blocks)
+
+    def _tables(self, a, b):
+        within = self._weights[:-1]
+        np.power(a, self._within_exponent, out=within)
+        within *= self._within_mask
+        within *= b
+        self._last[:] = within[:, -1]
+        np.power(a, self._entry_exponent, out=self._weights[-1])
+        np.power(a, self._carry_exponent, out=self._carry)
+        self._carry *= self._carry_mask
+        self.coefficients = (a, b)
+
+    def process(self, x, out, a, b):
+        """Filter x (rows, n) or (n,) into out, along the last axis.
+
+        x and out may be any views, including the transpose of
+        (frames, channels) audio, and may be the same array. Input with
+        fewer rows runs through the first filters.
+        """
+        a, b = float(a), float(b)
+        if self.coefficients != (a, b):
+            self._tables(a, b)
+        if x.ndim == 1:
+            x, out = x[None], out[None]
+        rows, n = x.shape
+        if n == 0:
+            return
+        L = self.sub_block
+        blocks = -(-n // L)
+        full = n // L
+        state = self.state[:rows]
+
+        padded = self._input[:rows * blocks * (L + 1)].reshape(
+            rows, blocks, L + 1)
+        padded[:, :full, :L] = x[:, :full * L].reshape(rows, full, L)
+        if full < blocks:
+            padded[:, full, :n - full * L] = x[:, full * L:]
+            padded[:, full, n - full * L:L] = 0.0
+        samples = padded.reshape(rows * blocks, L + 1)
+
+        # End of every sub-block from rest, then the value every sub-block
+        # starts from, with the state as end -1
+        rest = self._rest[:rows * blocks]
+        np.matmul(samples[:, :L], self._last, out=rest)
+        ends = self._ends[:rows, :blocks + 1]
+        ends[:, 0] = state
+        ends[:, 1:] = rest.reshape(rows, blocks)
+        starts = self._starts[:rows * blocks].reshape(rows, blocks)
+        np.matmul(ends, self._carry[:blocks + 1, :blocks], out=starts)
+        padded[:, :, L] = starts
+
+        filtered = self._output[:rows * blocks * L].reshape(rows * blocks, L)
+        np.matmul(samples, self._weights, out=filtered)
+        filtered = filtered.reshape(rows, blocks * L)
+        out[...] = filtered[:, :n]
+        state[:] = filtered[:, n - 1]
+
+    def reset(self):
+        self.state.fill(0)
+
 class AudioEffect:
-    def __init__(self, sample_rate=44100):
+    """Base class of the effects.
+
+    Effects process float32 audio, 1-D for mono or (frames, channels),
+    into a buffer owned by the caller: ``process_into(inp, out)``. Before
+    that, ``prepare(sample_rate, max_block, channels)`` fixes the largest
+    block and the input channel count and allocates the effect's scratch
+    buffers. Processing then writes only into those buffers; filters run
+    through OnePoleFilter or the oversampling module rather than scipy,
+    whose filters return new arrays. NumPy can still allocate small
+    temporary buffers inside ufuncs that broadcast a per-sample ramp
+    across channels or cast between float32 and float64. ``process`` is
+    a convenience wrapper that returns a new array.
+
+    Subclasses implement ``_process_into`` and ``_allocate_scratch``.
+    """
+    # Minimum columns in the processed output: 2 for stages that turn mono
+    # into stereo. Input channels are otherwise kept; mono is a 1-D array
+    output_channels = 1
+    # Parameters that accept a per-sample ramp array as well as a float
+    smoothed_params = ()
+    # Delay the effect adds to the signal, in samples
+    latency = 0
+    # Sample type of the audio passed to and written by process_into
+    dtype = np.float32
+
+    def __init__(self, sample_rate=44100, max_block=1024, channels=1):
         self.sample_rate = sample_rate
         self.is_enabled = True
+        self.max_block = max_block
+        self.channels = channels
+
+    def prepare(self, sample_rate, max_block, channels=1):
+        """Fix the rate, largest block and input channels before processing.
+
+        Scratch buffers only ever grow and are kept when they are large
+        enough, so preparing an effect the audio thread is running with
+        unchanged sizes is safe. Otherwise call off the audio thread; a new
+        rate restarts the effect from silence.
+        """
+        if sample_rate != self.sample_rate:
+            self.set_sample_rate(sample_rate)
+        if max_block > self.max_block or channels > self.channels:
+            self.max_block = max(self.max_block, max_block)
+            self.channels = max(self.channels, channels)
+            self._allocate_scratch()
+
+    def output_shape(self, audio_data):
+        """Shape of the output for a block shaped like audio_data."""
+        channels = max(1 if audio_data.ndim == 1 else audio_data.shape[1], self.output_channels)
+        return (len(audio_data),) if channels == 1 else (len(audio_data), channels)
 
     def process(self, audio_data):
         """Process the audio data through the effect.
-        
+
         Args:
             audio_data (numpy.ndarray): Input audio data
-            
+
         Returns:
-            numpy.ndarray: Processed audio data
+            numpy.ndarray: Processed audio data, a new float32 array
         """
         if not self.is_enabled:
             return audio_data
-        return self._process_impl(audio_data)
+        output = np.empty(self.output_shape(audio_data), dtype=self.dtype)
+        self.process_into(audio_data, output)
+        return output
 
-    def _process_impl(self, audio_data):
+    def process_into(self, inp, out):
+        """Process inp into out, shaped as given by output_shape.
+
+        A disabled effect copies its input. A block larger than the
+        prepared one, or with more channels, prepares the effect again
+        first; that is the only case in which this allocates.
+        """
+        if not self.is_enabled:
+            copy_signal(inp, out)
+            return
+        channels = 1 if inp.ndim == 1 else inp.shape[1]
+        if len(inp) > self.max_block or channels > self.channels:
+            self.prepare(self.sample_rate, len(inp), channels)
+        self._process_into(inp, out)
+
+    def _process_into(self, inp, out):
         """Implementation of the effect processing.
-        
-        This method should be overridden by subclasses.
-        
+
+        This method should be overridden by subclasses. Scratch buffers
+        hold at least ``max_block`` frames of ``channels`` channels.
+
         Args:
-            audio_data (numpy.ndarray): Input audio data
-            
-        Returns:
-            numpy.ndarray: Processed audio data
+            inp (numpy.ndarray): Input audio data
+            out (numpy.ndarray): Output buffer, written completely
         """
-        return audio_data
+        copy_signal(inp, out)
+
+    def _allocate_scratch(self):
+        """Allocate scratch buffers for max_block frames of channels channels.
+
+        Called by prepare; override in subclasses that need scratch.
+        """
+
+    def set_sample_rate(self, sample_rate):
+        """Rebuild rate-dependent state for a new sample rate.
+
+        Subclasses with buffers sized in samples override this. Call off
+        the audio thread; the effect restarts from silence.
+        """
+        self.sample_rate = sample_rate
+        self.reset()
 
     def enable(self):
         """Enable the effect."""
@@ -1,44 +1,209 @@
 import numpy as np
-from ..base_effect import AudioEffect
+from ..base_effect import AudioEffect, param_slice
 
 class ChorusEffect(AudioEffect):
-    def __init__(self, sample_rate=44100, rate=1.0, depth=0.002, mix=0.5):
+    smoothed_params = ('depth', 'mix')
+    MAX_CHANNELS = 2
+    GUARD = 3  # Samples read past a tap position by cubic interpolation
+
+    def __init__(self, sample_rate=44100, rate=1.0, depth=0.002, mix=0.5,
+                 voices=1, interpolation='cubic', stereo=False):
         super().__init__(sample_rate)
         self.rate = rate  # LFO rate in Hz
         self.depth = depth  # Delay depth in seconds
         self.mix = mix  # Wet/dry mix (0 to 1)
-        self.phase = 0
-        self.buffer = np.zeros(int(sample_rate * 0.1))  # 100ms buffer
+        self.voices = voices  # Number of modulated taps, spread evenly in LFO phase
+        self.interpolation = interpolation  # 'linear' or 'cubic'
+        self.stereo = stereo  # Stereo output with the right LFO a quarter cycle behind
+        self.phase = 0.0  # LFO phase in cycles (0 to 1)
+        self._allocate()
+        self._allocate_scratch()
+
+    @property
+    def output_channels(self):
+        # Fixed when the chain is compiled; rebuild the chain after changing stereo
+        return 2 if self.stereo else 1
+
+    def _allocate(self):
+        # One ring buffer row per input channel, of at least 100ms, rounded
+        # up to a power of two so the read/write positions can wrap with a
+        # bit mask. Every row is followed by GUARD copies of its first
+        # samples, so the taps after a masked position never wrap.
+        buffer_size = 1 << int(np.ceil(np.log2(max(int(self.sample_rate * 0.1), 16))))
+        self.buffer = np.zeros((self.MAX_CHANNELS, buffer_size + self.GUARD), dtype=self.dtype)
+        self.buffer_size = buffer_size
+        self.buffer_mask = buffer_size - 1
         self.buffer_index = 0
 
-    def _process_impl(self, audio_data):
-        # Convert input to mono if stereo
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-
-        output = np.zeros_like(audio_data)
-        for i in range(len(audio_data)):
-            # Update buffer
-            self.buffer[self.buffer_index] = audio_data[i]
-            
-            # Calculate LFO value
-            lfo = np.sin(2 * np.pi * self.rate * self.phase / self.sample_rate)
-            delay_samples = int((self.depth * self.sample_rate * (lfo + 1)) / 2)
-            
-            # Get delayed sample
-            delay_index = (self.buffer_index - delay_samples) % len(self.buffer)
-            delayed_sample = self.buffer[delay_index]
-            
-            # Mix dry and wet signals
-            output[i] = (1 - self.mix) * audio_data[i] + self.mix * delayed_sample
-            
-            # Update indices
-            self.buffer_index = (self.buffer_index + 1) % len(self.buffer)
-            self.phase = (self.phase + 1) % self.sample_rate
-
-        return output
+        # Cubic interpolation reads one sample ahead of the tap, so the
+        # shortest delay must stay behind the write position
+        self.min_delay = 2.0
+        self.max_delay = buffer_size // 2
+        self.max_chunk = buffer_size - self.max_delay - 4
+        self._rows = (np.arange(self.MAX_CHANNELS) * (buffer_size + self.GUARD))[:, None, None]
+
+    def _allocate_scratch(self):
+        # Taps are (channels, voices, frames); read positions stay float64
+        # so the fractional part keeps its precision, samples are float32.
+        # Contiguous views are cached per (frames, channels), as in the reverb
+        n = min(self.max_block, self.max_chunk)
+        voices = max(int(self.voices), 1)
+        size = self.MAX_CHANNELS * voices * n
+        self._scratch_voices = voices
+        self._voice_offsets = (np.arange(voices) / voices)[:, None]
+        self._ramp = np.arange(n, dtype=np.float64)
+        self._write_pos = np.zeros(n)
+        self._param = np.zeros(n)
+        self._folded = np.zeros(self.max_block, dtype=self.dtype)
+        self._positions = [np.zeros(size) for _ in range(2)]
+        self._indices = np.zeros(size, dtype=np.intp)
+        self._taps = [np.zeros(size, dtype=self.dtype) for _ in range(7)]
+        self._wet = np.zeros(self.MAX_CHANNELS * n, dtype=self.dtype)
+        self._views = {}
+
+    def _scratch(self, n, channels):
+        views = self._views.get((n, channels))
+        if views is None:
+            shape = (channels, self._scratch_voices, n)
+            size = channels * self._scratch_voices * n
+            views = tuple(a[:size].reshape(shape)
+                          for a in self._positions + [self._indices] + self._taps)
+            views += (self._wet[:channels * n].reshape(channels, n),)
+            self._views[(n, channels)] = views
+        return views
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.phase = 0.0
+        self._allocate()
+        self._allocate_scratch()
+
+    def _process_into(self, inp, out):
+        # Work on (frames, channels) views; a mono chorus keeps mono 1-D
+        if max(int(self.voices), 1) != self._scratch_voices:
+            self._allocate_scratch()
+        if inp.ndim == 1:
+            dry = inp[:, None]
+        elif inp.shape[1] > self.MAX_CHANNELS:
+            folded = self._folded[:len(inp)]
+            np.mean(inp, axis=1, out=folded)
+            dry = folded[:, None]
+        else:
+            dry = inp
+        output = out if out.ndim > 1 else out[:, None]
+
+        max_chunk = len(self._ramp)
+        for start in range(0, len(dry), max_chunk):
+            stop = start + max_chunk
+            self._process_chunk(dry[start:stop], output[start:stop],
+                                param_slice(self.depth, start, stop), param_slice(self.mix, start, stop))
+
+    def _process_chunk(self, dry, output, depth, mix):
+        n, in_channels = dry.shape
+        out_channels = output.shape[1]
+        mask = self.buffer_mask
+        position, base, index, frac, xm1, x0, x1, x2, temp, wet, wet_mix = \
+            self._scratch(n, out_channels)
+
+        # Write the whole chunk first so taps with short delays can read it
+        start = self.buffer_index
+        first = min(n, self.buffer_size - start)
+        self.buffer[:in_channels, start:start + first] = dry[:first].T
+        self.buffer[:in_channels, :n - first] = dry[first:].T
+        self.buffer[:in_channels, self.buffer_size:] = self.buffer[:in_channels, :self.GUARD]
+        write_pos = self._write_pos[:n]
+        np.add(self._ramp[:n], start, out=write_pos)
+
+        # LFO for every output channel, voice and sample in one step
+        step = self.rate / self.sample_rate
+        np.multiply(self._ramp[:n], step, out=position[0, 0])
+        position[0, 0] += self.phase
+        position[...] = position[0, 0]
+        position += self._voice_offsets
+        if self.stereo:
+            position[1:] += 0.25
+        position *= 2 * np.pi
+        np.sin(position, out=position)
+
+        # Delay in samples, then the fractional read position behind the
+        # write head
+        position += 1
+        if isinstance(depth, np.ndarray):
+            scale = self._param[:n]
+            np.multiply(depth, self.sample_rate / 2, out=scale)
+            position *= scale
+        else:
+            position *= depth * self.sample_rate / 2
+        position += self.min_delay
+        np.minimum(position, self.max_delay, out=position)
+        np.subtract(write_pos, position, out=position)
+        np.floor(position, out=base)
+        np.subtract(position, base, out=frac, casting='same_kind')
+
+        # Flat index of the first tap. Output channel c reads input channel
+        # c; mono input feeds both sides
+        np.copyto(index, base, casting='unsafe')
+        cubic = self.interpolation != 'linear'
+        if cubic:
+            index -= 1
+        index &= mask
+        if in_channels > 1:
+            index += self._rows[:out_channels]
+        buffer = self.buffer.ravel()
+
+        if cubic:
+            # 4-point, 3rd-order Hermite interpolation (x-form)
+            for tap in (xm1, x0, x1, x2):
+                buffer.take(index, out=tap)
+                index += 1
+            # c = 0.5 * (x1 - xm1), v = x0 - x1, w = c + v
+            np.subtract(x1, xm1, out=temp)
+            temp *= 0.5
+            np.subtract(x0, x1, out=x1)
+            np.add(temp, x1, out=xm1)
+            # a = w + v + 0.5 * (x2 - x0), b = w + a
+            np.subtract(x2, x0, out=wet)
+            wet *= 0.5
+            wet += xm1
+            wet += x1
+            np.add(xm1, wet, out=x1)
+            # ((a * frac - b) * frac + c) * frac + x0
+            wet *= frac
+            wet -= x1
+            wet *= frac
+            wet += temp
+            wet *= frac
+            wet += x0
+        else:
+            buffer.take(index, out=x0)
+            index += 1
+            buffer.take(index, out=x1)
+            np.subtract(x1, x0, out=wet)
+            wet *= frac
+            wet += x0
+
+        if self._scratch_voices > 1:
+            np.mean(wet, axis=1, out=wet_mix)
+        else:
+            wet_mix = wet[:, 0]
+
+        # Carry phase and write position into the next block
+        self.phase = (self.phase + step * n) % 1.0
+        self.buffer_index = (self.buffer_index + n) & mask
+
+        # Mix dry and wet signals, one row per output channel
+        wet_mix *= mix
+        if isinstance(mix, np.ndarray):
+            dry_gain = self._param[:n]
+            np.subtract(1.0, mix, out=dry_gain)
+        else:
+            dry_gain = 1.0 - mix
+        output = output.T
+        for channel in range(out_channels):
+            np.multiply(dry[:, min(channel, in_channels - 1)], dry_gain, out=output[channel])
+            output[channel] += wet_mix[channel]
 
     def reset(self):
-        self.phase = 0
+        self.phase = 0.0
         self.buffer.fill(0)
-        self.buffer_index = 0
\ No newline at end of file
+        self.buffer_index = 0
@@ -1,91 +1,202 @@
 import numpy as np
-from ..base_effect import AudioEffect
+from ..base_effect import AudioEffect, param_slice
 from time import time
 
 class DelayEffect(AudioEffect):
-    def __init__(self, sample_rate=44100, delay_time=0.3, feedback=0.3, mix=0.5):
+    smoothed_params = ('feedback', 'mix')
+    MAX_CHANNELS = 2
+
+    def __init__(self, sample_rate=44100, delay_time=0.3, feedback=0.3, mix=0.5,
+                 max_delay_time=2.0, crossfade_time=0.05, ping_pong=False):
         super().__init__(sample_rate)
-        self.delay_time = delay_time  # Delay time in seconds
+        self.ping_pong = ping_pong  # Stereo repeats that alternate between left and right
+        self.max_delay_time = max_delay_time  # Longest delay the buffer can hold
+        self.crossfade_time = crossfade_time  # Read head crossfade on time changes
         self.feedback = feedback  # Feedback amount (0 to 1)
         self.mix = mix  # Wet/dry mix (0 to 1)
-        self.buffer_size = int(sample_rate * delay_time)
-        self.buffer = np.zeros(self.buffer_size)
-        self.buffer_index = 0
-        
+
+        self.delay_time = delay_time  # Delay time in seconds
+        self._allocate()
+        self._allocate_scratch()
+
         # Tap tempo variables
         self.tap_times = []
         self.max_tap_memory = 4  # Remember last 4 taps
         self.last_tap_time = 0
         self.tap_timeout = 2.0  # Reset tap memory after 2 seconds
 
+    @property
+    def output_channels(self):
+        # Fixed when the chain is compiled; rebuild the chain after changing ping_pong
+        return 2 if self.ping_pong else 1
+
+    def _allocate(self):
+        # The buffer is allocated once at the maximum delay time, one row per
+        # channel; changing the delay time only moves the read head
+        self.buffer_size = int(self.sample_rate * self.max_delay_time) + 1
+        self.buffer = np.zeros((self.MAX_CHANNELS, self.buffer_size), dtype=self.dtype)
+        self.buffer_index = 0
+
+        self.delay_samples = self._to_samples(self.delay_time)
+        self.next_delay_samples = None  # Read head being faded in, if any
+        self.fade_index = 0
+        self.fade_length = max(int(self.sample_rate * self.crossfade_time), 1)
+        self._fade_ramp = np.arange(1, self.fade_length + 1) / self.fade_length
+
+    def _allocate_scratch(self):
+        shape = (self.MAX_CHANNELS, self.max_block)
+        self._wet = np.zeros(shape, dtype=self.dtype)
+        self._next_wet = np.zeros(shape, dtype=self.dtype)
+        self._send = np.zeros(shape, dtype=self.dtype)
+        self._folded = np.zeros((1, self.max_block), dtype=self.dtype)
+        self._dry_gain = np.zeros(self.max_block)
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._allocate()
+
+    @property
+    def delay_time(self):
+        return self._delay_time
+
+    @delay_time.setter
+    def delay_time(self, value):
+        # Only a float is stored here, so it is safe to call from the GUI
+        # thread; the audio thread picks it up at the next chunk
+        self._delay_time = min(max(float(value), 0.0), self.max_delay_time)
+
     def tap_tempo(self):
         """Handle a tap tempo button press"""
         current_time = time()
-        
+
         # If it's been too long since last tap, reset
         if current_time - self.last_tap_time > self.tap_timeout:
             self.tap_times = []
-        
+
         # Add new tap time
         self.tap_times.append(current_time)
         self.last_tap_time = current_time
-        
+
         # Keep only recent taps
         if len(self.tap_times) > self.max_tap_memory:
             self.tap_times = self.tap_times[-self.max_tap_memory:]
-        
+
         # Calculate new delay time if we have enough taps
         if len(self.tap_times) >= 2:
             # Calculate average interval between taps
-            intervals = [self.tap_times[i] - self.tap_times[i-1] 
+            intervals = [self.tap_times[i] - self.tap_times[i-1]
                         for i in range(1, len(self.tap_times))]
             new_delay_time = sum(intervals) / len(intervals)
-            
-            # Update delay time and buffer
+
+            # Update delay time
             self.set_delay_time(new_delay_time)
-    
+
     def set_delay_time(self, delay_time):
-        """Update delay time and resize buffer if necessary"""
+        """Update delay time.
+
+        The buffer is never reallocated; the read head crossfades to the new
+        position while the next blocks are processed.
+        """
         self.delay_time = delay_time
-        new_buffer_size = int(self.sample_rate * delay_time)
-        
-        if new_buffer_size != self.buffer_size:
-            # Create new buffer with new size
-            new_buffer = np.zeros(new_buffer_size)
-            # Copy old buffer content if possible
-            copy_size = min(self.buffer_size, new_buffer_size)
-            new_buffer[:copy_size] = self.buffer[:copy_size]
-            
-            self.buffer = new_buffer
-            self.buffer_size = new_buffer_size
-            self.buffer_index = min(self.buffer_index, new_buffer_size - 1)
-
-    def _process_impl(self, audio_data):
-        # Convert input to mono if stereo
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-
-        output = np.zeros_like(audio_data)
-        for i in range(len(audio_data)):
-            # Get the delayed sample
-            delayed_sample = self.buffer[self.buffer_index]
-            
-            # Calculate new sample with feedback
-            new_sample = audio_data[i] + self.feedback * delayed_sample
-            
-            # Update buffer
-            self.buffer[self.buffer_index] = new_sample
-            
-            # Mix dry and wet signals
-            output[i] = (1 - self.mix) * audio_data[i] + self.mix * delayed_sample
-            
-            # Update buffer index
-            self.buffer_index = (self.buffer_index + 1) % self.buffer_size
-
-        return output
+
+    def _to_samples(self, delay_time):
+        return min(max(int(round(delay_time * self.sample_rate)), 1), self.buffer_size - 1)
+
+    def _read(self, start, out):
+        """Copy n samples of the first len(out) channels, starting at start,
+        into out (channels, n)."""
+        channels, n = out.shape
+        start %= self.buffer_size
+        first = min(n, self.buffer_size - start)
+        out[:, :first] = self.buffer[:channels, start:start + first]
+        out[:, first:] = self.buffer[:channels, :n - first]
+
+    def _write(self, start, data):
+        """Copy data (channels, n) into the ring buffer starting at start."""
+        channels, n = data.shape
+        first = min(n, self.buffer_size - start)
+        self.buffer[:channels, start:start + first] = data[:, :first]
+        self.buffer[:channels, :n - first] = data[:, first:]
+
+    def _process_into(self, inp, out):
+        # Work on (channels, frames) views; a mono delay keeps mono 1-D
+        num_samples = len(inp)
+        dry_channels = inp.T if inp.ndim > 1 else inp[None]
+        if len(dry_channels) > self.MAX_CHANNELS:
+            folded = self._folded[:, :num_samples]
+            np.mean(inp, axis=1, out=folded[0])
+            dry_channels = folded
+        output = out.T if out.ndim > 1 else out[None]
+        channels = len(output)
+
+        pos = 0
+        while pos < num_samples:
+            # Start a crossfade if the delay time changed and none is running
+            target = self._to_samples(self.delay_time)
+            if self.next_delay_samples is None and target != self.delay_samples:
+                self.next_delay_samples = target
+                self.fade_index = 0
+
+            # A chunk never exceeds the shortest active delay, so every
+            # sample it reads was written before the chunk started
+            n = min(num_samples - pos, self.delay_samples)
+            if self.next_delay_samples is not None:
+                n = min(n, self.next_delay_samples, self.fade_length - self.fade_index)
+
+            dry = dry_channels[:, pos:pos + n]
+            wet = self._wet[:channels, :n]
+            self._read(self.buffer_index - self.delay_samples, wet)
+
+            if self.next_delay_samples is not None:
+                next_wet = self._next_wet[:channels, :n]
+                self._read(self.buffer_index - self.next_delay_samples, next_wet)
+                next_wet -= wet
+                next_wet *= self._fade_ramp[self.fade_index:self.fade_index + n]
+                wet += next_wet
+                self.fade_index += n
+                if self.fade_index >= self.fade_length:
+                    self.delay_samples = self.next_delay_samples
+                    self.next_delay_samples = None
+
+            # Write input plus feedback, then mix dry and wet signals
+            feedback = param_slice(self.feedback, pos, pos + n)
+            mix = param_slice(self.mix, pos, pos + n)
+            send = self._send[:channels, :n]
+            if self.ping_pong:
+                # The input enters the left line only and each line feeds
+                # the other, so the repeats alternate between the sides
+                np.multiply(wet[::-1], feedback, out=send)
+                if len(dry) == 1:
+                    send[0] += dry[0]
+                else:
+                    # Stereo input enters as its mid signal
+                    mid = self._folded[0, :n]
+                    np.add(dry[0], dry[1], out=mid)
+                    mid *= 0.5
+                    send[0] += mid
+            else:
+                np.multiply(wet, feedback, out=send)
+                send += dry
+            self._write(self.buffer_index, send)
+
+            if isinstance(mix, np.ndarray):
+                dry_gain = self._dry_gain[:n]
+                np.subtract(1.0, mix, out=dry_gain)
+            else:
+                dry_gain = 1.0 - mix
+            block = output[:, pos:pos + n]
+            np.multiply(dry, dry_gain, out=block)
+            wet *= mix
+            block += wet
+
+            self.buffer_index = (self.buffer_index + n) % self.buffer_size
+            pos += n
 
     def reset(self):
         self.buffer.fill(0)
         self.buffer_index = 0
+        self.delay_samples = self._to_samples(self.delay_time)
+        self.next_delay_samples = None
+        self.fade_index = 0
         self.tap_times = []
-        self.last_tap_time = 0
\ No newline at end of file
+        self.last_tap_time = 0
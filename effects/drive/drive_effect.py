@@ -1,35 +1,82 @@
 import numpy as np
-from ..base_effect import AudioEffect
+from ..base_effect import AudioEffect, OnePoleFilter, per_frame
 
 class DriveEffect(AudioEffect):
-    def __init__(self, sample_rate=44100, drive=5.0, tone=0.2, level=1.0):
+    OVERSAMPLING_FACTORS = (1, 2, 4, 8)
+    smoothed_params = ('drive', 'level')
+
+    def __init__(self, sample_rate=44100, drive=5.0, tone=0.2, level=1.0, oversampling=1):
         super().__init__(sample_rate)
         self.drive = drive  # Drive amount (1.0 to 10.0)
         self.tone = tone   # Tone control (0.0 to 1.0)
         self.level = level # Output level (0.0 to 1.0)
+        self.oversampler = None
+        self._allocate_scratch()
+        self.set_oversampling(oversampling)
+
+    @property
+    def latency(self):
+        return self.oversampler.latency if self.oversampler is not None else 0
+
+    @property
+    def oversampling(self):
+        return self.oversampler.factor if self.oversampler is not None else 1
+
+    def set_oversampling(self, factor):
+        """Select the oversampling factor used around the nonlinearity.
+
+        Args:
+            factor (int): 1 (off), 2, 4 or 8
+        """
+        factor = int(factor)
+        if factor not in self.OVERSAMPLING_FACTORS:
+            raise ValueError(f'Oversampling factor must be one of {self.OVERSAMPLING_FACTORS}')
+        # Built off the audio thread and swapped in with a single assignment
+        self.oversampler = self._make_oversampler(factor)
+
+    def _make_oversampler(self, factor):
+        """Minimum-phase half-band cascade for the prepared block and channels."""
+        if factor == 1:
+            return None
+        from oversampling import Oversampler  # Pulls in scipy, see AudioEngine.warm_up
+        return Oversampler(factor, 'minimum', self.max_block, self.channels)
 
-    def _process_impl(self, audio_data):
-        # Convert input to mono if stereo
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
+    def _allocate_scratch(self):
+        self._driven = np.zeros(self.max_block * self.channels, dtype=self.dtype)
+        self.tone_filter = OnePoleFilter(self.channels, self.max_block)
+        # Drive ramp repeated to the highest oversampled rate
+        self._drive_up = np.zeros(self.max_block * self.OVERSAMPLING_FACTORS[-1])
+        if self.oversampler is not None:
+            self.oversampler = self._make_oversampler(self.oversampler.factor)
 
-        # Apply drive
-        driven = np.tanh(audio_data * self.drive)
+    def _process_into(self, inp, out):
+        # Every channel is processed in the same vectorized pass
 
-        # Apply tone control (simple low-pass filter)
-        output = np.zeros_like(driven)
-        last_sample = 0
-        for i in range(len(driven)):
-            # Mix between raw and filtered signal based on tone control
-            filtered = last_sample * self.tone + driven[i] * (1 - self.tone)
-            output[i] = filtered
-            last_sample = filtered
+        # Apply drive, at the oversampled rate if enabled
+        oversampler = self.oversampler
+        if oversampler is not None:
+            driven = oversampler.upsample(inp)
+            drive = self.drive
+            if isinstance(drive, np.ndarray):
+                repeated = self._drive_up[:len(drive) * oversampler.factor]
+                repeated.reshape(len(drive), oversampler.factor)[...] = drive[:, None]
+                drive = repeated
+            driven *= per_frame(drive, driven)
+            np.tanh(driven, out=driven)
+            driven = oversampler.downsample(driven)
+        else:
+            driven = self._driven[:inp.size].reshape(inp.shape)
+            np.multiply(inp, per_frame(self.drive, inp), out=driven)
+            np.tanh(driven, out=driven)
 
-        # Apply output level
-        output *= self.level
+        # Apply tone control (one-pole low-pass, state carried across blocks)
+        self.tone_filter.process(driven.T, out.T, self.tone, 1 - self.tone)
 
-        # Ensure the output is within [-1, 1] range
-        return np.clip(output, -1, 1)
+        # Apply output level, within the [-1, 1] range
+        np.multiply(out, per_frame(self.level, out), out=out)
+        np.clip(out, -1, 1, out=out)
 
     def reset(self):
-        pass  # No internal state to reset
\ No newline at end of file
+        self.tone_filter.reset()
+        if self.oversampler is not None:
+            self.oversampler.reset()
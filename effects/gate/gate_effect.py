@@ -0,0 +1,146 @@
+import numpy as np
+from ..base_effect import AudioEffect, OnePoleFilter, per_frame
+
+class NoiseGateEffect(AudioEffect):
+    """Noise gate with hysteresis, hold, and linear attack/release ramps.
+
+    A one-pole envelope follower tracks the rectified input (the loudest
+    channel). The gate opens when the envelope reaches ``threshold`` and
+    closes once it has stayed below ``threshold - hysteresis`` for
+    ``hold`` ms. Every step runs on whole blocks in preallocated scratch:
+    the open/closed state is found by forward-filling the last open and
+    close events, and the gain ramps only loop over the few state changes
+    inside a block.
+
+    ``closed`` is True after a block the gate muted completely; the
+    signal chain uses it to stop running the stages behind the gate.
+    """
+    ENVELOPE_TIME = 0.002  # Envelope follower time constant in seconds
+
+    def __init__(self, sample_rate=44100, threshold=-60.0, hysteresis=6.0, attack=1.0,
+                 hold=50.0, release=100.0):
+        super().__init__(sample_rate)
+        self.threshold = threshold  # Opening level in dBFS
+        self.hysteresis = hysteresis  # Closing level below the opening level, in dB
+        self.attack = attack  # Fade in time in ms
+        self.hold = hold  # Time below the closing level before closing, in ms
+        self.release = release  # Fade out time in ms
+        self._allocate_scratch()
+        self.reset()
+
+    def _allocate_scratch(self):
+        n = self.max_block
+        self._rectified = np.zeros(n * self.channels, dtype=self.dtype)
+        self._level = np.zeros(n, dtype=self.dtype)
+        self._envelope = np.zeros(n)
+        self.envelope_filter = OnePoleFilter(1, n)
+        self._index = np.arange(n)
+        self._ramp = np.arange(1, n + 1, dtype=self.dtype)
+        self._gain = np.zeros(n, dtype=self.dtype)
+        self._since_loud = np.zeros(n, dtype=np.intp)
+        self._last_open = np.zeros(n, dtype=np.intp)
+        self._last_close = np.zeros(n, dtype=np.intp)
+        self._loud = np.zeros(n, dtype=bool)
+        self._events = np.zeros(n, dtype=bool)
+        self._is_open = np.zeros(n, dtype=bool)
+        self._changed = np.zeros(n, dtype=bool)
+
+    def _process_into(self, inp, out):
+        n = len(inp)
+        if n == 0:
+            return
+        coefficient = np.exp(-1.0 / (self.ENVELOPE_TIME * self.sample_rate))
+        open_level = 10 ** (self.threshold / 20)
+        close_level = 10 ** ((self.threshold - self.hysteresis) / 20)
+
+        peak = max(inp.max(), -inp.min())
+        if not self.is_open and self.gain == 0.0 and peak < close_level:
+            # Closed and quiet: the envelope cannot reach the closing level,
+            # so the block is muted without tracking it. Its state moves
+            # towards an upper bound of the true envelope.
+            decay = coefficient ** n
+            envelope = self.envelope_filter.state
+            envelope *= decay
+            envelope += (1.0 - decay) * peak
+            self.quiet_samples = min(self.quiet_samples + n, 1 << 30)
+            self.closed = True
+            out.fill(0)
+            return
+
+        level = self._level[:n]
+        if inp.ndim > 1:
+            rectified = self._rectified[:inp.size].reshape(inp.shape)
+            np.abs(inp, out=rectified)
+            np.max(rectified, axis=1, out=level)
+        else:
+            np.abs(inp, out=level)
+        envelope = self._envelope[:n]
+        self.envelope_filter.process(level, envelope, coefficient, 1.0 - coefficient)
+
+        # Samples since the envelope was last at or above the closing level,
+        # counting on from the previous block. A close event needs at least
+        # one quiet sample, however short the hold.
+        index = self._index[:n]
+        loud = self._loud[:n]
+        np.greater_equal(envelope, close_level, out=loud)
+        since_loud = self._since_loud[:n]
+        since_loud.fill(-1 - self.quiet_samples)
+        np.copyto(since_loud, index, where=loud)
+        np.maximum.accumulate(since_loud, out=since_loud)
+        self.quiet_samples = min(n - 1 - int(since_loud[-1]), 1 << 30)
+        np.subtract(index, since_loud, out=since_loud)
+
+        events = self._events[:n]
+        np.greater_equal(since_loud, max(self.hold * self.sample_rate / 1000, 1), out=events)
+        last_close = self._last_event(events, self._last_close[:n])
+        np.greater_equal(envelope, open_level, out=events)
+        last_open = self._last_event(events, self._last_open[:n])
+
+        # The latest event decides; before the first one the gate keeps its state
+        is_open = self._is_open[:n]
+        np.greater(last_open, last_close, out=is_open)
+        np.maximum(last_open, last_close, out=last_close)
+        is_open[:np.searchsorted(last_close, 0)] = self.is_open
+        self.is_open = bool(is_open[-1])
+
+        gain = self._gain_ramps(is_open)
+        self.closed = not gain.any()
+        np.multiply(inp, per_frame(gain, inp), out=out)
+
+    def _last_event(self, events, out):
+        """Index of the latest event at or before every sample, -1 before the first."""
+        out.fill(-1)
+        np.copyto(out, self._index[:len(out)], where=events)
+        np.maximum.accumulate(out, out=out)
+        return out
+
+    def _gain_ramps(self, is_open):
+        """Linear ramps towards 1 while open and towards 0 while closed."""
+        n = len(is_open)
+        attack_step = 1000.0 / max(self.attack * self.sample_rate, 1.0)
+        release_step = 1000.0 / max(self.release * self.sample_rate, 1.0)
+        changed = self._changed[:n]
+        changed[0] = False
+        np.not_equal(is_open[1:], is_open[:-1], out=changed[1:])
+        gain = self._gain[:n]
+        value = self.gain
+        start = 0
+        while start < n:
+            rest = changed[start + 1:]
+            stop = start + 1 + int(rest.argmax()) if rest.any() else n
+            step = attack_step if is_open[start] else -release_step
+            segment = gain[start:stop]
+            np.multiply(self._ramp[:stop - start], step, out=segment)
+            segment += value
+            np.clip(segment, 0.0, 1.0, out=segment)
+            value = float(segment[-1])
+            start = stop
+        self.gain = value
+        return gain
+
+    def reset(self):
+        self.envelope_filter.reset()
+        self.quiet_samples = 1 << 30
+        self.is_open = False
+        self.gain = 0.0
+        self.closed = False
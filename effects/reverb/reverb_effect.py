@@ -1,90 +1,262 @@
 import numpy as np
-from ..base_effect import AudioEffect
+from ..base_effect import AudioEffect, OnePoleFilter, param_slice
+
+# Freeverb tunings, in samples at 44.1 kHz
+COMB_TUNINGS = [1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617]
+ALLPASS_TUNINGS = [556, 441, 341, 225]
+STEREO_SPREAD = 23
+
+class _DelayLineBank:
+    """A set of fixed-length ring buffers read and written as one 2D block.
+
+    Every line lives in a row of one flat buffer. A precomputed index table
+    maps (line, position + offset) to a flat buffer index, so a chunk of up
+    to ``max_chunk`` samples is gathered from all lines with two
+    ``np.take`` calls, through the table and then the buffer, into
+    preallocated scratch, without wrap-around branches.
+    The scratch views and offset ramps for a chunk size are made on its
+    first use and kept, so a steady block size costs a fixed handful of
+    NumPy calls per chunk, whatever the number of lines.
+    """
+
+    def __init__(self, lengths, max_chunk):
+        self.lengths = np.asarray(lengths, dtype=np.intp)
+        self.num_lines = len(self.lengths)
+        self.max_chunk = max_chunk
+        max_length = int(self.lengths.max())
+
+        self.buffer = np.zeros(self.num_lines * max_length)
+        self.positions = np.zeros(self.num_lines, dtype=np.intp)
+
+        # table[i, j] = flat index of sample (j mod length_i) on line i
+        table_width = max_length + max_chunk
+        offsets = np.arange(table_width)
+        table = (offsets[None, :] % self.lengths[:, None]) + (np.arange(self.num_lines) * max_length)[:, None]
+        self.table = table.ravel()
+        self.row_starts = np.arange(self.num_lines, dtype=np.intp) * table_width
+        self.ramp = np.arange(max_chunk, dtype=np.intp)
+
+        # Scratch reused on every call, with (lines, n) views and a ramp of
+        # offsets per line cached per chunk size
+        self._lookup = np.zeros(self.num_lines * max_chunk, dtype=np.intp)
+        self._indices = np.zeros(self.num_lines * max_chunk, dtype=np.intp)
+        self._output = np.zeros(self.num_lines * max_chunk)
+        self._starts = np.zeros((self.num_lines, 1), dtype=np.intp)
+        self._views = {}
+
+    def _scratch(self, n):
+        views = self._views.get(n)
+        if views is None:
+            size = self.num_lines * n
+            views = tuple(a[:size].reshape(self.num_lines, n)
+                          for a in (self._lookup, self._indices, self._output))
+            views += (np.tile(self.ramp[:n], (self.num_lines, 1)),)
+            self._views[n] = views
+        return views
+
+    def read(self, n, out=None):
+        """Gather the next n samples from every line into out, or into
+        scratch; returns the (lines, n) result."""
+        lookup, indices, output, ramps = self._scratch(n)
+        if out is not None:
+            output = out
+        np.add(self.row_starts, self.positions, out=self._starts[:, 0])
+        # Broadcasting ufuncs and take in 'raise' mode buffer their output,
+        # so the start is copied across and the indices are known in range
+        np.copyto(lookup, self._starts)
+        lookup += ramps
+        self.table.take(lookup, out=indices, mode='clip')
+        self.buffer.take(indices, out=output, mode='clip')
+        return output
+
+    def write(self, data):
+        """Store data at the positions returned by the last read and advance."""
+        n = data.shape[1]
+        self.buffer[self._scratch(n)[1]] = data
+        self.positions += n
+        self.positions %= self.lengths
+
+    def reset(self):
+        self.buffer.fill(0)
+        self.positions.fill(0)
 
 class ReverbEffect(AudioEffect):
-    def __init__(self, sample_rate=44100, room_size=0.5, damping=0.5, mix=0.3):
+    """Freeverb: eight damped feedback combs per side into four series allpasses.
+
+    Audio runs in chunks shorter than every delay line, so everything a
+    chunk reads from the lines was written by earlier chunks. All comb
+    and allpass lines are then read with one gather and written with one
+    scatter. Apart from the combs' damping filters the network is linear
+    in what a chunk reads and its dry input. The comb feedback, the
+    allpass cascade and, for a fixed mix, the stereo mix are one matrix,
+    applied with a single matmul per chunk. The matrix is rebuilt when a
+    parameter changes.
+
+    Every chunk costs the same fixed set of NumPy calls, so blocks up to
+    the shortest line (244 samples at 48 kHz) pay that overhead once per
+    call, and longer blocks once per chunk. The cost per sample falls
+    about fourfold from 32-frame to 256-frame blocks and hardly at all
+    beyond.
+    """
+    output_channels = 2
+    smoothed_params = ('mix',)
+
+    def __init__(self, sample_rate=44100, room_size=0.5, damping=0.5, mix=0.3, width=1.0):
         super().__init__(sample_rate)
         self.room_size = room_size  # Size of the virtual room (0.0 to 1.0)
         self.damping = damping      # High frequency damping (0.0 to 1.0)
         self.mix = mix              # Wet/dry mix (0.0 to 1.0)
-        
-        # Initialize delay lines for early reflections and late reverberation
-        self.early_delays = [int(sample_rate * t) for t in [0.01, 0.015, 0.02, 0.025]]
-        self.late_delays = [int(sample_rate * t) for t in [0.03, 0.035, 0.04, 0.045]]
-        
-        # Create buffers for each delay line
-        self.early_buffers = [np.zeros(delay) for delay in self.early_delays]
-        self.late_buffers = [np.zeros(delay) for delay in self.late_delays]
-        
-        # Buffer indices
-        self.early_indices = [0] * len(self.early_delays)
-        self.late_indices = [0] * len(self.late_delays)
-        
-        # Feedback coefficients
-        self.early_gains = [0.7, 0.6, 0.5, 0.4]
-        self.late_gains = [0.3, 0.25, 0.2, 0.15]
-
-    def _process_impl(self, audio_data):
-        # Convert input to mono if stereo
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-
-        # Pre-allocate arrays for better performance
-        buffer_size = len(audio_data)
-        early_reflections = np.zeros(buffer_size)
-        late_reverb = np.zeros(buffer_size)
-
-        # Process early reflections
-        for i, (buffer, index, gain) in enumerate(zip(self.early_buffers, self.early_indices, self.early_gains)):
-            # Ensure buffer is large enough
-            if len(buffer) < buffer_size:
-                new_buffer = np.zeros(buffer_size)
-                new_buffer[:len(buffer)] = buffer
-                self.early_buffers[i] = new_buffer
-                buffer = new_buffer
-
-            # Get delayed samples
-            indices = np.mod(np.arange(buffer_size) + index, buffer_size)
-            early_reflections += buffer[indices] * gain * self.room_size
-            
-            # Update buffer
-            buffer[indices] = audio_data
-            self.early_indices[i] = (index + buffer_size) % buffer_size
-
-        # Process late reverberation
-        for i, (buffer, index, gain) in enumerate(zip(self.late_buffers, self.late_indices, self.late_gains)):
-            # Ensure buffer is large enough
-            if len(buffer) < buffer_size:
-                new_buffer = np.zeros(buffer_size)
-                new_buffer[:len(buffer)] = buffer
-                self.late_buffers[i] = new_buffer
-                buffer = new_buffer
-
-            # Get delayed samples with damping
-            indices = np.mod(np.arange(buffer_size) + index, buffer_size)
-            damped = buffer[indices] * (1 - self.damping)
-            late_reverb += damped * gain * self.room_size
-            
-            # Update buffer with input + early reflections feedback
-            buffer[indices] = audio_data + early_reflections * 0.5
-            self.late_indices[i] = (index + buffer_size) % buffer_size
-
-        # Mix dry and wet signals (vectorized)
-        output = (1 - self.mix) * audio_data + self.mix * (early_reflections + late_reverb)
-
-        # Ensure output is within [-1, 1] range and matches input shape
-        output = np.clip(output, -1, 1)
-        if len(audio_data.shape) > 1:
-            output = np.column_stack((output, output))
-        return output
+        self.width = width          # Stereo width of the wet signal (0.0 to 1.0)
+
+        self.input_gain = 0.015
+        self.wet_gain = 3.0
+        self.allpass_feedback = 0.5
+        self._allocate()
+        self._allocate_scratch()
+
+    def _allocate(self):
+        # Delay lengths depend only on the sample rate, never on block size.
+        # Left lines come first, right lines are offset by the stereo spread;
+        # the allpasses follow as a left/right pair per diffuser in series order
+        scale = self.sample_rate / 44100
+        comb_lengths = [max(int(t * scale), 1) for t in COMB_TUNINGS]
+        comb_lengths += [max(int((t + STEREO_SPREAD) * scale), 1) for t in COMB_TUNINGS]
+        allpass_lengths = []
+        for t in ALLPASS_TUNINGS:
+            allpass_lengths += [max(int(t * scale), 1), max(int((t + STEREO_SPREAD) * scale), 1)]
+        self.num_combs = len(comb_lengths)
+        self.lines = _DelayLineBank(comb_lengths + allpass_lengths, min(comb_lengths + allpass_lengths))
+        self.max_chunk = self.lines.max_chunk
+        self.damping_filter = OnePoleFilter(self.num_combs, self.max_chunk)
+
+        # Signals of a chunk: line reads, damped comb outputs, dry input;
+        # the matrix maps them to line writes and two output rows
+        self._network = np.zeros((self.lines.num_lines + 2, self.lines.num_lines + self.num_combs + 2))
+        self._network_key = None
+        self._cascade = np.zeros((2, self._network.shape[1]))
+
+    def _allocate_scratch(self):
+        # The network runs in float64 like the damping filter; only the
+        # input and output are float32. Flat, so the (rows, n) view of
+        # every chunk size is contiguous.
+        n = min(self.max_block, self.max_chunk)
+        rows, columns = self._network.shape
+        self._signals = np.zeros(columns * n)
+        self._results = np.zeros(rows * n)
+        self._mixed = np.zeros((2, n))
+        self._gains = np.zeros((3, n))
+        self._folded = np.zeros(self.max_block, dtype=self.dtype)
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._allocate()
+        self._allocate_scratch()
+
+    def _update_network(self, feedback, mix):
+        """Fill the network matrix; mix is None when it ramps, and the
+        output rows are then the wet signal alone."""
+        key = (feedback, mix, self.width, self.wet_gain, self.input_gain, self.allpass_feedback)
+        if key == self._network_key:
+            return
+        network = self._network
+        network.fill(0)
+        combs, half = self.num_combs, self.num_combs // 2
+        lines = self.lines.num_lines
+        damped, dry = lines, lines + combs
+
+        # Comb writes: damped output times feedback, plus the scaled input
+        for i in range(combs):
+            network[i, damped + i] = feedback
+            network[i, dry + i // half] = self.input_gain
+
+        # Allpasses: the input u of a diffuser is the sum of that side's
+        # combs for the first one. It writes u + g * read and passes
+        # read - u on to the next.
+        cascade = self._cascade
+        cascade.fill(0)
+        for side in range(2):
+            cascade[side, side * half:(side + 1) * half] = 1.0
+        for line in range(combs, lines):
+            side = (line - combs) % 2
+            network[line] = cascade[side]
+            network[line, line] += self.allpass_feedback
+            cascade[side] *= -1
+            cascade[side, line] += 1.0
+
+        # Output: each side takes wet1 of its own wet signal and wet2 of
+        # the other side's
+        outputs = network[lines:]
+        if mix is None:
+            outputs[...] = cascade
+        else:
+            wet1 = self.wet_gain * (self.width / 2 + 0.5) * mix
+            wet2 = self.wet_gain * ((1 - self.width) / 2) * mix
+            for side in range(2):
+                outputs[side] = cascade[side]
+                outputs[side] *= wet1
+                outputs[side] += wet2 * cascade[1 - side]
+                outputs[side, dry + side] += 1 - mix
+        self._network_key = key
+
+    def _process_into(self, inp, out):
+        # Keep two channels; mono input feeds both sides
+        if inp.ndim == 1:
+            dry = np.broadcast_to(inp, (2, len(inp)))
+        elif inp.shape[1] == 2:
+            dry = inp.T
+        else:
+            mono = self._folded[:len(inp)]
+            np.mean(inp, axis=1, out=mono)
+            dry = np.broadcast_to(mono, (2, len(inp)))
+
+        max_chunk = self._mixed.shape[1]
+        for start in range(0, len(inp), max_chunk):
+            stop = start + max_chunk
+            chunk = dry[:, start:stop]
+            self._process_chunk(chunk, out[start:start + chunk.shape[1]],
+                                param_slice(self.mix, start, stop))
+
+        # Ensure output is within [-1, 1] range
+        np.clip(out, -1, 1, out=out)
+
+    def _process_chunk(self, dry, output, mix):
+        n = dry.shape[1]
+        feedback = self.room_size * 0.28 + 0.7
+        damp = self.damping * 0.4
+        ramped = isinstance(mix, np.ndarray)
+        self._update_network(feedback, None if ramped else mix)
+        lines, combs = self.lines.num_lines, self.num_combs
+
+        # Every line's output for the chunk, the damped comb outputs and
+        # the dry input, then the whole linear network at once
+        signals = self._signals[:self._network.shape[1] * n].reshape(-1, n)
+        self.lines.read(n, out=signals[:lines])
+        self.damping_filter.process(signals[:combs], signals[lines:lines + combs], damp, 1 - damp)
+        signals[lines + combs:] = dry
+        results = self._results[:self._network.shape[0] * n].reshape(-1, n)
+        np.matmul(self._network, signals, out=results)
+        self.lines.write(results[:lines])
+
+        output = output.T
+        if not ramped:
+            output[...] = results[lines:]
+            return
+        # A ramping mix weighs every sample differently
+        wet = results[lines:]
+        wet1 = self.wet_gain * (self.width / 2 + 0.5)
+        wet2 = self.wet_gain * ((1 - self.width) / 2)
+        dry_gain, wet1_gain, wet2_gain = self._gains[:, :n]
+        np.subtract(1.0, mix, out=dry_gain)
+        np.multiply(mix, wet1, out=wet1_gain)
+        np.multiply(mix, wet2, out=wet2_gain)
+        mixed = self._mixed[:, :n]
+        np.multiply(dry, dry_gain, out=output)
+        np.multiply(wet, wet1_gain, out=mixed)
+        output += mixed
+        np.multiply(wet[::-1], wet2_gain, out=mixed)
+        output += mixed
 
     def reset(self):
-        # Clear all delay buffers
-        for buffer in self.early_buffers:
-            buffer.fill(0)
-        for buffer in self.late_buffers:
-            buffer.fill(0)
-        
-        # Reset indices
-        self.early_indices = [0] * len(self.early_delays)
-        self.late_indices = [0] * len(self.late_delays)
\ No newline at end of file
+        # Clear all delay lines and filter state
+        self.lines.reset()
+        self.damping_filter.reset()
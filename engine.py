@@ -0,0 +1,906 @@
+"""GUI-free audio engine: the signal chain, models, presets and streams.
+
+Nothing here imports tkinter. sounddevice, soundfile, nam_binding and
+scipy are imported where they are first needed, so the engine starts
+(and can run audio through the effects) without waiting for them;
+``warm_up`` imports the heavy ones on the loader thread right after
+construction. ``audio_player`` builds the Tk GUI on top of this module
+and ``daemon`` runs it headless.
+"""
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import numpy as np
+from effects.gate.gate_effect import NoiseGateEffect
+from effects.chorus.chorus_effect import ChorusEffect
+from effects.drive.drive_effect import DriveEffect
+from effects.delay.delay_effect import DelayEffect
+from effects.reverb.reverb_effect import ReverbEffect
+from signal_chain import SignalChain, GainControl, order_to_config, order_from_config
+from profiler import CallbackProfiler, LevelMeter
+from model_cache import ModelCache, MODEL_SLOTS
+from model_library import ModelLibrary
+from block_scheduler import LOW_LATENCY_BLOCK_SIZES, BlockSizeTuner
+
+DEFAULT_CHAIN_ORDER = ['gate', 'chorus', 'drive', 'nam_pedal', 'nam', 'ir', 'delay', 'reverb']
+DEFAULT_BLOCK_SIZE = 1024
+PIPELINED_STAGES = ('nam_pedal', 'nam')  # Stages moved to worker threads in pipelined mode
+
+class AudioEngine:
+    """The rig without a user interface.
+
+    Controls are plain method calls meant for one control thread (the Tk
+    main loop or the daemon's socket loop), which is the only writer of
+    the chain's parameter queue. Models load on the model cache's loader
+    thread and audio runs on the sounddevice callback thread.
+    """
+
+    def __init__(self):
+        self.playback = None  # FileStreamer of the loaded audio file
+        self.sample_rate = self.device_sample_rate()  # Engine rate, see set_sample_rate
+        self.playing = False
+        self.stream = None
+        self.effect_chain = []
+        self.input_stream = None
+        self.output_stream = None
+        self.is_monitoring = False
+        self.block_size = DEFAULT_BLOCK_SIZE  # Largest block the chain and models are prepared for
+        self.device_block_size = self.block_size  # Frames per device callback, at most block_size
+        self.block_tuner = None  # BlockSizeTuner in low-latency mode
+        self.callback_errors = 0  # Errors caught in the audio callback
+        self.last_callback_error = None
+        self.last_stream_status = None
+        
+        # Initialize effects
+        self.gate = NoiseGateEffect(self.sample_rate)
+        self.chorus = ChorusEffect(self.sample_rate, stereo=True)
+        self.drive = DriveEffect(self.sample_rate)
+        self.nam_processor = None
+        self.nam_pedal_processor = None
+        self.ir_processor = None
+        self.model_paths = {'nam': None, 'nam_pedal': None, 'ir': None}
+        self.model_cache = ModelCache()
+        self.presets = []  # Rig snapshots, see store_preset
+        self.preset_index = None
+        self.preload_count = 2  # Presets after the current one kept loaded
+        self._library = None  # ModelLibrary, opened on first use, see library
+        self._library_lock = threading.Lock()
+        # Scans get their own thread, so a long one never holds up model loads
+        self.scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='library-scan')
+        self.delay = DelayEffect(self.sample_rate)
+        self.reverb = ReverbEffect(self.sample_rate)
+        
+        # Effect states
+        self.effect_states = {
+            'gate': False,
+            'chorus': False,
+            'drive': False,
+            'nam': False,
+            'nam_pedal': False,
+            'ir': False,
+            'delay': False,
+            'reverb': False
+        }
+
+        # Effect parameters
+        self.effect_params = {
+            'gate': {
+                'threshold': {'value': -60.0, 'min': -90.0, 'max': -20.0, 'label': 'Threshold (dB)'},
+                'attack': {'value': 1.0, 'min': 0.1, 'max': 50.0, 'label': 'Attack (ms)'},
+                'hold': {'value': 50.0, 'min': 0.0, 'max': 500.0, 'label': 'Hold (ms)'},
+                'release': {'value': 100.0, 'min': 5.0, 'max': 1000.0, 'label': 'Release (ms)'}
+            },
+            'chorus': {
+                'rate': {'value': 1.0, 'min': 0.1, 'max': 5.0, 'label': 'Rate (Hz)'},
+                'depth': {'value': 0.002, 'min': 0.0001, 'max': 0.01, 'label': 'Depth (s)'},
+                'mix': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
+            },
+            'drive': {
+                'drive': {'value': 1.0, 'min': 1.0, 'max': 10.0, 'label': 'Drive'},
+                'tone': {'value': 0.7, 'min': 0.0, 'max': 1.0, 'label': 'Tone'},
+                'level': {'value': 1.0, 'min': 0.0, 'max': 1.0, 'label': 'Level'},
+                'oversampling': {'value': 1, 'min': 1, 'max': 8, 'label': 'Oversampling',
+                                 'options': list(DriveEffect.OVERSAMPLING_FACTORS)}
+            },
+            'delay': {
+                'delay_time': {'value': 0.3, 'min': 0.05, 'max': 1.0, 'label': 'Time (s)'},
+                'feedback': {'value': 0.3, 'min': 0.0, 'max': 0.9, 'label': 'Feedback'},
+                'mix': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
+            },
+            'reverb': {
+                'room_size': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Room Size'},
+                'damping': {'value': 0.5, 'min': 0.0, 'max': 1.0, 'label': 'Damping'},
+                'mix': {'value': 0.3, 'min': 0.0, 'max': 1.0, 'label': 'Mix'}
+            },
+            'ir': {
+                'volume': {'value': 1.0, 'min': 0.0, 'max': 2.0, 'label': 'Volume'}
+            }
+        }
+
+        # Compiled signal chain; stages are swapped in as models are loaded
+        self.ir_gain = GainControl(self.effect_params['ir']['volume']['value'])
+        # Device buffers go in as they are; only mono NAM stages downmix.
+        # With the gate on, an idle rig skips every stage behind it
+        self.chain = SignalChain(DEFAULT_CHAIN_ORDER, block_size=self.block_size,
+                                 sample_rate=self.sample_rate, input_channels=2,
+                                 idle_stage='gate')
+        self.chain.add_stage('gate', self.gate)
+        self.chain.add_stage('chorus', self.chorus)
+        self.chain.add_stage('drive', self.drive)
+        self.chain.add_stage('nam_pedal')
+        self.chain.add_stage('nam')
+        self.chain.add_stage('ir', gain=self.ir_gain)
+        self.chain.add_stage('delay', self.delay)
+        self.chain.add_stage('reverb', self.reverb)
+        self.profiler = CallbackProfiler()
+        self.chain.set_profiler(self.profiler)
+        self.input_meter = LevelMeter()
+        self.output_meter = LevelMeter()
+
+        # Parameter changes reach the effects through the chain's queue and
+        # are applied on the audio thread as per-block or per-sample ramps
+        for effect_name, target in (('gate', self.gate), ('chorus', self.chorus), ('drive', self.drive),
+                                    ('delay', self.delay), ('reverb', self.reverb),
+                                    ('ir', self.ir_gain)):
+            for param_name, info in self.effect_params[effect_name].items():
+                if 'options' in info:
+                    continue
+                attribute = 'value' if target is self.ir_gain else param_name
+                self.chain.parameters.register((effect_name, param_name), target, attribute,
+                                               per_sample=attribute in target.smoothed_params)
+
+        # Parameters with options rebuild part of an effect instead, on the
+        # loader thread
+        self._option_setters = {('drive', 'oversampling'): self.drive.set_oversampling}
+
+        # Queued first, so every model load runs after it
+        self.model_cache.submit(self.warm_up)
+
+    @staticmethod
+    def warm_up():
+        """Import the libraries that stages load lazily, off the audio thread.
+
+        The effects filter with OnePoleFilter and need none of them. The
+        Drive oversampler and the resamplers design their filters with
+        scipy.signal, IRs and files go through soundfile and scipy.fft, and
+        NAM models need nam_binding. Loading one of these before this has
+        finished waits for the import.
+        """
+        import scipy.fft
+        import scipy.signal  # Oversampler and StreamingResampler filter design
+        import soundfile
+        try:
+            import nam_binding
+        except ImportError as e:
+            print(f'NAM models unavailable: {e}')
+            return
+        if not hasattr(nam_binding.NAMProcessor, 'process_into'):
+            print('nam_binding predates process_into; NAM stages copy every block. '
+                  'Rebuild it with: python setup.py build_ext --inplace')
+
+    @staticmethod
+    def device_sample_rate(default=44100):
+        """Native rate of the default output device, or default if unknown."""
+        try:
+            import sounddevice as sd
+            return int(sd.query_devices(kind='output')['default_samplerate'])
+        except Exception:
+            return default
+
+    def set_sample_rate(self, sample_rate):
+        """Switch the engine to a new sample rate.
+
+        Effects, parameter ramps and model processors are rebuilt here, once,
+        and never on the audio thread; call while no stream is running. NAM
+        models keep running at the rate they were trained at, behind a
+        resampler when it differs from the engine rate.
+        """
+        sample_rate = int(sample_rate)
+        if sample_rate == self.sample_rate:
+            return True
+        try:
+            processors = self._resolve_models(self.model_paths, sample_rate)
+        except Exception as e:
+            print(f'Error switching to {sample_rate} Hz: {e}')
+            return False
+
+        self.sample_rate = sample_rate
+        for effect in (self.gate, self.chorus, self.drive, self.delay, self.reverb):
+            effect.set_sample_rate(sample_rate)
+        self._release_models(self.chain.set_stages(processors))
+        self.chain.set_sample_rate(sample_rate)
+        for slot, processor in processors.items():
+            self._set_processor(slot, processor)
+        if self.playback is not None:
+            self.playback.set_output_rate(sample_rate)
+        print(f'Engine sample rate: {sample_rate} Hz')
+        return True
+
+    def set_block_size(self, block_size):
+        """Prepare the chain and the models for blocks of up to block_size.
+
+        The device block is reset to the same size. Call while no stream
+        is running.
+        """
+        block_size = int(block_size)
+        try:
+            processors = self._resolve_models(self.model_paths, self.sample_rate, block_size)
+        except Exception as e:
+            print(f'Error switching to {block_size}-frame blocks: {e}')
+            return False
+        self.block_size = self.device_block_size = block_size
+        self.chain.prepare(block_size)
+        self._release_models(self.chain.set_stages(processors))
+        for slot, processor in processors.items():
+            self._set_processor(slot, processor)
+        return True
+
+    def set_low_latency(self, enabled):
+        """Switch between default blocks and low-latency mode.
+
+        In low-latency mode the chain and models are prepared for the
+        largest of LOW_LATENCY_BLOCK_SIZES, and while monitoring a
+        BlockSizeTuner steps the device block down to the smallest size
+        the callback keeps up with (see maintain). Call while no stream
+        is running.
+        """
+        block_size = max(LOW_LATENCY_BLOCK_SIZES) if enabled else DEFAULT_BLOCK_SIZE
+        if block_size != self.block_size and not self.set_block_size(block_size):
+            return False
+        self.device_block_size = block_size
+        self.block_tuner = BlockSizeTuner() if enabled else None
+        print(f"Low latency mode: {'ON' if enabled else 'OFF'}")
+        return True
+
+    def set_pipelined(self, enabled):
+        """Run the NAM stages on worker threads, one block behind each other.
+
+        With two models loaded they then use two cores, at the cost of one
+        device block of latency per pipelined stage (see get_latency).
+        Call while no stream is running.
+        """
+        self.chain.set_pipelined(PIPELINED_STAGES if enabled else ())
+        print(f"Pipelined mode: {'ON' if enabled else 'OFF'}")
+        return True
+
+    def maintain(self):
+        """Periodic work for the control thread (GUI timer, daemon loop).
+
+        Hands models the audio thread swapped out back to the model cache
+        for their reset, and in low-latency
+        mode lets the tuner judge the last measurement window. A new
+        device block size restarts the input stream.
+        """
+        self._release_models(self.chain.collect_retired())
+        tuner = self.block_tuner
+        if tuner is None or not self.is_monitoring or self.profiler.reset_requested:
+            return
+        block_size = tuner.update(self.profiler.snapshot(), self.sample_rate)
+        if block_size is None:
+            return
+        self.stop_monitoring()
+        self.device_block_size = block_size
+        processors = self._resolve_models(self.model_paths, self.sample_rate)
+        self._release_models(self.chain.set_stages(processors))
+        self.profiler.reset()
+        print(f'Device block size: {block_size} frames')
+        self.start_monitoring(require_model=False)
+
+    def get_latency(self):
+        """Round-trip latency of the guitar input.
+
+        Device latency is what the running stream reports for input plus
+        output, or one device block each way without a stream. Stage
+        latency comes from the ``latency`` of every enabled stage.
+
+        Returns:
+            dict: Device block size, device_ms, stages_ms per stage and total_ms
+        """
+        to_ms = 1000 / self.sample_rate
+        if self.input_stream is not None:
+            input_latency, output_latency = self.input_stream.latency
+            device_ms = (input_latency + output_latency) * 1000
+        else:
+            device_ms = 2 * self.device_block_size * to_ms
+        stage_total, stages = self.chain.latency()
+        return {
+            'device_block_size': self.device_block_size,
+            'device_ms': device_ms,
+            'stages_ms': {name: samples * to_ms for name, samples in stages.items()},
+            'total_ms': device_ms + stage_total * to_ms
+        }
+
+    def _get_nam(self, path, slot, sample_rate=None, block_size=None):
+        """A cached NAM processor for one slot of this engine. A cached
+        processor the slot is not running is reset."""
+        return self.model_cache.get_nam(path, sample_rate or self.sample_rate,
+                                        block_size or self.block_size, slot,
+                                        self.chain.slot_processors(slot))
+
+    def _get_ir(self, path, sample_rate=None, block_size=None):
+        """A cached IR processor for this engine, see _get_nam."""
+        return self.model_cache.get_ir(path, sample_rate or self.sample_rate,
+                                       block_size or self.block_size,
+                                       in_use=self.chain.slot_processors('ir'))
+
+    def _release_models(self, processors):
+        """Hand processors that left the chain back to the model cache,
+        which resets them on its loader thread for their next use."""
+        running = [processor for slot in MODEL_SLOTS + ('ir',)
+                   for processor in self.chain.slot_processors(slot)]
+        for processor in processors:
+            if not any(processor is other for other in running):
+                self.model_cache.release(processor)
+
+    def _resolve_models(self, models, sample_rate, block_size=None):
+        """Processors for every model slot of a config; raises if a file fails."""
+        processors = {}
+        for slot in MODEL_SLOTS:
+            path = models.get(slot)
+            processors[slot] = self._get_nam(path, slot, sample_rate, block_size) if path else None
+        path = models.get('ir')
+        processors['ir'] = self._get_ir(path, sample_rate, block_size) if path else None
+        return processors
+
+    def get_effect_parameters(self, effect_name):
+        """Get the parameters for a specific effect."""
+        return self.effect_params.get(effect_name, {})
+
+    def update_effect_parameter(self, effect_name, param_name, value):
+        """Update a parameter value for a specific effect.
+
+        A parameter with options, like the Drive oversampling factor, takes
+        one of them and is applied on the loader thread, which builds the
+        new filters and swaps them in; values that are not an option are
+        ignored.
+
+        Returns:
+            Future: For a parameter with options, resolves once applied
+        """
+        if effect_name not in self.effect_params:
+            return
+        
+        if param_name not in self.effect_params[effect_name]:
+            return
+        
+        info = self.effect_params[effect_name][param_name]
+        if 'options' in info:
+            value = int(value)
+            if value not in info['options']:
+                return
+            info['value'] = value
+            return self.model_cache.submit(self._option_setters[(effect_name, param_name)], value)
+
+        # Update the parameter value
+        info['value'] = value
+        
+        # Hand the change to the audio thread, which ramps it in
+        self.chain.parameters.push((effect_name, param_name), value)
+
+    def is_nam_file(self, file_path):
+        return file_path.lower().endswith('.nam')
+
+    def is_ir_file(self, file_path):
+        return file_path.lower().endswith('.wav')
+
+    def load_ir_file(self, file_path):
+        """Load an IR on the loader thread and swap it into the chain.
+
+        Returns:
+            Future: Resolves to True once the IR is in the chain
+        """
+        return self.model_cache.submit(self._load_ir, file_path)
+
+    def load_nam_file(self, file_path, is_pedal=False):
+        """Load a NAM model on the loader thread and swap it into the chain.
+
+        The processor is constructed and prewarmed off the GUI and audio
+        threads; while monitoring, the audio thread crossfades from the old
+        model to the new one.
+
+        Returns:
+            Future: Resolves to True once the model is in the chain
+        """
+        return self.model_cache.submit(self._load_nam, file_path, is_pedal)
+
+    def _load_ir(self, file_path):
+        try:
+            self.ir_processor = self._get_ir(file_path)
+            self.model_paths['ir'] = file_path
+            self._release_models(self.chain.set_stage('ir', self.ir_processor))
+            self.add_effect('IR', self.ir_processor)
+            print(f'IR file loaded: {file_path}')
+            return True
+        except Exception as e:
+            print(f'Error loading IR file: {e}')
+            return False
+
+    def _load_nam(self, file_path, is_pedal=False):
+        try:
+            # Load NAM file using C++ implementation; the cache returns an
+            # already prewarmed processor when the model was used before
+            if is_pedal:
+                self.nam_pedal_processor = self._get_nam(file_path, 'nam_pedal')
+                self.model_paths['nam_pedal'] = file_path
+                self._release_models(self.chain.set_stage('nam_pedal', self.nam_pedal_processor))
+                self.add_effect('NAM Pedal', self.nam_pedal_processor)
+                print(f'NAM pedal file loaded: {file_path}')
+            else:
+                self.nam_processor = self._get_nam(file_path, 'nam')
+                self.model_paths['nam'] = file_path
+                self._release_models(self.chain.set_stage('nam', self.nam_processor))
+                self.add_effect('NAM', self.nam_processor)
+                print(f'NAM file loaded: {file_path}')
+            return True
+        except Exception as e:
+            print(f'Error loading NAM file: {e}')
+            return False
+
+    @property
+    def library(self):
+        """The model/IR library, opened on the first scan or query.
+
+        Opening creates the database file, which an engine that never
+        uses the library (the daemon, usually) should not do.
+        """
+        with self._library_lock:
+            if self._library is None:
+                self._library = ModelLibrary()
+            return self._library
+
+    def scan_library(self, directory):
+        """Index a model/IR folder on the scan thread; returns a Future."""
+        def scan():
+            result = self.library.scan([directory])
+            print(f"Library scan: {result['files']} files, {result['indexed']} indexed, "
+                  f"{result['errors']} errors")
+            return result
+        return self.scan_executor.submit(scan)
+
+    def open_audio_file(self, file_path):
+        """Open an audio file for streaming playback through the chain."""
+        from file_streamer import FileStreamer
+        if self.playing:
+            self.stop()
+        playback = FileStreamer(file_path, self.sample_rate)
+        if self.playback is not None:
+            self.playback.close()
+        self.playback = playback
+        print(f'Audio file loaded: {file_path}')
+        print(f'Sample rate: {playback.sample_rate} Hz, {playback.duration:.1f}s')
+        if playback.sample_rate != self.sample_rate:
+            print(f'Resampling to {self.sample_rate} Hz during playback')
+        return True
+
+    def seek(self, seconds):
+        """Move file playback to a position in seconds."""
+        if self.playback is not None:
+            self.playback.seek(seconds)
+
+    def set_loop(self, start=None, end=None):
+        """Loop file playback between two positions in seconds; None clears it."""
+        if self.playback is not None:
+            self.playback.set_loop(start, end)
+
+    def get_chain_config(self):
+        """Return the current rig (models, enabled stages, parameters) as a dict."""
+        return {
+            'models': dict(self.model_paths),
+            'order': order_to_config(self.chain.order),
+            'effect_states': dict(self.effect_states),
+            'effect_params': {
+                effect_name: {name: info['value'] for name, info in params.items()}
+                for effect_name, params in self.effect_params.items()
+            }
+        }
+
+    def save_chain_config(self, file_path):
+        """Save the current rig to a JSON file usable by render.py."""
+        if not file_path:
+            return False
+        try:
+            with open(file_path, 'w') as f:
+                json.dump(self.get_chain_config(), f, indent=2)
+            print(f'Chain config saved: {file_path}')
+            return True
+        except Exception as e:
+            print(f'Error saving chain config: {e}')
+            return False
+
+    def _set_processor(self, slot, processor):
+        if slot == 'nam':
+            self.nam_processor = processor
+        elif slot == 'nam_pedal':
+            self.nam_pedal_processor = processor
+        else:
+            self.ir_processor = processor
+
+    def store_preset(self, name=None, index=None):
+        """Snapshot the current rig as a preset.
+
+        Args:
+            name (str): Preset name, numbered automatically if omitted
+            index (int): Preset to overwrite; appended if omitted
+
+        Returns:
+            int: Index of the stored preset
+        """
+        preset = self.get_chain_config()
+        if index is None or not 0 <= index < len(self.presets):
+            preset['name'] = name or f'Preset {len(self.presets) + 1}'
+            self.presets.append(preset)
+            index = len(self.presets) - 1
+        else:
+            preset['name'] = name or self.presets[index].get('name', f'Preset {index + 1}')
+            self.presets[index] = preset
+        self.preset_index = index
+        print(f"Preset stored: {preset['name']}")
+        return index
+
+    def apply_config(self, config):
+        """Switch the rig to a chain config or preset (see get_chain_config).
+
+        Models come from the cache, so for a preloaded config this swaps
+        processors into the chain with a single rebuild. Parameter and
+        on/off changes are pushed as one batch and reach the audio thread
+        in the same block.
+        """
+        name = config.get('name', 'chain config')
+        models = config.get('models', {})
+        try:
+            # Resolve every model before touching the chain so a missing file
+            # leaves the current rig intact
+            processors = self._resolve_models(models, self.sample_rate)
+        except Exception as e:
+            print(f'Error loading {name}: {e}')
+            return False
+
+        order = order_from_config(config['order']) if 'order' in config else None
+        if order is not None and 'gate' not in order:
+            # Configs saved before the gate existed keep it at the front
+            order.insert(0, 'gate')
+        try:
+            released = self.chain.set_stages(processors, order)
+        except Exception as e:
+            print(f'Error applying {name}: {e}')
+            return False
+        self._release_models(released)
+        for slot, processor in processors.items():
+            self._set_processor(slot, processor)
+            self.model_paths[slot] = models.get(slot)
+
+        parameters = self.chain.parameters
+        parameters.begin_batch()
+        try:
+            for effect_name, params in config.get('effect_params', {}).items():
+                for param_name, value in params.items():
+                    self.update_effect_parameter(effect_name, param_name, value)
+            for effect_name, enabled in config.get('effect_states', {}).items():
+                if effect_name in self.effect_states and self.effect_states[effect_name] != enabled:
+                    self.effect_states[effect_name] = enabled
+                    self.chain.set_enabled(effect_name, enabled)
+        finally:
+            parameters.end_batch()
+        return True
+
+    def load_chain_config(self, file_path):
+        """Apply a chain config saved by save_chain_config."""
+        try:
+            with open(file_path, 'r') as f:
+                config = json.load(f)
+        except Exception as e:
+            print(f'Error loading chain config: {e}')
+            return False
+        if not self.apply_config(config):
+            return False
+        print(f'Chain config loaded: {file_path}')
+        return True
+
+    def apply_preset(self, index):
+        """Switch the rig to a stored preset.
+
+        See apply_config; the presets after it are then preloaded in the
+        background.
+        """
+        if not 0 <= index < len(self.presets):
+            return False
+        preset = self.presets[index]
+        if not self.apply_config(preset):
+            return False
+        self.preset_index = index
+        self.preload_upcoming_presets()
+        print(f"Preset loaded: {preset.get('name')}")
+        return True
+
+    def next_preset(self):
+        if not self.presets:
+            return False
+        index = 0 if self.preset_index is None else (self.preset_index + 1) % len(self.presets)
+        return self.apply_preset(index)
+
+    def previous_preset(self):
+        if not self.presets:
+            return False
+        index = 0 if self.preset_index is None else (self.preset_index - 1) % len(self.presets)
+        return self.apply_preset(index)
+
+    def preload_upcoming_presets(self):
+        """Load the models of the next presets on the background thread."""
+        if not self.presets:
+            return
+        start = 0 if self.preset_index is None else self.preset_index + 1
+        for offset in range(min(self.preload_count, len(self.presets))):
+            preset = self.presets[(start + offset) % len(self.presets)]
+            try:
+                self.model_cache.preload_config(preset, self.sample_rate, self.block_size)
+            except Exception as e:
+                print(f"Error preloading preset {preset.get('name')}: {e}")
+
+    def save_presets(self, file_path):
+        """Save all presets to a JSON file."""
+        if not file_path:
+            return False
+        try:
+            with open(file_path, 'w') as f:
+                json.dump({'presets': self.presets}, f, indent=2)
+            print(f'Presets saved: {file_path}')
+            return True
+        except Exception as e:
+            print(f'Error saving presets: {e}')
+            return False
+
+    def load_presets(self, file_path):
+        """Load presets from a JSON file and start preloading the first ones."""
+        if not file_path:
+            return False
+        try:
+            with open(file_path, 'r') as f:
+                self.presets = json.load(f)['presets']
+            self.preset_index = None
+            self.preload_upcoming_presets()
+            print(f'Presets loaded: {file_path} ({len(self.presets)} presets)')
+            return True
+        except Exception as e:
+            print(f'Error loading presets: {e}')
+            return False
+
+    def add_effect(self, effect_name, effect):
+        """Add an effect to the signal chain."""
+        self.effect_chain.append({'name': effect_name, 'effect': effect})
+        print(f'Added {effect_name} to the signal chain')
+
+    def remove_effect(self, effect_name):
+        """Remove an effect from the signal chain by name."""
+        self.effect_chain = [e for e in self.effect_chain if e['name'] != effect_name]
+        print(f'Removed {effect_name} from the signal chain')
+
+    def clear_effects(self):
+        """Remove all effects from the signal chain."""
+        self.effect_chain.clear()
+        print('Cleared all effects from the signal chain')
+
+    def set_chain_order(self, order):
+        """Set the processing order of the stages.
+
+        Args:
+            order (list): Stage names and ParallelSplit entries, or their
+                JSON form as produced by get_chain_config
+        """
+        try:
+            self.chain.set_order(order_from_config(order))
+            return True
+        except Exception as e:
+            print(f'Error setting chain order: {e}')
+            return False
+
+    def process_audio(self, audio_input):
+        try:
+            return self.chain.process(audio_input)
+        except Exception as e:
+            # No printing on the audio thread; the error is kept for the GUI
+            self.callback_errors += 1
+            self.last_callback_error = e
+            return audio_input
+
+    def get_meters(self):
+        """Input/output levels of the last block plus DSP load and xruns."""
+        stats = self.profiler.snapshot()
+        return {
+            'input': self.input_meter.snapshot(),
+            'output': self.output_meter.snapshot(),
+            'dsp_load': stats['dsp_load']['last'],
+            'dsp_load_peak': stats['dsp_load']['peak'],
+            'xruns': sum(stats['xruns'].values()),
+            'callback_errors': self.callback_errors,
+            'idle': self.chain.idle_state.idle,
+            'pipeline_late': self.chain.pipeline_late()
+        }
+
+    def get_dsp_stats(self):
+        """Snapshot of per-stage timing, DSP load and xrun counts."""
+        return self.profiler.snapshot()
+
+    def dump_dsp_stats(self, file_path):
+        """Write DSP statistics to a .json or .csv file."""
+        if not file_path:
+            return False
+        try:
+            self.profiler.dump(file_path)
+            print(f'DSP stats saved: {file_path}')
+            return True
+        except Exception as e:
+            print(f'Error saving DSP stats: {e}')
+            return False
+
+    def toggle_effect(self, effect_name):
+        """Toggle the state of an effect."""
+        self.effect_states[effect_name] = not self.effect_states[effect_name]
+        self.chain.set_enabled(effect_name, self.effect_states[effect_name])
+        print(f'{effect_name.capitalize()} effect: {"ON" if self.effect_states[effect_name] else "OFF"}')
+
+    @staticmethod
+    def _write_output(processed_audio, outdata):
+        """Write a chain output into the device buffer, filling every channel.
+
+        Mono, 1-D or one column, goes to every channel. Fewer chain channels
+        than device channels repeat across them, and more are downmixed to
+        mono first.
+        """
+        channels = outdata.shape[1]
+        if processed_audio.ndim == 1:
+            outdata[...] = processed_audio[:, None]
+        elif processed_audio.shape[1] == channels:
+            outdata[...] = processed_audio
+        elif processed_audio.shape[1] < channels:
+            width = processed_audio.shape[1]
+            for start in range(0, channels, width):
+                n = min(width, channels - start)
+                outdata[:, start:start + n] = processed_audio[:, :n]
+        else:
+            np.mean(processed_audio, axis=1, out=outdata[:, 0])
+            outdata[:, 1:] = outdata[:, :1]
+
+    def play(self):
+        """Stream the loaded file through the chain from its current position.
+
+        Playback continues where the last stop left it; a file that played
+        to the end starts again from the beginning.
+        """
+        if self.playback is None:
+            print('No audio file loaded')
+            return
+
+        if self.playing:
+            print('Already playing')
+            return
+
+        if self.is_monitoring:
+            print('Stop guitar input before playing a file')
+            return
+
+        import sounddevice as sd
+        self._close_playback_stream()
+        self.set_sample_rate(self.device_sample_rate(self.sample_rate))
+        playback = self.playback
+        if playback.finished:
+            playback.seek(0)
+        file_block = np.zeros((self.block_size, playback.channels), dtype=np.float32)
+
+        def callback(outdata, frames, time, status):
+            start = perf_counter()
+            if status:
+                self.last_stream_status = status
+
+            block = file_block[:frames]
+            playback.read_into(block)
+            self.input_meter.update(block)
+            self._write_output(self.process_audio(block), outdata)
+            self.output_meter.update(outdata)
+
+            self.profiler.end_callback(perf_counter() - start, frames, self.sample_rate, status)
+            if playback.finished:
+                raise sd.CallbackStop()
+
+        def finished():
+            self.playing = False
+            self.chain.parameters.realtime = False
+
+        try:
+            self.stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                channels=2,
+                blocksize=self.device_block_size,
+                callback=callback,
+                finished_callback=finished,
+                dtype=np.float32
+            )
+            self.chain.parameters.realtime = True
+            self.playing = True
+            self.stream.start()
+            print('Playing...')
+        except Exception as e:
+            self.playing = False
+            self.chain.parameters.realtime = False
+            print(f'Error playing: {e}')
+
+    def _close_playback_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+            self.playing = False
+            self.chain.parameters.realtime = False
+
+    def stop(self):
+        if self.stream is not None:
+            self._close_playback_stream()
+            print('Playback stopped')
+        self.stop_monitoring()
+
+    def start_monitoring(self, require_model=True):
+        """Run the guitar input through the chain.
+
+        Args:
+            require_model (bool): Refuse to start before a NAM model is
+                loaded; the daemon starts first and loads models after
+
+        Returns:
+            bool: True once the stream is running
+        """
+        if self.is_monitoring:
+            print('Already monitoring')
+            return False
+
+        if self.playing:
+            print('Stop file playback first')
+            return False
+
+        if require_model and self.nam_processor is None:
+            print('Please load a NAM model first')
+            return False
+
+        import sounddevice as sd
+        self.set_sample_rate(self.device_sample_rate(self.sample_rate))
+
+        def audio_callback(indata, outdata, frames, time, status):
+            start = perf_counter()
+            if status:
+                self.last_stream_status = status
+
+            # Both input channels go through the chain as they are
+            self.input_meter.update(indata)
+            self._write_output(self.process_audio(indata), outdata)
+            self.output_meter.update(outdata)
+
+            self.profiler.end_callback(perf_counter() - start, frames, self.sample_rate, status)
+
+        try:
+            self.input_stream = sd.Stream(
+                channels=2,  # Set to stereo output
+                samplerate=self.sample_rate,
+                blocksize=self.device_block_size,
+                latency='low' if self.block_tuner is not None else None,
+                callback=audio_callback,
+                dtype=np.float32  # Ensure consistent data type
+            )
+            self.chain.parameters.realtime = True
+            self.input_stream.start()
+            self.is_monitoring = True
+            print('Monitoring started...')
+            print(f"Round-trip latency: {self.get_latency()['total_ms']:.1f} ms")
+            return True
+        except Exception as e:
+            self.chain.parameters.realtime = False
+            print(f'Error starting monitoring: {e}')
+            return False
+
+    def stop_monitoring(self):
+        if self.input_stream is not None:
+            self.input_stream.stop()
+            self.input_stream.close()
+            self.input_stream = None
+            self.chain.parameters.realtime = False
+            self.is_monitoring = False
+            print('Monitoring stopped')
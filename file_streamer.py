@@ -0,0 +1,224 @@
+import threading
+import numpy as np
+import soundfile as sf
+from resampler import StreamingResampler
+
+class FrameRing:
+    """Lock-free single-producer/single-consumer ring of audio frames.
+
+    Uses the counter scheme of ParameterQueue: the prefetch thread owns
+    ``write_index`` and the audio thread owns ``read_index``. After a seek
+    the writer publishes ``discard_index``, the first frame of the new
+    position; the reader skips everything before it. Every frame carries
+    the file position it came from, so the reader can report where it is
+    even across loops and seeks.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.positions = np.zeros(capacity)
+        self.write_index = 0
+        self.read_index = 0
+        self.discard_index = 0
+
+    def writable(self):
+        # Stale frames before discard_index may be overwritten straight away
+        return self.capacity - (self.write_index - max(self.read_index, self.discard_index))
+
+    def write(self, frames, position, step=1.0):
+        """Append frames starting at file position ``position`` (writer only).
+
+        ``step`` is the file distance between frames, below 1 when the
+        frames were resampled to a higher rate.
+        """
+        n = len(frames)
+        start = self.write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = frames[:first]
+        self.data[:n - first] = frames[first:]
+        self.positions[start:start + first] = position + step * np.arange(first)
+        self.positions[:n - first] = position + step * np.arange(first, n)
+        self.write_index += n
+
+    def read_into(self, out):
+        """Copy up to len(out) frames into out (reader only); returns the count."""
+        read_index = self.read_index
+        discard_index = self.discard_index
+        if read_index < discard_index:
+            read_index = discard_index
+        n = min(len(out), self.write_index - read_index)
+        start = read_index % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        self.read_index = read_index + n
+        return n
+
+class FileStreamer:
+    """Streams an audio file from disk through a prefetch thread.
+
+    The prefetch thread reads fixed-size chunks into a FrameRing; the
+    audio thread only copies out of it, so memory use is constant and
+    files far larger than RAM play fine. When the engine runs at another
+    rate than the file, the prefetch thread also resamples, so the audio
+    thread never does. Seeks and loop regions are requested from any
+    thread and carried out by the prefetch thread.
+    When the ring runs dry the reader outputs silence and counts an
+    underrun.
+
+    Args:
+        file_path (str): Audio file
+        output_rate (int): Rate of the frames handed to the audio thread,
+            the file's own rate by default
+        buffer_seconds (float): Audio held in the ring
+        chunk_frames (int): Frames read from disk at a time
+    """
+
+    def __init__(self, file_path, output_rate=None, buffer_seconds=2.0, chunk_frames=4096):
+        self.file_path = file_path
+        self.file = sf.SoundFile(file_path)
+        self.sample_rate = self.file.samplerate
+        self.output_rate = output_rate or self.sample_rate
+        self.channels = self.file.channels
+        self.frames = self.file.frames
+        self.chunk_frames = chunk_frames
+        capacity = int(buffer_seconds * max(self.sample_rate, self.output_rate))
+        self.ring = FrameRing(max(capacity, 4 * chunk_frames), self.channels)
+        self._chunk = np.zeros((chunk_frames, self.channels), dtype=np.float32)
+
+        self.loop_start = None  # Loop region in frames, None when not looping
+        self.loop_end = None
+        self.end_index = None  # Ring index after the last frame, set at end of file
+        self.read_frame = 0  # File frame after the last one read, written by the audio thread
+        self.underruns = 0
+        self.error = None
+        self._seek_target = 0
+        self._seek_requests = 1  # The first request starts the stream at frame 0
+        self._closing = False
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch, name='file-prefetch', daemon=True)
+        self._thread.start()
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    @property
+    def position(self):
+        """Playback position in seconds, as last read by the audio thread."""
+        ring = self.ring
+        if ring.read_index <= ring.discard_index:
+            return self._seek_target / self.sample_rate
+        return self.read_frame / self.sample_rate
+
+    @property
+    def finished(self):
+        end_index = self.end_index
+        return end_index is not None and self.ring.read_index >= end_index
+
+    def seek(self, seconds):
+        """Move playback to ``seconds``; takes effect within one chunk read."""
+        self._seek_target = min(max(int(seconds * self.sample_rate), 0), self.frames)
+        self._seek_requests += 1
+        self._wake.set()
+
+    def set_output_rate(self, output_rate):
+        """Resample to a new engine rate, refilling from the current position."""
+        self.output_rate = output_rate
+        self.seek(self.position)
+
+    def set_loop(self, start, end):
+        """Loop the region [start, end) in seconds; None clears the loop.
+
+        Prefetched audio is refilled from the current position, so the new
+        region applies to the next pass without waiting for the buffer.
+        """
+        if start is None or end is None:
+            self.loop_start = self.loop_end = None
+        else:
+            start_frame = min(max(int(start * self.sample_rate), 0), self.frames)
+            end_frame = min(max(int(end * self.sample_rate), start_frame + 1), self.frames)
+            self.loop_start, self.loop_end = start_frame, end_frame
+        self.seek(self.position)
+
+    def read_into(self, out):
+        """Fill out (frames, channels) from the ring; missing frames are zeros.
+
+        Called on the audio thread. Returns the number of file frames copied.
+        """
+        ring = self.ring
+        n = ring.read_into(out)
+        if n:
+            self.read_frame = int(ring.positions[(ring.read_index - 1) % ring.capacity]) + 1
+        if n < len(out):
+            out[n:] = 0
+            if not self.finished:
+                self.underruns += 1
+        return n
+
+    def close(self):
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        self.file.close()
+
+    def _wait(self):
+        # The audio thread never signals; poll at a fraction of a chunk
+        self._wake.wait(self.chunk_frames / self.sample_rate / 4)
+        self._wake.clear()
+
+    def _prefetch(self):
+        handled = 0
+        position = 0
+        ring = self.ring
+        resampler = None
+        while not self._closing:
+            if self._seek_requests != handled:
+                handled = self._seek_requests
+                position = self._seek_target
+                if self.loop_end is not None and not self.loop_start <= position < self.loop_end:
+                    position = self.loop_start
+                self.file.seek(position)
+                output_rate = self.output_rate
+                if output_rate == self.sample_rate:
+                    resampler = None
+                elif resampler is None or resampler.out_rate != output_rate:
+                    resampler = StreamingResampler(self.sample_rate, output_rate, self.chunk_frames,
+                                                   self.channels)
+                else:
+                    resampler.reset()
+                self.end_index = None
+                ring.discard_index = ring.write_index
+
+            # Room for one chunk, also after resampling to a higher rate
+            needed = self.chunk_frames if resampler is None else resampler.max_output
+            if self.end_index is not None or ring.writable() < needed:
+                self._wait()
+                continue
+
+            loop_start, loop_end = self.loop_start, self.loop_end
+            stop = self.frames if loop_end is None else loop_end
+            n = min(self.chunk_frames, stop - position)
+            if n > 0:
+                try:
+                    chunk = self.file.read(n, dtype='float32', always_2d=True, out=self._chunk[:n])
+                except Exception as e:
+                    self.error = e
+                    chunk = self._chunk[:0]
+                if len(chunk):
+                    if resampler is None:
+                        ring.write(chunk, position)
+                    else:
+                        # The first output falls between input frames
+                        start = position + resampler.position / resampler.up
+                        resampled = resampler.process(chunk[:, 0] if self.channels == 1 else chunk)
+                        ring.write(resampled.reshape(len(resampled), self.channels), start,
+                                   self.sample_rate / resampler.out_rate)
+                    position += len(chunk)
+                    continue
+            if loop_end is not None and self.error is None:
+                position = loop_start
+                self.file.seek(position)
+            else:
+                self.end_index = ring.write_index
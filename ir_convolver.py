@@ -0,0 +1,278 @@
+"""Uniform-partitioned FFT convolution for cab IRs.
+
+The IR is cut into partitions of the host block size and each partition
+is transformed once. Processing is overlap-save with a frequency-domain
+delay line. Every call costs one FFT pair and one spectrum product, plus
+a multiply-add over all partitions once per completed partition, so cost
+grows with IR length far more slowly than direct convolution. There is
+no added latency, and calls shorter than a partition are exact.
+
+Partition spectra are cached in memory and on disk, keyed by (IR file
+hash, target sample rate, partition size). Reloading a known IR reads
+the cached spectra and does no resampling or FFT work.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+
+import numpy as np
+import soundfile as sf
+from scipy import fft, signal
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'nam_ir')
+# Level applied by dsp::ImpulseResponse, so swapping engines keeps the rig's loudness
+IR_GAIN_DB = -18.0
+IR_REFERENCE_RATE = 48000
+
+_hash_lock = threading.Lock()
+_hashes = {}  # (path, size, mtime_ns) -> content hash
+
+def file_hash(path):
+    """SHA-1 of a file's contents, computed once per (path, size, mtime)."""
+    stat = os.stat(path)
+    identity = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        digest = _hashes.get(identity)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+        with _hash_lock:
+            _hashes[identity] = digest
+    return digest
+
+def load_ir(path, sample_rate):
+    """Read an IR, resample it to sample_rate and apply the IR gain.
+
+    Returns:
+        ndarray: float64 samples, shape (frames, channels)
+    """
+    ir, ir_rate = sf.read(path, dtype='float64', always_2d=True)
+    if ir_rate != sample_rate:
+        ratio = Fraction(int(sample_rate), int(ir_rate)).limit_denominator(1000)
+        ir = signal.resample_poly(ir, ratio.numerator, ratio.denominator, axis=0)
+    return ir * (10 ** (IR_GAIN_DB / 20) * IR_REFERENCE_RATE / sample_rate)
+
+def partition_spectra(ir, partition_size):
+    """Spectra of the IR cut into partitions, shape (partitions, channels, B + 1)."""
+    frames, channels = ir.shape
+    partitions = max(-(-frames // partition_size), 1)
+    padded = np.zeros((partitions, channels, 2 * partition_size))
+    blocks = np.zeros((partitions * partition_size, channels))
+    blocks[:frames] = ir
+    padded[:, :, :partition_size] = blocks.reshape(partitions, partition_size, channels).transpose(0, 2, 1)
+    return fft.rfft(padded, axis=2).astype(np.complex64)
+
+class IRSpectrumCache:
+    """Partition spectra of IRs, kept in memory (LRU) and on disk.
+
+    Args:
+        cache_dir (str): Directory for .npy spectra, or None for memory only
+        max_entries (int): Spectra kept in memory
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, path, sample_rate, partition_size):
+        return file_hash(path), int(sample_rate), int(partition_size)
+
+    def get(self, path, sample_rate, partition_size):
+        """Return the partition spectra of an IR, computing them on a miss."""
+        key = self.key(path, sample_rate, partition_size)
+        with self._lock:
+            spectra = self._entries.get(key)
+            if spectra is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return spectra
+
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, '{}_{}_{}.npy'.format(*key))
+        if cache_path is not None and os.path.exists(cache_path):
+            spectra = np.load(cache_path)
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            spectra = partition_spectra(load_ir(path, sample_rate), partition_size)
+            with self._lock:
+                self.misses += 1
+            if cache_path is not None:
+                self._save(cache_path, spectra)
+
+        with self._lock:
+            self._entries[key] = spectra
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return spectra
+
+    @staticmethod
+    def _save(cache_path, spectra):
+        # Written under a temporary name so a reader never sees a partial file
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                np.save(f, spectra)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f'Error writing IR cache: {e}')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses
+            }
+
+spectrum_cache = IRSpectrumCache()
+
+def _routes(ir_channels, input_channels):
+    """(input channel, output channel, IR channel) triples for an IR layout.
+
+    1 channel: mono. 2 channels: mono input to stereo output, or left/right
+    independently for stereo input. 4 channels: true stereo, in the order
+    L->L, L->R, R->L, R->R.
+    """
+    if ir_channels == 1:
+        return [(0, 0, 0)]
+    if ir_channels == 2:
+        if input_channels == 2:
+            return [(0, 0, 0), (1, 1, 1)]
+        return [(0, 0, 0), (0, 1, 1)]
+    if ir_channels == 4:
+        return [(0, 0, 0), (0, 1, 1), (1, 0, 2), (1, 1, 3)]
+    raise ValueError(f'Unsupported IR channel count: {ir_channels} (expected 1, 2 or 4)')
+
+class PartitionedIRProcessor:
+    """Zero-latency partitioned convolution with the IRProcessor interface.
+
+    The partition size is the host block size; any call of up to one
+    block is processed exactly. Mono input into a true-stereo IR is fed
+    to both inputs, and stereo input into a mono-input IR is folded down.
+
+    Args:
+        ir_path (str): IR .wav file (1, 2 or 4 channels)
+        sample_rate (int): Rate the IR is resampled to
+        block_size (int): Partition size, normally the host block size
+        input_channels (int): 1 or 2; defaults to 2 for true-stereo IRs
+        cache (IRSpectrumCache): Spectra cache, the shared one by default
+    """
+
+    latency = 0
+
+    def __init__(self, ir_path, sample_rate, block_size=1024, input_channels=None, cache=None):
+        cache = spectrum_cache if cache is None else cache
+        spectra = cache.get(ir_path, sample_rate, block_size)
+        ir_channels = spectra.shape[1]
+        if input_channels is None:
+            input_channels = 2 if ir_channels == 4 else 1
+        routes = _routes(ir_channels, input_channels)
+
+        self.ir_path = ir_path
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.input_channels = input_channels
+        self.output_channels = max(route[1] for route in routes) + 1
+        self.partitions = spectra.shape[0]
+        self.route_inputs = np.array([route[0] for route in routes])
+        # (partitions, routes, bins); route products are summed into outputs by mix
+        self.spectra = np.ascontiguousarray(spectra[:, [route[2] for route in routes]])
+        self.mix = np.zeros((self.output_channels, len(routes)), dtype=np.complex64)
+        for i, (_, out_channel, _) in enumerate(routes):
+            self.mix[out_channel, i] = 1.0
+
+        # Past partitions meet IR partitions partitions-1 .. 1, oldest first
+        self.tail_spectra = np.ascontiguousarray(self.spectra[:0:-1])
+
+        bins = block_size + 1
+        slots = max(self.partitions - 1, 1)
+        self.window = np.zeros((input_channels, 2 * block_size), dtype=np.float32)
+        # Frequency-domain delay line, stored twice so the last ``slots``
+        # partitions are always one contiguous view, oldest first
+        self.delay_line = np.zeros((2 * slots, len(routes), bins), dtype=np.complex64)
+        self.tail = np.zeros((len(routes), bins), dtype=np.complex64)
+        self.head = 0  # Delay line slot of the most recent partition
+        self.position = 0  # Samples written into the current partition
+
+    def reset(self, sample_rate=None, block_size=None):
+        """Clear the convolution state."""
+        self.window.fill(0)
+        self.delay_line.fill(0)
+        self.tail.fill(0)
+        self.head = 0
+        self.position = 0
+
+    def process(self, input):
+        output = np.empty(input.shape[:1] if self.output_channels == 1
+                          else (len(input), self.output_channels), dtype=np.float32)
+        self.process_into(input, output)
+        return output
+
+    def process_into(self, input, output):
+        frames = len(input)
+        start = 0
+        while start < frames:
+            n = min(frames - start, self.block_size - self.position)
+            self._process_chunk(input[start:start + n], output[start:start + n])
+            start += n
+
+    def _process_chunk(self, input, output):
+        block_size = self.block_size
+        p = self.position
+        n = len(input)
+        current = self.window[:, block_size + p:block_size + p + n]
+        if input.ndim == 1:
+            current[...] = input
+        elif self.input_channels == 1:
+            np.mean(input, axis=1, out=current[0])
+        else:
+            current[...] = input.T
+
+        spectrum = fft.rfft(self.window, axis=1)
+        products = spectrum[self.route_inputs] * self.spectra[0]
+        products += self.tail
+        result = fft.irfft(self.mix @ products, n=2 * block_size, axis=1)[:, block_size + p:block_size + p + n]
+        if output.ndim == 1:
+            output[...] = result[0]
+        else:
+            output[...] = result.T
+
+        self.position = p + n
+        if self.position == block_size:
+            self._complete_partition(spectrum)
+
+    def _complete_partition(self, spectrum):
+        """Push the finished partition into the delay line and precompute the
+        contribution of all past partitions to the next one."""
+        block_size = self.block_size
+        self.window[:, :block_size] = self.window[:, block_size:]
+        self.window[:, block_size:] = 0
+        self.position = 0
+        if self.partitions == 1:
+            return
+
+        slots = len(self.delay_line) // 2
+        head = self.head = (self.head + 1) % slots
+        np.take(spectrum, self.route_inputs, axis=0, out=self.delay_line[head])
+        self.delay_line[head + slots] = self.delay_line[head]
+        # Partition k back in time meets IR partition k
+        history = self.delay_line[head + 1:head + 1 + slots]
+        np.einsum('krb,krb->rb', history, self.tail_spectra, out=self.tail)
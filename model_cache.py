@@ -0,0 +1,367 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from nam_reader import NAMReader
+
+# nam_binding and the DSP wrappers (which pull in scipy) are imported by
+# the functions that build processors, so importing the cache is cheap
+# and they load on the loader thread with the first model
+
+MODEL_SLOTS = ('nam_pedal', 'nam')
+DEFAULT_MODEL_RATE = 48000  # Assumed for .nam files that do not record their rate
+
+# States of a cached processor
+_CLEAN = 'clean'  # Prewarmed or reset, and not handed out since
+_TAKEN = 'taken'  # Handed out; may carry state from its last use
+_QUEUED = 'queued'  # Released, waiting for the loader thread to reset it
+_RESETTING = 'resetting'  # Being reset on the loader thread
+
+class _Entry:
+    """A cached processor, the size it is charged and its state."""
+
+    def __init__(self, processor, size, state):
+        self.processor = processor
+        self.size = size
+        self.state = state
+        self.reset_done = None  # Future of the reset while _RESETTING
+
+class ProcessFallback:
+    """``process_into`` through ``process``, for an nam_binding built before
+    it had process_into.
+
+    Every call goes through a new float64 array and a copy, so it
+    allocates on the audio thread; rebuild the extension (``python
+    setup.py build_ext --inplace``) for the zero-copy path.
+
+    Args:
+        processor: nam_binding.NAMProcessor or IRProcessor with ``process``
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def process(self, input):
+        return self.processor.process(np.asarray(input, dtype=np.float64))
+
+    def process_into(self, input, output):
+        output[...] = self.process(input)
+
+    def reset(self, sample_rate=None, block_size=None):
+        # Old IRProcessor builds have no reset
+        reset = getattr(self.processor, 'reset', None)
+        if reset is not None and sample_rate is not None:
+            reset(sample_rate, block_size)
+
+def with_process_into(processor):
+    """Return processor, behind a ProcessFallback if it lacks process_into."""
+    return processor if hasattr(processor, 'process_into') else ProcessFallback(processor)
+
+def create_nam_processor(path, sample_rate, block_size, oversampling_mode='minimum'):
+    """Load a NAM model for a chain running at sample_rate and prewarm it.
+
+    A model trained at another rate runs at its own rate: in an
+    OversampledStage when that rate is 2x or 4x the chain's, otherwise in
+    a ResampledProcessor. Both report the added delay as ``latency``.
+
+    Args:
+        path (str): Path of the .nam file
+        sample_rate (int): Rate of the chain
+        block_size (int): Maximum block size of the chain
+        oversampling_mode (str): 'minimum' (live) or 'linear' (offline)
+
+    Returns:
+        nam_binding.NAMProcessor (or its ProcessFallback), OversampledStage
+        or ResampledProcessor
+    """
+    import nam_binding
+    from oversampling import OVERSAMPLING_FACTORS, OversampledStage
+    from resampler import ResampledProcessor
+
+    processor = with_process_into(nam_binding.NAMProcessor(path))
+    sample_rate = int(sample_rate)
+    model_rate = int(NAMReader(path).sample_rate or DEFAULT_MODEL_RATE)
+    if model_rate == sample_rate:
+        processor.reset(sample_rate, block_size)
+        return processor
+    factor = model_rate // sample_rate
+    if model_rate % sample_rate == 0 and factor in OVERSAMPLING_FACTORS:
+        return OversampledStage(processor, sample_rate, factor, oversampling_mode, block_size)
+    return ResampledProcessor(processor, sample_rate, model_rate, block_size)
+
+def create_ir_processor(path, sample_rate, block_size):
+    """Load an IR as a PartitionedIRProcessor partitioned at block_size."""
+    from ir_convolver import PartitionedIRProcessor
+    return PartitionedIRProcessor(path, sample_rate, block_size)
+
+class ModelCache:
+    """LRU cache of loaded, prewarmed NAM and IR processors.
+
+    NAM processors are keyed by (slot, path, mtime, sample rate, block
+    size), run at the rate the model was trained at (see
+    create_nam_processor) and are stored after ``reset``, which runs the
+    prewarm pass, so a cache hit is a dictionary lookup. IR processors are
+    partitioned convolvers keyed the same way; their partition spectra are
+    also cached on disk by ir_convolver, so even a miss on a known IR does
+    no resampling or FFT work.
+
+    Processors carry state from block to block, so each slot gets its own
+    instance: the same file in two slots is loaded twice. Entries are clean
+    after their prewarm, and a hit on a clean entry is returned as it is.
+    A processor that left the chain is handed back with ``release`` and
+    reset on the loader thread, which makes it clean again. A hit on a
+    processor that was taken and never released, and that is not among the
+    processors the caller still runs (``in_use``), has stale state from
+    its last use and is reset before it is returned.
+    Saving a file changes its mtime, so the old entry is never hit again and
+    simply ages out.
+
+    The memory budget is approximate: each entry is charged the size of its
+    file on disk, which grows with the weight count of a model and the
+    length of an IR. The most recently used entry is always kept, even if it
+    alone exceeds the budget.
+
+    Loads may run on a background thread (``preload_*``). A key that is
+    already being loaded is never loaded twice; a second caller waits for
+    the first load to finish.
+    """
+
+    def __init__(self, memory_budget=512 * 1024 * 1024, preload_workers=1):
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> _Entry
+        self._pending = {}  # key -> Future of a load in progress
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=preload_workers,
+                                            thread_name_prefix='model-preload')
+
+    @staticmethod
+    def _file_key(path):
+        if not path or not os.path.isfile(path):
+            raise FileNotFoundError(f'No such model file: {path!r}')
+        path = os.path.abspath(path)
+        return path, os.path.getmtime(path)
+
+    def nam_key(self, path, sample_rate, block_size, slot='nam'):
+        return ('nam', slot) + self._file_key(path) + (sample_rate, block_size)
+
+    def ir_key(self, path, sample_rate, block_size, slot='ir'):
+        return ('ir', slot) + self._file_key(path) + (sample_rate, block_size)
+
+    def get_nam(self, path, sample_rate, block_size, slot='nam', in_use=()):
+        """Return a prewarmed NAMProcessor, loading it if it is not cached.
+
+        Args:
+            path (str): Path of the .nam file
+            sample_rate (int): Sample rate the processor is reset to
+            block_size (int): Maximum block size the processor is reset to
+            slot (str): Chain slot the processor is for, one of MODEL_SLOTS
+            in_use (tuple): Processors the slot is still running; a cached
+                processor that was taken and never released is reset unless
+                it is one of them
+
+        Returns:
+            The cached processor, see create_nam_processor
+        """
+        return self._get(self.nam_key(path, sample_rate, block_size, slot),
+                         lambda: create_nam_processor(path, sample_rate, block_size),
+                         self._reset_unused(in_use, sample_rate, block_size))
+
+    def get_ir(self, path, sample_rate, block_size, slot='ir', in_use=()):
+        """Return a PartitionedIRProcessor for the file, loading it if it is not cached.
+
+        Args:
+            path (str): Path of the IR file
+            sample_rate (int): Rate the IR is resampled to
+            block_size (int): Host block size, used as the partition size
+            slot (str): Chain slot the processor is for
+            in_use (tuple): As for get_nam
+        """
+        return self._get(self.ir_key(path, sample_rate, block_size, slot),
+                         lambda: create_ir_processor(path, sample_rate, block_size),
+                         self._reset_unused(in_use, sample_rate, block_size))
+
+    @staticmethod
+    def _reset_unused(in_use, sample_rate, block_size):
+        """Cache hit handler that resets a processor unless it is in use."""
+        def on_hit(processor):
+            if not any(processor is running for running in in_use):
+                processor.reset(sample_rate, block_size)
+        return on_hit
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the loader thread; returns a Future."""
+        return self._executor.submit(fn, *args)
+
+    def preload_nam(self, path, sample_rate, block_size, slot='nam'):
+        """Load a NAM model on the background thread; returns a Future.
+
+        A model that is already cached is left as it is.
+        """
+        key = self.nam_key(path, sample_rate, block_size, slot)
+        return self._executor.submit(self._get, key,
+                                     lambda: create_nam_processor(path, sample_rate, block_size),
+                                     None, False)
+
+    def preload_ir(self, path, sample_rate, block_size, slot='ir'):
+        """Load an IR on the background thread; returns a Future."""
+        key = self.ir_key(path, sample_rate, block_size, slot)
+        return self._executor.submit(self._get, key,
+                                     lambda: create_ir_processor(path, sample_rate, block_size),
+                                     None, False)
+
+    def preload_config(self, config, sample_rate, block_size):
+        """Queue background loads for every model referenced by a chain config.
+
+        Args:
+            config (dict): Chain config or preset, as from get_chain_config
+            sample_rate (int): Sample rate of the running chain
+            block_size (int): Block size of the running chain
+
+        Returns:
+            list: Futures of the queued loads
+        """
+        models = config.get('models', {})
+        futures = []
+        for slot in MODEL_SLOTS:
+            if models.get(slot):
+                futures.append(self.preload_nam(models[slot], sample_rate, block_size, slot))
+        if models.get('ir'):
+            futures.append(self.preload_ir(models['ir'], sample_rate, block_size))
+        return futures
+
+    def release(self, processor):
+        """Hand back a processor no slot runs any more.
+
+        It is reset on the loader thread, so taking it again is a plain
+        lookup. Call once the audio thread is done with it (see
+        SignalChain.collect_retired). Processors the cache does not hold
+        are ignored.
+
+        Returns:
+            Future resolving to True once the processor is reset (falsy
+                if it was taken again first), or None
+        """
+        with self._lock:
+            key = next((key for key, entry in self._entries.items()
+                        if entry.processor is processor), None)
+            if key is None or self._entries[key].state != _TAKEN:
+                return None
+            self._entries[key].state = _QUEUED
+        return self._executor.submit(self._clean, key, processor)
+
+    def _clean(self, key, processor):
+        with self._lock:
+            entry = self._entries.get(key)
+            # Taken again before its turn: the taker has reset it
+            if entry is None or entry.processor is not processor or entry.state != _QUEUED:
+                return
+            entry.state = _RESETTING
+            entry.reset_done = done = Future()
+        clean = False
+        try:
+            processor.reset(key[-2], key[-1])
+            clean = True
+        finally:
+            with self._lock:
+                if entry.state == _RESETTING:
+                    entry.state = _CLEAN if clean else _TAKEN
+                entry.reset_done = None
+            done.set_result(clean)
+        return clean
+
+    def set_memory_budget(self, memory_budget):
+        """Change the budget in bytes, evicting entries if it shrank."""
+        with self._lock:
+            self.memory_budget = memory_budget
+            self._evict()
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_used = 0
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'memory_used': self.memory_used,
+                'memory_budget': self.memory_budget,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _get(self, key, load, on_hit=None, take=True):
+        """Cached processor for key, loaded on a miss. ``take`` marks it as
+        handed out; a taken processor that was never released is passed to
+        on_hit, and one being reset is waited for."""
+        reset = False
+        resetting = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if take:
+                    # A queued release is left to the taker; the loader skips it
+                    reset = entry.state in (_TAKEN, _QUEUED)
+                    resetting = entry.reset_done
+                    entry.state = _TAKEN
+            else:
+                future = self._pending.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._pending[key] = future
+                    self.misses += 1
+
+        if entry is not None:
+            if resetting is not None and not resetting.result():
+                reset = True  # The loader's reset failed
+            # Reset outside the lock: prewarming a model takes a while
+            if reset and on_hit is not None:
+                on_hit(entry.processor)
+            return entry.processor
+
+        if not owner:
+            processor = future.result()
+            if take:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.processor is processor:
+                        entry.state = _TAKEN
+            return processor
+
+        try:
+            processor = load()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._insert(key, processor, os.path.getsize(key[2]), _TAKEN if take else _CLEAN)
+        future.set_result(processor)
+        return processor
+
+    def _insert(self, key, processor, size, state):
+        self._entries[key] = _Entry(processor, size, state)
+        self.memory_used += size
+        self._evict()
+
+    def _evict(self):
+        while self.memory_used > self.memory_budget and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.memory_used -= evicted.size
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from nam_reader import NAMReader
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'nam_library.sqlite')
+MODEL_EXTENSIONS = ('.nam',)
+IR_EXTENSIONS = ('.wav',)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    architecture TEXT,
+    version TEXT,
+    num_layers INTEGER,
+    num_weights INTEGER,
+    sample_rate INTEGER,
+    ir_frames INTEGER,
+    ir_channels INTEGER,
+    ir_seconds REAL,
+    metadata TEXT,
+    error TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_kind ON files (kind, architecture, num_weights);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+'''
+
+COLUMNS = ('path', 'kind', 'name', 'size', 'mtime_ns', 'architecture', 'version', 'num_layers',
+           'num_weights', 'sample_rate', 'ir_frames', 'ir_channels', 'ir_seconds', 'metadata',
+           'error', 'indexed_at')
+
+def file_kind(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in MODEL_EXTENSIONS:
+        return 'nam'
+    if extension in IR_EXTENSIONS:
+        return 'ir'
+    return None
+
+def escape_like(text):
+    """Escape LIKE wildcards so text matches literally (with ESCAPE '\\')."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def read_entry(path, size, mtime_ns):
+    """Extract the indexed fields of one file (runs in a worker process).
+
+    Errors are recorded in the entry instead of raised, so a broken file is
+    not parsed again until it changes.
+    """
+    entry = dict.fromkeys(COLUMNS)
+    entry.update(path=path, kind=file_kind(path), name=os.path.basename(path),
+                 size=size, mtime_ns=mtime_ns, indexed_at=time.time())
+    try:
+        if entry['kind'] == 'nam':
+            # Parse only; the index must not fill the weight cache
+            reader = NAMReader(path, cache_dir=None)
+            config = reader.config or {}
+            entry['architecture'] = reader.architecture
+            entry['version'] = reader.version
+            entry['num_layers'] = len(config['layers']) if 'layers' in config else config.get('num_layers', 0)
+            entry['num_weights'] = len(reader.weights)
+            entry['sample_rate'] = reader.sample_rate
+            entry['metadata'] = json.dumps(reader.metadata) if reader.metadata else None
+        else:
+            import soundfile as sf
+            info = sf.info(path)
+            entry['sample_rate'] = info.samplerate
+            entry['ir_frames'] = info.frames
+            entry['ir_channels'] = info.channels
+            entry['ir_seconds'] = info.duration
+    except Exception as e:
+        entry['error'] = str(e)
+    return entry
+
+class ModelLibrary:
+    """SQLite index of NAM captures and IRs.
+
+    ``scan`` walks directories and re-reads only files whose size or mtime
+    changed since the last scan, parsing them in a process pool. Queries
+    run against the index alone and never open the model files. Every call
+    opens and closes its own connection, so the library can be used from
+    any thread.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def scan(self, directories, workers=None, prune=True):
+        """Index new and changed files under the given directories.
+
+        Args:
+            directories (list): Directories (or single files) to walk
+            workers (int): Parser processes (default: CPU count)
+            prune (bool): Drop entries for files that no longer exist
+                under the scanned directories
+
+        Returns:
+            dict: Counts of files seen, (re)indexed, removed and failed
+        """
+        found = {}
+        for directory in directories:
+            if os.path.isfile(directory):
+                paths = [directory]
+            else:
+                paths = (os.path.join(root, name) for root, _, names in os.walk(directory)
+                         for name in names)
+            for path in paths:
+                if file_kind(path) is None:
+                    continue
+                path = os.path.abspath(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (stat.st_size, stat.st_mtime_ns)
+
+        with closing(self._connect()) as db:
+            known = {row['path']: (row['size'], row['mtime_ns'])
+                     for row in db.execute('SELECT path, size, mtime_ns FROM files')}
+        changed = [(path, size, mtime_ns) for path, (size, mtime_ns) in found.items()
+                   if known.get(path) != (size, mtime_ns)]
+
+        if len(changed) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                entries = list(executor.map(read_entry, *zip(*changed),
+                                            chunksize=max(len(changed) // 64, 1)))
+        else:
+            entries = [read_entry(*item) for item in changed]
+
+        removed = []
+        if prune:
+            roots = tuple(os.path.join(os.path.abspath(d), '') for d in directories if os.path.isdir(d))
+            removed = [(path,) for path in known if path not in found and path.startswith(roots)]
+
+        placeholders = ', '.join('?' * len(COLUMNS))
+        # The inner with commits the transaction, closing() the connection
+        with closing(self._connect()) as db, db:
+            db.executemany(f'INSERT OR REPLACE INTO files ({", ".join(COLUMNS)}) VALUES ({placeholders})',
+                           [tuple(entry[column] for column in COLUMNS) for entry in entries])
+            db.executemany('DELETE FROM files WHERE path = ?', removed)
+
+        return {
+            'files': len(found),
+            'indexed': len(entries),
+            'removed': len(removed),
+            'errors': sum(1 for entry in entries if entry['error'])
+        }
+
+    def query(self, kind=None, architecture=None, min_weights=None, max_weights=None,
+              sample_rate=None, text=None, include_errors=False, limit=None):
+        """Search the index.
+
+        Args:
+            kind (str): 'nam' or 'ir'
+            architecture (str): e.g. 'WaveNet', 'LSTM' (case-insensitive)
+            min_weights (int): Minimum weight count
+            max_weights (int): Maximum weight count
+            sample_rate (int): Expected sample rate
+            text (str): Substring of the file name, path or metadata
+            include_errors (bool): Also return files that failed to parse
+            limit (int): Maximum number of results
+
+        Returns:
+            list: One dict per file, sorted by name; metadata is decoded
+        """
+        clauses, args = [], []
+        if kind is not None:
+            clauses.append('kind = ?')
+            args.append(kind)
+        if architecture is not None:
+            clauses.append('architecture = ? COLLATE NOCASE')
+            args.append(architecture)
+        if min_weights is not None:
+            clauses.append('num_weights >= ?')
+            args.append(min_weights)
+        if max_weights is not None:
+            clauses.append('num_weights <= ?')
+            args.append(max_weights)
+        if sample_rate is not None:
+            clauses.append('sample_rate = ?')
+            args.append(sample_rate)
+        if text:
+            clauses.append("(path LIKE ? ESCAPE '\\' OR metadata LIKE ? ESCAPE '\\')")
+            args.extend([f'%{escape_like(text)}%'] * 2)
+        if not include_errors:
+            clauses.append('error IS NULL')
+
+        sql = 'SELECT * FROM files'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY name'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(int(limit))
+
+        with closing(self._connect()) as db:
+            rows = [dict(row) for row in db.execute(sql, args)]
+        for row in rows:
+            row['metadata'] = json.loads(row['metadata']) if row['metadata'] else {}
+        return rows
+
+    def stats(self):
+        """Number of indexed files per kind and architecture."""
+        with closing(self._connect()) as db:
+            rows = db.execute('SELECT kind, architecture, COUNT(*) AS count FROM files '
+                              'WHERE error IS NULL GROUP BY kind, architecture').fetchall()
+        return [dict(row) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and search NAM captures and IRs.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Index database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = subparsers.add_parser('scan', help='Index new and changed files')
+    scan_parser.add_argument('directories', nargs='+')
+    scan_parser.add_argument('-j', '--workers', type=int, default=None)
+
+    query_parser = subparsers.add_parser('query', help='Search the index')
+    query_parser.add_argument('text', nargs='?')
+    query_parser.add_argument('--kind', choices=['nam', 'ir'])
+    query_parser.add_argument('--architecture')
+    query_parser.add_argument('--min-weights', type=int)
+    query_parser.add_argument('--max-weights', type=int)
+    query_parser.add_argument('--sample-rate', type=int)
+    query_parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    library = ModelLibrary(args.db)
+    if args.command == 'scan':
+        start = time.perf_counter()
+        result = library.scan(args.directories, workers=args.workers)
+        print(f"{result['files']} files, {result['indexed']} indexed, {result['removed']} removed, "
+              f"{result['errors']} errors in {time.perf_counter() - start:.2f} s")
+    else:
+        for row in library.query(args.kind, args.architecture, args.min_weights, args.max_weights,
+                                 args.sample_rate, args.text, limit=args.limit):
+            if row['kind'] == 'nam':
+                print(f"{row['architecture'] or '?':10s} {row['num_weights'] or 0:9d} weights  {row['path']}")
+            else:
+                print(f"{'IR':10s} {row['ir_seconds'] or 0:9.3f} s        {row['path']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/numpy.h>
+#include <vector>
 #include "../NeuralAmpModelerCore/NAM/dsp.h"
 #include "../NeuralAmpModelerCore/NAM/get_dsp.h"
 #include "../AudioDSPTools/dsp/ImpulseResponse.h"
@@ -8,6 +9,54 @@
 
 namespace py = pybind11;
 
+// Validates a 1-D C-contiguous float32/float64 array and returns its buffer.
+// Nothing is converted or copied here: a non-contiguous or wrongly typed
+// array is an error rather than a silent temporary.
+static py::buffer_info request_audio_buffer(const py::array& array, const char* name, bool writable) {
+    if (!(array.flags() & py::array::c_style)) {
+        throw py::value_error(std::string(name) + " must be C-contiguous");
+    }
+    if (writable && !array.writeable()) {
+        throw py::value_error(std::string(name) + " must be writable");
+    }
+    py::buffer_info buf = array.request(writable);
+    if (buf.ndim != 1) {
+        throw py::value_error(std::string(name) + " must be one-dimensional");
+    }
+    if (buf.format != py::format_descriptor<float>::format() &&
+        buf.format != py::format_descriptor<double>::format()) {
+        throw py::type_error(std::string(name) + " must be float32 or float64");
+    }
+    return buf;
+}
+
+static bool is_format(const py::buffer_info& buf, const std::string& format) {
+    return buf.format == format;
+}
+
+// Copies between a float32/float64 buffer and a typed scratch vector.
+template <typename T>
+static void copy_from_buffer(const py::buffer_info& buf, T* dst) {
+    if (is_format(buf, py::format_descriptor<float>::format())) {
+        const float* src = static_cast<const float*>(buf.ptr);
+        for (py::ssize_t i = 0; i < buf.size; i++) dst[i] = static_cast<T>(src[i]);
+    } else {
+        const double* src = static_cast<const double*>(buf.ptr);
+        for (py::ssize_t i = 0; i < buf.size; i++) dst[i] = static_cast<T>(src[i]);
+    }
+}
+
+template <typename T>
+static void copy_to_buffer(const T* src, py::buffer_info& buf) {
+    if (is_format(buf, py::format_descriptor<float>::format())) {
+        float* dst = static_cast<float*>(buf.ptr);
+        for (py::ssize_t i = 0; i < buf.size; i++) dst[i] = static_cast<float>(src[i]);
+    } else {
+        double* dst = static_cast<double*>(buf.ptr);
+        for (py::ssize_t i = 0; i < buf.size; i++) dst[i] = static_cast<double>(src[i]);
+    }
+}
+
 class PyNAMProcessor {
 public:
     PyNAMProcessor(const std::string& model_path) {
@@ -26,17 +75,59 @@ public:
         py::buffer_info out_buf = output.request();
         double* output_ptr = static_cast<double*>(out_buf.ptr);
 
-        dsp->process(input_ptr, output_ptr, num_samples);
+        {
+            py::gil_scoped_release release;
+            dsp->process(input_ptr, output_ptr, num_samples);
+        }
         return output;
     }
 
+    // Processes input into a caller-owned output buffer of the same length.
+    // When the dtypes match the model's sample type the core reads and
+    // writes the numpy memory directly; otherwise the conversion goes
+    // through scratch vectors that only grow, so steady-state calls do not
+    // allocate. The GIL is released once the buffers are validated, so
+    // models on different threads process in parallel; the arrays stay
+    // referenced by the caller for the whole call.
+    void process_into(py::array input, py::array output) {
+        py::buffer_info in_buf = request_audio_buffer(input, "input", false);
+        py::buffer_info out_buf = request_audio_buffer(output, "output", true);
+        if (in_buf.size != out_buf.size) {
+            throw py::value_error("input and output must have the same length");
+        }
+        const int num_samples = static_cast<int>(in_buf.size);
+        const std::string native = py::format_descriptor<NAM_SAMPLE>::format();
+        py::gil_scoped_release release;
+
+        NAM_SAMPLE* input_ptr;
+        if (is_format(in_buf, native)) {
+            input_ptr = static_cast<NAM_SAMPLE*>(in_buf.ptr);
+        } else {
+            if (input_scratch.size() < static_cast<size_t>(in_buf.size)) input_scratch.resize(in_buf.size);
+            copy_from_buffer(in_buf, input_scratch.data());
+            input_ptr = input_scratch.data();
+        }
+
+        if (is_format(out_buf, native)) {
+            dsp->process(input_ptr, static_cast<NAM_SAMPLE*>(out_buf.ptr), num_samples);
+        } else {
+            if (output_scratch.size() < static_cast<size_t>(out_buf.size)) output_scratch.resize(out_buf.size);
+            dsp->process(input_ptr, output_scratch.data(), num_samples);
+            copy_to_buffer(output_scratch.data(), out_buf);
+        }
+    }
+
+    // Prewarming runs the model for a while; other threads keep running.
     void reset(double sample_rate, int buffer_size) {
+        py::gil_scoped_release release;
         dsp->Reset(sample_rate, buffer_size);
         dsp->prewarm();
     }
 
 private:
     std::unique_ptr<nam::DSP> dsp;
+    std::vector<NAM_SAMPLE> input_scratch;
+    std::vector<NAM_SAMPLE> output_scratch;
 };
 
 class PyIRProcessor {
@@ -57,7 +148,11 @@ public:
         double* input_buffer[1] = { input_ptr };
 
         // Process through IR
-        double** output_buffer = ir->Process(input_buffer, 1, num_samples);
+        double** output_buffer;
+        {
+            py::gil_scoped_release release;
+            output_buffer = ir->Process(input_buffer, 1, num_samples);
+        }
 
         // Create output numpy array
         auto output = py::array_t<double>(num_samples);
@@ -70,17 +165,48 @@ public:
         return output;
     }
 
+    // Processes input into a caller-owned output buffer of the same length.
+    // float64 input is handed to the convolution without a copy; the result
+    // is converted straight from the IR's output into the caller's buffer,
+    // replacing the allocate + memcpy + astype round trip of process().
+    void process_into(py::array input, py::array output) {
+        py::buffer_info in_buf = request_audio_buffer(input, "input", false);
+        py::buffer_info out_buf = request_audio_buffer(output, "output", true);
+        if (in_buf.size != out_buf.size) {
+            throw py::value_error("input and output must have the same length");
+        }
+        const int num_samples = static_cast<int>(in_buf.size);
+        const std::string native = py::format_descriptor<double>::format();
+        py::gil_scoped_release release;
+
+        double* input_ptr;
+        if (is_format(in_buf, native)) {
+            input_ptr = static_cast<double*>(in_buf.ptr);
+        } else {
+            if (input_scratch.size() < static_cast<size_t>(in_buf.size)) input_scratch.resize(in_buf.size);
+            copy_from_buffer(in_buf, input_scratch.data());
+            input_ptr = input_scratch.data();
+        }
+
+        double* input_buffer[1] = { input_ptr };
+        double** output_buffer = ir->Process(input_buffer, 1, num_samples);
+        copy_to_buffer(output_buffer[0], out_buf);
+    }
+
 private:
     std::unique_ptr<dsp::ImpulseResponse> ir;
+    std::vector<double> input_scratch;
 };
 
 PYBIND11_MODULE(nam_binding, m) {
     py::class_<PyNAMProcessor>(m, "NAMProcessor")
         .def(py::init<const std::string&>())
         .def("process", &PyNAMProcessor::process)
+        .def("process_into", &PyNAMProcessor::process_into, py::arg("input"), py::arg("output"))
         .def("reset", &PyNAMProcessor::reset);
 
     py::class_<PyIRProcessor>(m, "IRProcessor")
         .def(py::init<const std::string&, double>())
-        .def("process", &PyIRProcessor::process);
+        .def("process", &PyIRProcessor::process)
+        .def("process_into", &PyIRProcessor::process_into, py::arg("input"), py::arg("output"));
 }
\ No newline at end of file
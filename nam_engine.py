@@ -0,0 +1,486 @@
+"""PyTorch inference for .nam models (WaveNet, LSTM, ConvNet, Linear).
+
+Models are rebuilt from ``NAMReader.config`` and ``NAMReader.weights``
+using the weight layout of the NAM exporter, and run as batched tensor
+operations on the CPU. Every model keeps explicit streaming state, so the
+same code serves block-by-block processing (``TorchNAMProcessor``, a
+drop-in for ``nam_binding.NAMProcessor``) and bulk offline rendering,
+where many files, or many segments of one file, are processed as one batch.
+
+Command line:
+
+    python nam_engine.py model.nam di/*.wav -o reamped --batch 32
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+import torch
+import torch.nn.functional as F
+from nam_reader import NAMReader
+
+DEFAULT_SAMPLE_RATE = 48000.0  # Assumed by the NAM core for files without one
+LSTM_PREWARM_SECONDS = 0.5
+
+def _fast_tanh(x):
+    """The rational tanh approximation used by the NAM core's "Fasttanh"."""
+    ax = x.abs()
+    x2 = x * x
+    return (x * (2.45550750702956 + 2.45550750702956 * ax + (0.893229853513558 + 0.821226666969744 * ax) * x2)
+            / (2.44506634652299 + (2.44506634652299 + x2) * (x + 0.814642734961073 * x * ax).abs()))
+
+def _leaky_hardtanh(x):
+    return torch.where(x < -1.0, -1.0 + 0.01 * (x + 1.0),
+                       torch.where(x > 1.0, 1.0 + 0.01 * (x - 1.0), x))
+
+ACTIVATIONS = {
+    'Tanh': torch.tanh,
+    'Fasttanh': _fast_tanh,
+    'Hardtanh': F.hardtanh,
+    'LeakyHardtanh': _leaky_hardtanh,
+    'ReLU': F.relu,
+    'LeakyReLU': F.leaky_relu,
+    'Sigmoid': torch.sigmoid,
+    'SiLU': F.silu,
+    'Hardswish': F.hardswish
+}
+
+def get_activation(spec):
+    """Look up an activation given as a name or as {"type": name}."""
+    name = spec.get('type') if isinstance(spec, dict) else spec
+    if isinstance(spec, dict) and len(spec) > 1:
+        raise ValueError(f'Parameterized activations are not supported: {spec}')
+    if name not in ACTIVATIONS:
+        raise ValueError(f'Unsupported activation: {name}')
+    return ACTIVATIONS[name]
+
+class _WeightStream:
+    """Hands out consecutive slices of the flat weight vector."""
+
+    def __init__(self, weights):
+        self.weights = torch.as_tensor(np.asarray(weights, dtype=np.float32))
+        self.index = 0
+
+    def take(self, *shape):
+        count = math.prod(shape)
+        if self.index + count > len(self.weights):
+            raise ValueError('Model file has fewer weights than its config requires')
+        values = self.weights[self.index:self.index + count].reshape(shape)
+        self.index += count
+        return values.clone()
+
+    def finish(self):
+        if self.index != len(self.weights):
+            raise ValueError(f'Model file has {len(self.weights) - self.index} unused weights')
+
+def _causal_conv(x, history, weight, bias=None, dilation=1):
+    """Valid convolution of history + x; returns (output, new history)."""
+    full = torch.cat((history, x), dim=2)
+    keep = history.shape[2]
+    new_history = full[:, :, full.shape[2] - keep:].clone() if keep else history
+    return F.conv1d(full, weight, bias, dilation=dilation), new_history
+
+class NAMModel:
+    """Base class: a model runs (batch, frames) float32 tensors with explicit state."""
+
+    receptive_field = 1
+    sample_rate = DEFAULT_SAMPLE_RATE
+
+    def init_state(self, batch):
+        """Zero state for a batch of independent streams."""
+        raise NotImplementedError
+
+    def forward(self, x, state):
+        """Process x of shape (batch, frames); returns (output, new state)."""
+        raise NotImplementedError
+
+    @property
+    def prewarm_samples(self):
+        """Zeros processed after a reset so the state settles, as in the NAM core."""
+        return self.receptive_field
+
+def _classic_layer_config(config):
+    """Map a WaveNet layer array in the newer export format onto the classic keys.
+
+    Only what the classic format can express is accepted: one kernel size
+    and activation for all layers, a 1x1 head, optional gating with a
+    sigmoid, and no bottleneck, grouping, FiLM, head 1x1 or slimming.
+    """
+    if 'head' not in config:
+        return config
+    channels = config['channels']
+    kernel_sizes = set(config.get('kernel_sizes') or [config.get('kernel_size')])
+    activations = config['activation'] if isinstance(config['activation'], list) else [config['activation']]
+    gating_modes = set(config.get('gating_mode') or ['none'])
+    secondaries = [s for s in config.get('secondary_activation') or [] if s is not None]
+    films = [value for key, value in config.items() if key.endswith('_film')]
+    if (len(kernel_sizes) != 1 or len({get_activation(a) for a in activations}) != 1
+            or config['head']['kernel_size'] != 1
+            or config.get('bottleneck', channels) != channels
+            or config.get('groups_input', 1) != 1 or config.get('groups_input_mixin', 1) != 1
+            or config.get('head1x1', {}).get('active', False)
+            or not config.get('layer1x1', {}).get('active', True)
+            or config.get('layer1x1', {}).get('groups', 1) != 1
+            or any(film.get('active') for film in films) or config.get('slimmable')
+            or len(gating_modes) != 1 or not gating_modes <= {'none', 'gated'}
+            or any(get_activation(s) is not torch.sigmoid for s in secondaries)):
+        raise ValueError('Unsupported WaveNet layer options (only the classic layout is supported)')
+    return {
+        'input_size': config['input_size'],
+        'condition_size': config['condition_size'],
+        'head_size': config['head']['out_channels'],
+        'channels': channels,
+        'kernel_size': kernel_sizes.pop(),
+        'dilations': config['dilations'],
+        'activation': activations[0],
+        'gated': gating_modes == {'gated'},
+        'head_bias': config['head']['bias']
+    }
+
+class WaveNet(NAMModel):
+    SUPPORTED_KEYS = {'input_size', 'condition_size', 'head_size', 'channels', 'kernel_size',
+                      'dilations', 'activation', 'gated', 'head_bias'}
+
+    def __init__(self, config, weights):
+        if config.get('head') is not None or config.get('condition_dsp') is not None:
+            raise ValueError('WaveNet models with a post-head or condition DSP are not supported')
+        self.arrays = []
+        for layer_config in config['layers']:
+            layer_config = _classic_layer_config(layer_config)
+            unsupported = set(layer_config) - self.SUPPORTED_KEYS
+            if unsupported:
+                raise ValueError(f'Unsupported WaveNet layer options: {sorted(unsupported)}')
+            channels = layer_config['channels']
+            kernel_size = layer_config['kernel_size']
+            gated = layer_config.get('gated', False)
+            conv_channels = 2 * channels if gated else channels
+            array = {
+                'channels': channels,
+                'gated': gated,
+                'activation': get_activation(layer_config['activation']),
+                'rechannel': weights.take(channels, layer_config['input_size'], 1),
+                'layers': []
+            }
+            for dilation in layer_config['dilations']:
+                array['layers'].append({
+                    'dilation': dilation,
+                    'history': (kernel_size - 1) * dilation,
+                    'conv_weight': weights.take(conv_channels, channels, kernel_size),
+                    'conv_bias': weights.take(conv_channels),
+                    'mixin': weights.take(conv_channels, layer_config['condition_size'], 1),
+                    'out_weight': weights.take(channels, channels, 1),
+                    'out_bias': weights.take(channels)
+                })
+            array['head_weight'] = weights.take(layer_config['head_size'], channels, 1)
+            array['head_bias'] = weights.take(layer_config['head_size']) if layer_config.get('head_bias') else None
+            self.arrays.append(array)
+        self.head_scale = float(weights.take(1)[0])
+        weights.finish()
+        self.receptive_field = 1 + sum(layer['history'] for array in self.arrays for layer in array['layers'])
+
+    def init_state(self, batch):
+        return [[torch.zeros(batch, array['channels'], layer['history']) for layer in array['layers']]
+                for array in self.arrays]
+
+    def forward(self, x, state):
+        condition = x[:, None, :]
+        layer_input = condition
+        head = None
+        new_state = []
+        for array, histories in zip(self.arrays, state):
+            channels = array['channels']
+            activation = array['activation']
+            y = F.conv1d(layer_input, array['rechannel'])
+            head_sum = head
+            array_state = []
+            for layer, history in zip(array['layers'], histories):
+                z, history = _causal_conv(y, history, layer['conv_weight'], layer['conv_bias'],
+                                          layer['dilation'])
+                array_state.append(history)
+                z = z + F.conv1d(condition, layer['mixin'])
+                if array['gated']:
+                    z = activation(z[:, :channels]) * torch.sigmoid(z[:, channels:])
+                else:
+                    z = activation(z)
+                head_sum = z if head_sum is None else head_sum + z
+                y = y + F.conv1d(z, layer['out_weight'], layer['out_bias'])
+            head = F.conv1d(head_sum, array['head_weight'], array['head_bias'])
+            layer_input = y
+            new_state.append(array_state)
+        return self.head_scale * head[:, 0, :], new_state
+
+class LSTM(NAMModel):
+    def __init__(self, config, weights):
+        self.num_layers = config['num_layers']
+        self.hidden_size = hidden = config['hidden_size']
+        input_size = config.get('input_size', 1)
+        self.core = torch.nn.LSTM(input_size, hidden, self.num_layers, batch_first=True)
+        self.core.requires_grad_(False)
+        initial_hidden, initial_cell = [], []
+        for layer in range(self.num_layers):
+            layer_input = input_size if layer == 0 else hidden
+            # One (4H, input + H) matrix per cell, gates in PyTorch order
+            w = weights.take(4 * hidden, layer_input + hidden)
+            getattr(self.core, f'weight_ih_l{layer}').copy_(w[:, :layer_input])
+            getattr(self.core, f'weight_hh_l{layer}').copy_(w[:, layer_input:])
+            getattr(self.core, f'bias_ih_l{layer}').copy_(weights.take(4 * hidden))
+            getattr(self.core, f'bias_hh_l{layer}').zero_()
+            initial_hidden.append(weights.take(hidden))
+            initial_cell.append(weights.take(hidden))
+        self.initial_hidden = torch.stack(initial_hidden)
+        self.initial_cell = torch.stack(initial_cell)
+        self.head_weight = weights.take(hidden)
+        self.head_bias = weights.take(1)
+        weights.finish()
+
+    @property
+    def prewarm_samples(self):
+        return int(LSTM_PREWARM_SECONDS * self.sample_rate)
+
+    def init_state(self, batch):
+        return (self.initial_hidden[:, None, :].repeat(1, batch, 1).contiguous(),
+                self.initial_cell[:, None, :].repeat(1, batch, 1).contiguous())
+
+    def forward(self, x, state):
+        features, state = self.core(x[:, :, None], state)
+        return features @ self.head_weight + self.head_bias, state
+
+class ConvNet(NAMModel):
+    def __init__(self, config, weights):
+        channels = config['channels']
+        batchnorm = config.get('batchnorm', False)
+        self.activation = get_activation(config.get('activation', 'Tanh'))
+        self.blocks = []
+        for i, dilation in enumerate(config['dilations']):
+            in_channels = 1 if i == 0 else channels
+            block = {
+                'dilation': dilation,
+                'in_channels': in_channels,
+                'weight': weights.take(channels, in_channels, 2),
+                'bias': None if batchnorm else weights.take(channels),
+                'scale': None
+            }
+            if batchnorm:
+                running_mean = weights.take(channels)
+                running_var = weights.take(channels)
+                bn_weight = weights.take(channels)
+                bn_bias = weights.take(channels)
+                eps = weights.take(1)
+                scale = bn_weight / torch.sqrt(eps + running_var)
+                block['scale'] = scale[None, :, None]
+                block['loc'] = (bn_bias - scale * running_mean)[None, :, None]
+            self.blocks.append(block)
+        self.head_weight = weights.take(1, channels, 1)
+        self.head_bias = weights.take(1)
+        weights.finish()
+        self.receptive_field = 1 + sum(config['dilations'])
+
+    def init_state(self, batch):
+        return [torch.zeros(batch, block['in_channels'], block['dilation']) for block in self.blocks]
+
+    def forward(self, x, state):
+        y = x[:, None, :]
+        new_state = []
+        for block, history in zip(self.blocks, state):
+            y, history = _causal_conv(y, history, block['weight'], block['bias'], block['dilation'])
+            new_state.append(history)
+            if block['scale'] is not None:
+                y = y * block['scale'] + block['loc']
+            y = self.activation(y)
+        return F.conv1d(y, self.head_weight, self.head_bias)[:, 0, :], new_state
+
+class Linear(NAMModel):
+    def __init__(self, config, weights):
+        self.receptive_field = config['receptive_field']
+        self.weight = weights.take(1, 1, self.receptive_field)
+        self.bias = weights.take(1) if config.get('bias') else None
+        weights.finish()
+
+    def init_state(self, batch):
+        return torch.zeros(batch, 1, self.receptive_field - 1)
+
+    def forward(self, x, state):
+        y, state = _causal_conv(x[:, None, :], state, self.weight, self.bias)
+        return y[:, 0, :], state
+
+ARCHITECTURES = {
+    'WaveNet': WaveNet,
+    'LSTM': LSTM,
+    'ConvNet': ConvNet,
+    'Linear': Linear
+}
+
+def load_model(path):
+    """Build a NAMModel from a .nam file.
+
+    Args:
+        path (str): Path of the .nam file
+
+    Returns:
+        NAMModel: The model, with ``sample_rate`` set to the rate it was
+            trained at (48 kHz when the file does not say)
+    """
+    reader = NAMReader(path)
+    model_class = ARCHITECTURES.get(reader.architecture)
+    if model_class is None:
+        raise ValueError(f'Unsupported NAM architecture: {reader.architecture}')
+    model = model_class(reader.config, _WeightStream(reader.weights))
+    model.sample_rate = float(reader.sample_rate or DEFAULT_SAMPLE_RATE)
+    return model
+
+class TorchNAMProcessor:
+    """Streaming NAM processor with the interface of nam_binding.NAMProcessor.
+
+    Runs one stream (batch of one) block by block. ``process_batch`` and
+    ``process_segments`` run many streams at once for offline rendering;
+    they use their own state and leave the streaming state untouched.
+
+    Args:
+        model_path (str): Path of the .nam file
+    """
+
+    def __init__(self, model_path):
+        self.model = load_model(model_path)
+        self.state = None
+        self.reset()
+
+    def _prewarmed_state(self, batch):
+        state = self.model.init_state(batch)
+        samples = self.model.prewarm_samples
+        if samples > 1:
+            with torch.inference_mode():
+                _, state = self.model.forward(torch.zeros(batch, samples), state)
+        return state
+
+    def reset(self, sample_rate=None, block_size=None):
+        """Clear the streaming state and prewarm it, like the native reset()."""
+        self.state = self._prewarmed_state(1)
+
+    def process(self, input):
+        output = np.empty(len(input), dtype=np.float64)
+        self.process_into(np.ascontiguousarray(input), output)
+        return output
+
+    def process_into(self, input, output):
+        with torch.inference_mode():
+            x = torch.as_tensor(input, dtype=torch.float32)[None, :]
+            y, self.state = self.model.forward(x, self.state)
+        output[...] = y[0].numpy()
+
+    def process_batch(self, signals, chunk_size=65536):
+        """Process independent signals as one batch, each from a prewarmed state.
+
+        Args:
+            signals (list): 1-D arrays, possibly of different lengths
+            chunk_size (int): Frames per forward pass, bounds memory use
+
+        Returns:
+            list: One float32 output array per signal
+        """
+        lengths = [len(signal) for signal in signals]
+        batch = np.zeros((len(signals), max(lengths, default=0)), dtype=np.float32)
+        for row, signal in zip(batch, signals):
+            row[:len(signal)] = signal
+
+        outputs = np.empty_like(batch)
+        with torch.inference_mode():
+            state = self._prewarmed_state(len(signals))
+            for start in range(0, batch.shape[1], chunk_size):
+                y, state = self.model.forward(torch.from_numpy(batch[:, start:start + chunk_size]), state)
+                outputs[:, start:start + y.shape[1]] = y.numpy()
+        return [output[:length] for output, length in zip(outputs, lengths)]
+
+    def process_segments(self, signal, segment_length, overlap=None, chunk_size=65536):
+        """Process one long signal as a batch of segments.
+
+        Each segment is preceded by ``overlap`` samples of the audio before
+        it, which are processed and discarded. For the convolutional models
+        the default overlap is the receptive field and the result equals
+        streaming the whole signal; for LSTM models it is an approximation
+        that improves with the overlap (default LSTM_PREWARM_SECONDS).
+
+        Args:
+            signal (ndarray): 1-D input
+            segment_length (int): Output samples per segment
+            overlap (int): Warm-up samples per segment
+            chunk_size (int): Frames per forward pass
+
+        Returns:
+            ndarray: float32 output of the same length as signal
+        """
+        if overlap is None:
+            overlap = self.model.prewarm_samples if isinstance(self.model, LSTM) else self.model.receptive_field - 1
+        segments = []
+        for start in range(0, len(signal), segment_length):
+            segments.append(signal[max(start - overlap, 0):start + segment_length])
+        outputs = self.process_batch(segments, chunk_size)
+        pieces = [output[min(start, overlap):] for start, output
+                  in zip(range(0, len(signal), segment_length), outputs)]
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+def render_files(model_path, input_files, output_dir, batch_size=32, segment_seconds=None,
+                 suffix='_nam'):
+    """Re-amp DI files through a model, batching files (or their segments).
+
+    Args:
+        model_path (str): Path of the .nam file
+        input_files (list): Input audio files (mono, or the first channel is used)
+        output_dir (str): Folder for the rendered files
+        batch_size (int): Files (or segments) per batch
+        segment_seconds (float): Split files into segments of this length
+            and batch the segments; exact for convolutional models
+
+    Returns:
+        list: Output paths
+    """
+    processor = TorchNAMProcessor(model_path)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for start in range(0, len(input_files), batch_size):
+        paths = input_files[start:start + batch_size]
+        signals, rates = [], []
+        for path in paths:
+            audio, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+            signals.append(audio[:, 0])
+            rates.append(sample_rate)
+
+        if segment_seconds:
+            rendered = [processor.process_segments(signal, int(segment_seconds * rate))
+                        for signal, rate in zip(signals, rates)]
+        else:
+            rendered = processor.process_batch(signals)
+
+        for path, audio, sample_rate in zip(paths, rendered, rates):
+            name, ext = os.path.splitext(os.path.basename(path))
+            output_path = os.path.join(output_dir, f'{name}{suffix}{ext}')
+            sf.write(output_path, audio, sample_rate)
+            outputs.append(output_path)
+    return outputs
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-amp DI files through a .nam model with PyTorch.')
+    parser.add_argument('model', help='.nam model file')
+    parser.add_argument('inputs', nargs='+', help='DI files')
+    parser.add_argument('-o', '--output-dir', default='reamped', help='Output folder')
+    parser.add_argument('--batch', type=int, default=32, help='Files per batch')
+    parser.add_argument('--segment-seconds', type=float, default=None,
+                        help='Also split each file into segments processed as one batch')
+    parser.add_argument('--threads', type=int, default=None, help='Torch intra-op threads')
+    parser.add_argument('--suffix', default='_nam', help='Suffix added to output file names')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    start = time.perf_counter()
+    outputs = render_files(args.model, args.inputs, args.output_dir, args.batch,
+                           args.segment_seconds, args.suffix)
+    elapsed = time.perf_counter() - start
+    total = sum(sf.info(path).duration for path in outputs)
+    print(f'Rendered {len(outputs)} files, {total:.1f}s audio in {elapsed:.2f}s '
+          f'({total / elapsed:.1f}x real time)')
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,109 @@
+import hashlib
 import json
+import os
 import numpy as np
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'nam_reader')
+
 class NAMReader:
-    def __init__(self, file_path):
+    """Reader for .nam files with a binary weight cache.
+
+    The first open parses the JSON and writes two files to ``cache_dir``:
+    the weights as a contiguous .npy array and the remaining fields as a
+    small JSON header. Entries are keyed by the model's path, size and
+    modification time, so an edited model gets a fresh entry. Later opens
+    only stat the model: the header is parsed on first access to
+    ``version``, ``architecture`` or ``config``, and the weights are
+    memory-mapped read-only on first access to ``weights``.
+
+    Args:
+        file_path (str): Path of the .nam file
+        cache_dir (str): Cache directory, or None to always parse the JSON
+        dtype: Weight dtype (float64 or float32)
+    """
+
+    def __init__(self, file_path, cache_dir=DEFAULT_CACHE_DIR, dtype=np.float64):
         self.file_path = file_path
-        self.version = None
-        self.architecture = None
-        self.config = None
-        self.weights = None
+        self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype)
+        self._header = None
+        self._weights = None
         self._load_nam_file()
 
+    @property
+    def version(self):
+        return self._get_header().get('version')
+
+    @property
+    def architecture(self):
+        return self._get_header().get('architecture')
+
+    @property
+    def config(self):
+        return self._get_header().get('config')
+
+    @property
+    def sample_rate(self):
+        """Sample rate the model was trained at, if the file records it."""
+        return self._get_header().get('sample_rate')
+
+    @property
+    def metadata(self):
+        """Free-form metadata (gear, author, loudness...) embedded in the file."""
+        return self._get_header().get('metadata') or {}
+
+    @property
+    def weights(self):
+        if self._weights is None:
+            self._weights = np.load(self._weights_path, mmap_mode='r')
+        return self._weights
+
+    def _cache_paths(self):
+        stat = os.stat(self.file_path)
+        identity = f'{os.path.abspath(self.file_path)}|{stat.st_size}|{stat.st_mtime_ns}'
+        key = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f'{base}.json', f'{base}.{self.dtype.name}.npy'
+
     def _load_nam_file(self):
-        """Load and parse a NAM file."""
+        """Load a NAM file, from the cache when a valid entry exists."""
         try:
+            if self.cache_dir is not None:
+                self._header_path, self._weights_path = self._cache_paths()
+                if os.path.exists(self._header_path) and os.path.exists(self._weights_path):
+                    return
+
             with open(self.file_path, 'r') as f:
                 data = json.load(f)
-                self.version = data.get('version')
-                self.architecture = data.get('architecture')
-                self.config = data.get('config')
-                self.weights = np.array(data.get('weights', []))
+            self._weights = np.array(data.pop('weights', []), dtype=self.dtype)
+            self._header = data
         except Exception as e:
             raise Exception(f"Error loading NAM file: {str(e)}")
 
+        if self.cache_dir is not None:
+            self._write_cache()
+
+    def _write_cache(self):
+        # Written to temporary names and renamed, so a concurrent reader never
+        # sees a partial entry. A read-only cache only costs the speedup.
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_suffix = f'.{os.getpid()}.tmp'
+            with open(self._weights_path + temp_suffix, 'wb') as f:
+                np.save(f, self._weights)
+            with open(self._header_path + temp_suffix, 'w') as f:
+                json.dump(self._header, f)
+            os.replace(self._weights_path + temp_suffix, self._weights_path)
+            os.replace(self._header_path + temp_suffix, self._header_path)
+        except OSError as e:
+            print(f'Could not write NAM cache for {self.file_path}: {e}')
+
+    def _get_header(self):
+        if self._header is None:
+            with open(self._header_path, 'r') as f:
+                self._header = json.load(f)
+        return self._header
+
     def get_model_info(self):
         """Return basic information about the model."""
         return {
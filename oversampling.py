@@ -0,0 +1,329 @@
+"""Oversampling container for nonlinear stages.
+
+``OversampledStage`` wraps anything with ``process``/``reset`` (an
+AudioEffect, a NAM processor) and runs it at 2x, 4x or 8x the host rate:
+upsample, run the stage, decimate. Rate changes are designed as a
+cascade of 2x half-band stages and run as one polyphase stage with the
+cascade's combined taps, precomputed. The minimum-phase
+mode keeps the added latency to a few samples for live playing. The
+linear-phase mode has no phase distortion and suits offline rendering.
+Filter state persists across calls, and all buffers are allocated up
+front for ``max_block`` host frames. An ``Oversampler`` can also carry
+several channels, as (frames, channels) audio; it then takes blocks
+with up to that many channels.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+from scipy import signal
+from effects.base_effect import AudioEffect
+
+OVERSAMPLING_FACTORS = (2, 4, 8)
+MODES = ('minimum', 'linear')
+# Taps of the first half-band stage; later stages run at a higher rate and
+# have a proportionally wider transition band, so they need fewer
+FIRST_STAGE_TAPS = 47
+LATER_STAGE_TAPS = 19
+# Decimating by at least BLOCKED_STEP, blocks with at least this many
+# outputs sum tap-group products instead of copying windows
+BLOCKED_OUTPUTS = 128
+BLOCKED_STEP = 4
+
+def halfband_taps(num_taps, mode):
+    """Half-band low-pass (cutoff at a quarter of the high rate), unit DC gain."""
+    taps = signal.firwin(num_taps, 0.5, window=('kaiser', 8.0))
+    if mode == 'minimum':
+        # minimum_phase halves the magnitude in dB, so start from taps * taps
+        taps = signal.minimum_phase(np.convolve(taps, taps), method='homomorphic')
+        taps /= taps.sum()
+    return taps
+
+def cascade_taps(factor, mode):
+    """Low-pass at ``factor`` times the base rate equal to a cascade of 2x
+    half-band stages.
+
+    Stage s runs at 2 ** (s + 1) times the base rate, so at the top rate
+    its taps are spread out with zeros in between; filtering with all of
+    them in turn at the top rate is the same as running the cascade.
+    """
+    taps = np.ones(1)
+    rate_multiple = 1
+    while rate_multiple < factor:
+        num_taps = FIRST_STAGE_TAPS if rate_multiple == 1 else LATER_STAGE_TAPS
+        spread = np.zeros((num_taps - 1) * (factor // (2 * rate_multiple)) + 1)
+        spread[::factor // (2 * rate_multiple)] = halfband_taps(num_taps, mode)
+        taps = np.convolve(taps, spread)
+        rate_multiple *= 2
+    return taps
+
+def _group_delay(taps, factor):
+    """Group delay of a filter at ``factor`` times the base rate, in samples
+    at its own rate, at a hundredth of the base rate."""
+    _, delay = signal.group_delay((taps, [1.0]), w=[0.02 * np.pi / factor])
+    return float(delay[0])
+
+class _FIRBank:
+    """Stateful FIRs sharing one input, evaluated every ``step`` inputs.
+
+    ``taps`` is (length,) for one filter or (length, filters) for several;
+    every output sample then holds one value per filter. The filters are
+    one matmul of the taps against a sliding window view of the input
+    history. Decimating windows overlap by all but ``step`` inputs, which
+    keeps that matmul off BLAS, so a decimating bank copies the windows
+    into contiguous scratch first. For long blocks and large steps it
+    instead multiplies every ``step`` inputs by all tap groups in one
+    matmul and sums the products along diagonals. The history is stored
+    channel-major to keep every window contiguous, and the views for a
+    block size are made on its first use and kept; nothing is allocated
+    while processing.
+    """
+
+    def __init__(self, taps, max_block, frame_shape=(), step=1):
+        # Whole groups of step taps, the last one padded with zeros
+        groups = -(-len(taps) // step)
+        padded = np.zeros((groups * step,) + taps.shape[1:])
+        padded[:len(taps)] = taps
+        self.length = len(padded)
+        self.step = step
+        self.groups = groups
+        self.channels = frame_shape[0] if frame_shape else 1
+        # Window position m holds input n - (length - 1) + m
+        self.window_taps = np.ascontiguousarray(padded[::-1])
+        # group_taps[q, j] = window_taps[step * j + q]
+        self.group_taps = np.ascontiguousarray(self.window_taps.reshape(groups, step).T) \
+            if step > 1 else None
+        self.history = self.length - 1
+        self.extended = np.zeros(frame_shape + (self.history + step * max_block,))
+        # Row i of a channel is the window output i is computed from
+        self._windows = sliding_window_view(self.extended, self.length, axis=-1)[..., ::step, :]
+        self.blocked_outputs = BLOCKED_OUTPUTS if step >= BLOCKED_STEP else max_block + 1
+        if step > 1:
+            copied = min(max_block, self.blocked_outputs - 1)
+            self._copied = np.zeros(self.channels * copied * self.length)
+            self._products = np.zeros(self.channels * (max_block + groups - 1) * groups) \
+                if max_block >= self.blocked_outputs else None
+        self._views = {}
+
+    def _scratch(self, n, channels):
+        """Views for a block of n outputs with that many channels, or of
+        1-D audio for None."""
+        views = self._views.get((n, channels))
+        if views is None:
+            extended, windows = self.extended, self._windows
+            if extended.ndim > 1:
+                rows = 0 if channels is None else slice(channels)
+                extended, windows = extended[rows], windows[rows]
+            step, groups = self.step, self.groups
+            fresh = extended[..., self.history:self.history + step * n]
+            windows = windows[..., :n, :]
+            count = 1 if channels is None else channels
+            if step == 1:
+                filters = (windows,)
+            elif n < self.blocked_outputs:
+                copied = self._copied[:count * n * self.length].reshape(windows.shape)
+                filters = (windows, copied)
+            else:
+                # products[r, j]: inputs step * r onwards times tap group j;
+                # output m sums products[m + j, j] over j
+                frames = extended[..., :step * (n + groups - 1)]
+                frames = frames.reshape(frames.shape[:-1] + (n + groups - 1, step))
+                size = (n + groups - 1) * groups
+                products = self._products[:count * size].reshape(
+                    extended.shape[:-1] + (n + groups - 1, groups))
+                item = products.itemsize
+                diagonals = as_strided(products, extended.shape[:-1] + (n, groups),
+                                       products.strides[:-2] + (groups * item, (groups + 1) * item))
+                filters = (frames, products, diagonals)
+            # The history moves one channel at a time: NumPy copies a 2D
+            # move within one buffer through a temporary
+            rows = extended.reshape(-1, extended.shape[-1])
+            moves = tuple((row[:self.history], row[step * n:step * n + self.history])
+                          for row in rows)
+            views = (fresh, filters, moves)
+            self._views[(n, channels)] = views
+        return views
+
+    def process(self, x, out):
+        """Filter x into channel-major out, (channels, outputs[, filters])."""
+        n = len(x) // self.step
+        fresh, filters, moves = self._scratch(n, None if x.ndim == 1 else x.shape[1])
+        fresh[...] = x.T
+        if len(filters) == 1:
+            np.matmul(filters[0], self.window_taps, out=out)
+        elif len(filters) == 2:
+            windows, copied = filters
+            copied[...] = windows
+            np.matmul(copied, self.window_taps, out=out)
+        else:
+            frames, products, diagonals = filters
+            np.matmul(frames, self.group_taps, out=products)
+            np.sum(diagonals, axis=-1, out=out)
+        for history, kept in moves:
+            history[...] = kept
+
+    def reset(self):
+        self.extended.fill(0)
+
+class PolyphaseStage:
+    """Interpolator and decimator by ``factor`` sharing one low-pass design.
+
+    Interpolation filters every input with all ``factor`` polyphase
+    branches at once, and the rows of the result are the interleaved
+    output. Decimation filters every ``factor``-th window of the
+    high-rate input. Output is kept channel-major, flat so every block
+    size has a contiguous view, and returned as a (frames, channels) view.
+
+    Args:
+        taps (ndarray): Low-pass at the high rate
+        factor (int): Rate ratio
+        max_block (int): Largest input block at the low rate
+        frame_shape (tuple): () for mono, (channels,) for multichannel audio
+    """
+
+    def __init__(self, taps, factor, max_block, frame_shape=()):
+        self.factor = factor
+        self.max_block = max_block
+        self.channels = frame_shape[0] if frame_shape else 1
+        # Interpolation: output phase p is filtered by taps[p::factor], gain
+        # factor; branches[j, p] = factor * taps[factor * j + p]
+        padded = np.zeros(-(-len(taps) // factor) * factor)
+        padded[:len(taps)] = taps
+        branches = factor * padded.reshape(-1, factor)
+        self.up = _FIRBank(branches, max_block, frame_shape)
+        # Decimation: output m is sum_k taps[k] * x[factor * m - k]
+        self.down = _FIRBank(taps, max_block, frame_shape, step=factor)
+        self.upsampled = np.zeros(self.channels * factor * max_block)
+        self.downsampled = np.zeros(self.channels * max_block)
+        # Up and down filters each delay d high-rate samples
+        self.latency = 2 * _group_delay(taps, factor) / factor
+
+    def _output(self, buffer, x, n):
+        """Contiguous channel-major view of buffer for n frames like x."""
+        if x.ndim == 1:
+            return buffer[:n]
+        return buffer[:x.shape[1] * n].reshape(x.shape[1], n)
+
+    def upsample(self, x):
+        n = len(x)
+        out = self._output(self.upsampled, x, self.factor * n)
+        self.up.process(x, out.reshape(out.shape[:-1] + (n, self.factor)))
+        return out.T
+
+    def downsample(self, x):
+        out = self._output(self.downsampled, x, len(x) // self.factor)
+        self.down.process(x, out)
+        return out.T
+
+    def reset(self):
+        self.up.reset()
+        self.down.reset()
+
+class HalfbandStage(PolyphaseStage):
+    """2x interpolator and 2x decimator sharing one half-band design.
+
+    Args:
+        taps (ndarray): Half-band low-pass at the high rate
+        max_block (int): Largest input block at the low rate
+        frame_shape (tuple): () for mono, (channels,) for multichannel audio
+    """
+
+    def __init__(self, taps, max_block, frame_shape=()):
+        super().__init__(taps, 2, max_block, frame_shape)
+
+class Oversampler:
+    """Cascade of half-band stages for a factor of 2, 4 or 8.
+
+    The cascade is designed stage by stage but runs as one polyphase
+    stage at the full factor, so a block costs one filter call each way
+    whatever the factor.
+
+    Args:
+        factor (int): 2, 4 or 8
+        mode (str): 'minimum' (low latency) or 'linear' (linear phase)
+        max_block (int): Largest block at the base rate
+        channels (int): Most channels per block; 1 takes 1-D audio
+    """
+
+    def __init__(self, factor=2, mode='minimum', max_block=1024, channels=1):
+        if factor not in OVERSAMPLING_FACTORS:
+            raise ValueError(f'Oversampling factor must be one of {OVERSAMPLING_FACTORS}')
+        if mode not in MODES:
+            raise ValueError(f'Oversampling mode must be one of {MODES}')
+        self.factor = factor
+        self.mode = mode
+        self.channels = channels
+        frame_shape = () if channels == 1 else (channels,)
+        self.stage = PolyphaseStage(cascade_taps(factor, mode), factor, max_block, frame_shape)
+        self.latency = self.stage.latency  # Round trip, in base-rate samples
+
+    def upsample(self, x):
+        return self.stage.upsample(x)
+
+    def downsample(self, x):
+        return self.stage.downsample(x)
+
+    def reset(self):
+        self.stage.reset()
+
+class OversampledStage:
+    """Runs a mono stage at ``factor`` times the host rate.
+
+    An AudioEffect is prepared for the high rate and block; a native
+    processor is reset to them. Processors with ``process_into`` write
+    into a preallocated buffer, so the wrapper itself allocates nothing
+    while processing. The result has the native processor interface and
+    reports its added delay in ``latency`` (host samples).
+
+    Args:
+        stage: AudioEffect or native processor
+        sample_rate (int): Host rate
+        factor (int): 2, 4 or 8
+        mode (str): 'minimum' for live use, 'linear' for offline rendering
+        max_block (int): Largest host block
+    """
+
+    def __init__(self, stage, sample_rate, factor=2, mode='minimum', max_block=1024):
+        if getattr(stage, 'output_channels', 1) != 1:
+            raise ValueError('Only mono stages can be oversampled')
+        self.stage = stage
+        self.sample_rate = sample_rate
+        self.factor = factor
+        self.max_block = max_block
+        self.inner_rate = sample_rate * factor
+        self.oversampler = Oversampler(factor, mode, max_block)
+        self.inner_output = np.zeros(max_block * factor, dtype=np.float32)
+        self.inner_input = np.zeros(max_block * factor, dtype=np.float32)
+        self.latency = self.oversampler.latency + getattr(stage, 'latency', 0) / factor
+        if isinstance(stage, AudioEffect):
+            stage.prepare(self.inner_rate, max_block * factor)
+        self.reset()
+
+    def reset(self, sample_rate=None, block_size=None):
+        """Clear the filters and reset the stage at the oversampled rate."""
+        self.oversampler.reset()
+        if isinstance(self.stage, AudioEffect):
+            self.stage.reset()
+        else:
+            self.stage.reset(self.inner_rate, self.max_block * self.factor)
+
+    def process(self, input):
+        output = np.empty(len(input), dtype=np.float64)
+        self.process_into(input, output)
+        return output
+
+    def process_into(self, input, output):
+        for start in range(0, len(input), self.max_block):
+            self._process_block(input[start:start + self.max_block],
+                                output[start:start + self.max_block])
+
+    def _process_block(self, input, output):
+        upsampled = self.oversampler.upsample(input)
+        stage = self.stage
+        if hasattr(stage, 'process_into'):
+            # Native processors want C-contiguous float32/float64 buffers
+            inner_input = self.inner_input[:len(upsampled)]
+            inner_input[...] = upsampled
+            processed = self.inner_output[:len(upsampled)]
+            stage.process_into(inner_input, processed)
+        else:
+            processed = stage.process(upsampled)
+        output[...] = self.oversampler.downsample(processed)
@@ -0,0 +1,181 @@
+import numpy as np
+
+class ParameterQueue:
+    """Lock-free single-producer/single-consumer ring of (id, value) pairs.
+
+    The GUI thread is the only writer and the audio thread the only reader.
+    Each side owns one monotonically increasing counter; a slot is filled
+    before the write counter is published, so the reader never sees a
+    half-written entry. Storage is preallocated and nothing is allocated
+    on either side.
+
+    Entries pushed with ``publish=False`` stay invisible to the reader
+    until ``publish``, so a batch of changes is drained in one block.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.write_index = 0
+        self.read_index = 0
+        self.pending_index = 0  # Writer only: entries filled but not yet published
+
+    def push(self, param_id, value, publish=True):
+        """Queue a change. Returns False (and drops it) when the queue is full."""
+        pending_index = self.pending_index
+        if pending_index - self.read_index >= self.capacity:
+            return False
+        slot = pending_index % self.capacity
+        self.ids[slot] = param_id
+        self.values[slot] = value
+        self.pending_index = pending_index + 1
+        if publish:
+            self.write_index = self.pending_index
+        return True
+
+    def publish(self):
+        """Make every pushed entry visible to the reader at once."""
+        self.write_index = self.pending_index
+
+class SmoothedParameter:
+    """Linear ramp from the current value of an attribute to a new target.
+
+    Per-sample parameters are set to a ramp array for the block being
+    processed (the owning stage must accept an array of block length) and
+    back to a plain float afterwards. Other parameters step once per block
+    along the same ramp.
+    """
+
+    def __init__(self, target, attribute, ramp_samples, per_sample, max_block):
+        self.target = target
+        self.attribute = attribute
+        self.ramp_samples = max(int(ramp_samples), 1)
+        self.per_sample = per_sample
+        self.current = float(getattr(target, attribute))
+        self.goal = self.current
+        self.step = 0.0
+        self.remaining = 0
+        self.prepare(max_block)
+
+    def prepare(self, max_block):
+        self.ramp = np.zeros(max_block)
+        self.counts = np.arange(1, max_block + 1, dtype=np.float64)
+
+    def set_goal(self, value):
+        self.goal = value
+        self.remaining = self.ramp_samples
+        self.step = (value - self.current) / self.remaining
+
+    def begin_block(self, frames):
+        """Advance the ramp by one block. Returns True while still moving."""
+        k = min(frames, self.remaining)
+        if self.per_sample:
+            ramp = self.ramp[:frames]
+            np.multiply(self.counts[:k], self.step, out=ramp[:k])
+            ramp[:k] += self.current
+            ramp[k:] = self.goal
+            setattr(self.target, self.attribute, ramp)
+        self.remaining -= k
+        self.current = self.goal if self.remaining == 0 else self.current + self.step * k
+        if not self.per_sample:
+            setattr(self.target, self.attribute, self.current)
+        return self.remaining > 0
+
+    def end_block(self):
+        if self.per_sample:
+            setattr(self.target, self.attribute, self.current)
+
+class ParameterControl:
+    """Registry of smoothed parameters fed through a ParameterQueue.
+
+    Parameters are registered once, off the audio thread, under a hashable
+    key. ``push`` is called from the GUI thread; ``begin_block`` and
+    ``end_block`` bracket every processed block on the audio thread.
+    While ``realtime`` is False (no stream is running) nothing drains the
+    queue, so pushes are applied immediately instead.
+
+    Pushes between ``begin_batch`` and ``end_batch`` (which may nest) are
+    published together and take effect in the same block.
+    """
+
+    def __init__(self, sample_rate=44100, ramp_time=0.02, max_block=1024, capacity=1024):
+        self.sample_rate = sample_rate
+        self.ramp_time = ramp_time
+        self.max_block = max_block
+        self.queue = ParameterQueue(capacity)
+        self.ids = {}
+        self.parameters = []
+        self.active = []
+        self.dropped = 0
+        self.realtime = False
+        self.batch_depth = 0
+
+    def register(self, key, target, attribute, per_sample=False, ramp_time=None):
+        """Register target.attribute under key and return its queue id."""
+        ramp_time = self.ramp_time if ramp_time is None else ramp_time
+        parameter = SmoothedParameter(target, attribute, ramp_time * self.sample_rate,
+                                      per_sample, self.max_block)
+        parameter.ramp_time = ramp_time
+        self.ids[key] = len(self.parameters)
+        self.parameters.append(parameter)
+        return self.ids[key]
+
+    def prepare(self, max_block):
+        """Resize the per-sample ramp buffers (call off the audio thread)."""
+        self.max_block = max_block
+        for parameter in self.parameters:
+            parameter.prepare(max_block)
+
+    def set_sample_rate(self, sample_rate):
+        """Rescale ramp lengths for a new rate (call off the audio thread)."""
+        self.sample_rate = sample_rate
+        for parameter in self.parameters:
+            parameter.ramp_samples = max(int(parameter.ramp_time * sample_rate), 1)
+
+    def push(self, key, value):
+        """Queue a new value for a registered parameter."""
+        param_id = self.ids.get(key)
+        if param_id is None:
+            return False
+        if not self.realtime:
+            parameter = self.parameters[param_id]
+            parameter.current = parameter.goal = float(value)
+            parameter.remaining = 0
+            setattr(parameter.target, parameter.attribute, parameter.current)
+            return True
+        if not self.queue.push(param_id, value, publish=self.batch_depth == 0):
+            self.dropped += 1
+            return False
+        return True
+
+    def begin_batch(self):
+        """Hold back pushes until the matching end_batch."""
+        self.batch_depth += 1
+
+    def end_batch(self):
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.queue.publish()
+
+    def begin_block(self, frames):
+        queue = self.queue
+        read_index = queue.read_index
+        write_index = queue.write_index
+        while read_index < write_index:
+            slot = read_index % queue.capacity
+            parameter = self.parameters[queue.ids[slot]]
+            if parameter.remaining == 0:
+                self.active.append(parameter)
+            parameter.set_goal(float(queue.values[slot]))
+            read_index += 1
+        queue.read_index = read_index
+
+        if self.active:
+            self.active[:] = [p for p in self.active if p.begin_block(frames) or p.per_sample]
+
+    def end_block(self):
+        if self.active:
+            for parameter in self.active:
+                parameter.end_block()
+            self.active[:] = [p for p in self.active if p.remaining > 0]
@@ -0,0 +1,210 @@
+"""Pipelined stages: heavy processors on their own threads.
+
+A PipelineWorker runs one chain step on a dedicated thread. The audio
+thread hands it block N and takes back its output for block N-1, so the
+worker processes block N while the audio thread runs the stages after it
+on block N-1. Several workers in a chain therefore run on separate cores
+as long as their processors release the GIL (the NAM binding does while
+it processes). Each worker delays the chain by one call, which it reports
+in ``latency``; the chain expects calls of a constant size.
+
+Blocks travel through BlockQueues, single-producer/single-consumer rings
+with the counter scheme of ParameterQueue, so the audio data is never
+behind a lock. The audio thread's only synchronization is one
+``Semaphore.release`` per block to wake the worker. That takes the
+semaphore's internal lock, which the worker holds only for a few
+instructions at a time. It is non-blocking and bounded in time, and the
+audio thread never waits for the worker to finish a block.
+"""
+import threading
+import numpy as np
+from effects.base_effect import copy_signal
+
+MAX_CHANNELS = 2
+
+class BlockQueue:
+    """Lock-free single-producer/single-consumer ring of audio blocks.
+
+    The producer owns ``write_index`` and the consumer ``read_index``; each
+    only ever increments its own counter, after the slot is complete. A
+    slot holds up to ``block_size`` frames of up to MAX_CHANNELS channels
+    and records its frame count, channel count and sequence number. Slot
+    views are C-contiguous, as native processors require.
+
+    Args:
+        capacity (int): Number of blocks
+        block_size (int): Largest block in frames
+        dtype: Sample type
+    """
+
+    def __init__(self, capacity, block_size, dtype=np.float32):
+        self.capacity = capacity
+        self.block_size = block_size
+        self.data = np.zeros((capacity, block_size * MAX_CHANNELS), dtype=dtype)
+        self.frames = [0] * capacity
+        self.channels = [1] * capacity
+        self.sequence = [0] * capacity
+        self.write_index = 0
+        self.read_index = 0
+
+    def __len__(self):
+        return self.write_index - self.read_index
+
+    def _view(self, slot):
+        frames, channels = self.frames[slot], self.channels[slot]
+        block = self.data[slot, :frames * channels]
+        return block if channels == 1 else block.reshape(frames, channels)
+
+    def write_slot(self, frames, channels, sequence):
+        """Next free slot to fill before ``publish`` (producer only), or None when full."""
+        if len(self) >= self.capacity:
+            return None
+        slot = self.write_index % self.capacity
+        self.frames[slot] = frames
+        self.channels[slot] = channels
+        self.sequence[slot] = sequence
+        return self._view(slot)
+
+    def publish(self):
+        self.write_index += 1
+
+    def read_slot(self):
+        """Oldest published block and its sequence number (consumer only), or (None, None)."""
+        if not len(self):
+            return None, None
+        slot = self.read_index % self.capacity
+        return self._view(slot), self.sequence[slot]
+
+    def release(self):
+        self.read_index += 1
+
+class PipelineWorker:
+    """Runs a chain step on its own thread, one call behind the audio thread.
+
+    ``process_into`` is called by the audio thread: it queues the input
+    and returns the worker's output for the previous call. That output
+    was queued a whole block period earlier, so normally it is ready. If
+    it is not, the worker needed more than a block period, and waiting
+    for it would only make the callback miss its own deadline. The call
+    outputs silence right away and counts the block in ``late``. A
+    worker that fell behind drops all but the two newest queued blocks.
+    A call that follows ``skip`` (the step was bypassed) has no previous
+    output and is silent.
+
+    The worker is persistent: a recompiled chain hands it its new step
+    through ``configure``, so a stage's processors are only ever run by
+    this one thread.
+
+    Args:
+        name (str): Stage name, used for the thread name
+        block_size (int): Largest call in frames
+        capacity (int): Blocks the input queue holds
+        dtype: Sample type
+    """
+
+    def __init__(self, name, block_size, capacity=4, dtype=np.float32):
+        self.name = name
+        self.node = None
+        self.out_channels = 1
+        self.dtype = dtype
+        self.capacity = capacity
+        self._allocate(block_size)
+        self.frames = block_size  # Frames of the latest call, the delay this worker adds
+        self.calls = 0  # Sequence number of the next call (audio thread)
+        self.last_queued = None  # Sequence number of the latest queued block (audio thread)
+        self.late = 0  # Calls answered with silence because the worker fell behind
+        self.errors = 0  # Blocks the step raised on; the error is kept, not printed
+        self.last_error = None
+        self._wake = threading.Semaphore(0)
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name=f'pipeline-{name}', daemon=True)
+        self._thread.start()
+
+    def _allocate(self, block_size):
+        self.inputs = BlockQueue(self.capacity, block_size, self.dtype)
+        # Every queued input can be waiting as an output, plus the one the
+        # audio thread had not consumed yet
+        self.outputs = BlockQueue(self.capacity + 1, block_size, self.dtype)
+
+    @property
+    def latency(self):
+        return self.frames
+
+    def configure(self, node, out_channels, block_size):
+        """Set the step the worker runs; called when the chain is compiled.
+
+        The queues are reallocated only for a larger block, which the chain
+        is only prepared for while no stream is running.
+        """
+        if block_size > self.inputs.block_size:
+            self._allocate(block_size)
+        self.out_channels = out_channels
+        self.node = node
+
+    def skip(self):
+        """Note a call the step was bypassed for: the next call has no previous output."""
+        self.calls += 1
+
+    def process_into(self, inp, out):
+        sequence = self.calls
+        self.calls += 1
+        frames = len(inp)
+        self.frames = frames
+        block = self.inputs.write_slot(frames, 1 if inp.ndim == 1 else inp.shape[1], sequence)
+        if block is not None:
+            block[...] = inp
+            self.inputs.publish()
+            self._wake.release()
+            queued = True
+        else:
+            queued = False
+
+        wanted = sequence - 1
+        expected = self.last_queued == wanted
+        if queued:
+            self.last_queued = sequence
+        while True:
+            result, number = self.outputs.read_slot()
+            if result is None:
+                if expected:
+                    self.late += 1  # Still being processed
+                break
+            if number > wanted:
+                break
+            if number == wanted:
+                n = min(len(result), frames)
+                copy_signal(result[:n], out[:n])
+                out[n:] = 0  # Only when called with blocks of another size
+                self.outputs.release()
+                return
+            self.outputs.release()  # Stale: its call was answered with silence
+        out.fill(0)
+
+    def _run(self):
+        while True:
+            self._wake.acquire()
+            if self._closing:
+                return
+            # Behind: the audio thread only still waits for the block before
+            # the newest one
+            while len(self.inputs) > 2:
+                self.inputs.release()
+            inp, sequence = self.inputs.read_slot()
+            if inp is None:
+                continue
+            out = self.outputs.write_slot(len(inp), self.out_channels, sequence)
+            if out is not None:
+                try:
+                    self.node(inp, out)
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = e
+                    out.fill(0)
+                self.outputs.publish()
+            self.inputs.release()
+
+    def close(self, timeout=1.0):
+        """Stop the thread; call while no audio thread uses the worker."""
+        self._closing = True
+        self._wake.release()
+        self._thread.join(timeout)
@@ -0,0 +1,236 @@
+import csv
+import json
+import math
+import time
+import numpy as np
+
+XRUN_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow', 'output_overflow')
+
+class CallbackProfiler:
+    """Per-stage timing, DSP load and xrun accounting for the audio callback.
+
+    Everything the audio thread touches is preallocated here: it only adds
+    to fixed-size numpy arrays and increments histogram bins. Readers on
+    other threads call ``snapshot`` (or the dump helpers), which copy the
+    arrays and derive percentiles from the histograms.
+
+    Stage times use log-spaced bins from 1 us to 1 s; DSP load (callback
+    time divided by the block period) uses linear bins from 0 to 200%.
+    """
+
+    TIME_BINS = 120
+    TIME_MIN_EXP = -6.0  # 1 us
+    TIME_MAX_EXP = 0.0   # 1 s
+    LOAD_BINS = 200
+    LOAD_MAX = 2.0
+
+    def __init__(self, max_stages=16):
+        self.max_stages = max_stages
+        self.stage_names = []
+        self._bin_scale = self.TIME_BINS / (self.TIME_MAX_EXP - self.TIME_MIN_EXP)
+        self.time_edges = np.logspace(self.TIME_MIN_EXP, self.TIME_MAX_EXP, self.TIME_BINS + 1)
+
+        self.stage_histograms = np.zeros((max_stages, self.TIME_BINS), dtype=np.int64)
+        self.stage_totals = np.zeros(max_stages)
+        self.stage_max = np.zeros(max_stages)
+        self.stage_last = np.zeros(max_stages)
+        self.stage_counts = np.zeros(max_stages, dtype=np.int64)
+        self._block_times = np.zeros(max_stages)  # Accumulated within one callback
+
+        self.callback_histogram = np.zeros(self.TIME_BINS, dtype=np.int64)
+        self.load_histogram = np.zeros(self.LOAD_BINS, dtype=np.int64)
+        self.xruns = np.zeros(len(XRUN_FLAGS), dtype=np.int64)
+        self.callbacks = 0
+        self.last_load = 0.0
+        self.peak_load = 0.0
+        self.total_load = 0.0
+        self.last_callback_time = 0.0
+        self.reset_requested = False
+
+    def stage_index(self, name):
+        """Return the slot for a stage name, assigning one if needed.
+
+        Called when the chain is compiled, never from the audio thread.
+        """
+        if name not in self.stage_names:
+            if len(self.stage_names) >= self.max_stages:
+                return self.max_stages - 1
+            self.stage_names.append(name)
+        return self.stage_names.index(name)
+
+    def _time_bin(self, seconds):
+        if seconds <= 0.0:
+            return 0
+        index = int((math.log10(seconds) - self.TIME_MIN_EXP) * self._bin_scale)
+        return min(max(index, 0), self.TIME_BINS - 1)
+
+    # Audio thread
+
+    def add(self, stage, seconds):
+        """Accumulate time spent in a stage during the current callback."""
+        self._block_times[stage] += seconds
+
+    def end_callback(self, elapsed, frames, sample_rate, status=None):
+        """Commit the stage times of one callback and update load and xruns."""
+        if self.reset_requested:
+            self._clear()
+            return
+
+        for stage in range(len(self.stage_names)):
+            seconds = self._block_times[stage]
+            if seconds > 0.0:
+                self.stage_histograms[stage, self._time_bin(seconds)] += 1
+                self.stage_totals[stage] += seconds
+                self.stage_counts[stage] += 1
+                self.stage_last[stage] = seconds
+                if seconds > self.stage_max[stage]:
+                    self.stage_max[stage] = seconds
+        self._block_times.fill(0.0)
+
+        self.callback_histogram[self._time_bin(elapsed)] += 1
+        load = elapsed * sample_rate / frames if frames else 0.0
+        load_bin = min(int(load / self.LOAD_MAX * self.LOAD_BINS), self.LOAD_BINS - 1)
+        self.load_histogram[load_bin] += 1
+        self.last_load = load
+        self.total_load += load
+        if load > self.peak_load:
+            self.peak_load = load
+        self.last_callback_time = elapsed
+        self.callbacks += 1
+
+        if status:
+            for i, flag in enumerate(XRUN_FLAGS):
+                if getattr(status, flag, False):
+                    self.xruns[i] += 1
+
+    def _clear(self):
+        self.stage_histograms.fill(0)
+        self.stage_totals.fill(0)
+        self.stage_max.fill(0)
+        self.stage_last.fill(0)
+        self.stage_counts.fill(0)
+        self._block_times.fill(0)
+        self.callback_histogram.fill(0)
+        self.load_histogram.fill(0)
+        self.xruns.fill(0)
+        self.callbacks = 0
+        self.last_load = 0.0
+        self.peak_load = 0.0
+        self.total_load = 0.0
+        self.reset_requested = False
+
+    # Reader side
+
+    def reset(self):
+        """Ask the audio thread to clear all statistics at its next callback."""
+        self.reset_requested = True
+
+    def _percentile(self, histogram, edges, fraction):
+        total = histogram.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(histogram), fraction * total))
+        return float(edges[min(index + 1, len(edges) - 1)])
+
+    def snapshot(self):
+        """Return a copy of the current statistics as plain Python values."""
+        load_edges = np.linspace(0.0, self.LOAD_MAX, self.LOAD_BINS + 1)
+        callbacks = self.callbacks
+        stages = {}
+        for i, name in enumerate(self.stage_names):
+            histogram = self.stage_histograms[i].copy()
+            count = int(self.stage_counts[i])
+            stages[name] = {
+                'count': count,
+                'mean_us': float(self.stage_totals[i] / count * 1e6) if count else 0.0,
+                'p50_us': self._percentile(histogram, self.time_edges, 0.5) * 1e6,
+                'p99_us': self._percentile(histogram, self.time_edges, 0.99) * 1e6,
+                'max_us': float(self.stage_max[i] * 1e6),
+                'last_us': float(self.stage_last[i] * 1e6)
+            }
+        load_histogram = self.load_histogram.copy()
+        return {
+            'time': time.time(),
+            'callbacks': callbacks,
+            'callback_p99_us': self._percentile(self.callback_histogram.copy(), self.time_edges, 0.99) * 1e6,
+            'dsp_load': {
+                'last': self.last_load,
+                'mean': self.total_load / callbacks if callbacks else 0.0,
+                'peak': self.peak_load,
+                'p99': self._percentile(load_histogram, load_edges, 0.99)
+            },
+            'xruns': {flag: int(count) for flag, count in zip(XRUN_FLAGS, self.xruns)},
+            'stages': stages
+        }
+
+    def heaviest_stage(self, snapshot=None):
+        """Name and mean time of the stage with the highest mean cost."""
+        snapshot = snapshot or self.snapshot()
+        if not snapshot['stages']:
+            return None, 0.0
+        name = max(snapshot['stages'], key=lambda n: snapshot['stages'][n]['mean_us'])
+        return name, snapshot['stages'][name]['mean_us']
+
+    def dump_json(self, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def dump_csv(self, file_path):
+        snapshot = self.snapshot()
+        fields = ['stage', 'count', 'mean_us', 'p50_us', 'p99_us', 'max_us', 'last_us']
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for name, stats in snapshot['stages'].items():
+                writer.writerow([name] + [stats[field] for field in fields[1:]])
+            load = snapshot['dsp_load']
+            writer.writerow([])
+            writer.writerow(['dsp_load_last', 'dsp_load_mean', 'dsp_load_peak', 'dsp_load_p99']
+                            + list(snapshot['xruns']))
+            writer.writerow([load['last'], load['mean'], load['peak'], load['p99']]
+                            + list(snapshot['xruns'].values()))
+
+    def dump(self, file_path):
+        """Write a snapshot as CSV for .csv paths and as JSON otherwise."""
+        if file_path.lower().endswith('.csv'):
+            self.dump_csv(file_path)
+        else:
+            self.dump_json(file_path)
+
+class LevelMeter:
+    """Peak and RMS level of the last block, written by the audio thread.
+
+    ``update`` squares the block into preallocated scratch and stores two
+    floats and a counter, so it allocates nothing; readers call
+    ``snapshot`` from any thread. Blocks with a peak at or above full
+    scale are counted as clips.
+
+    Args:
+        max_samples (int): Largest block (frames times channels) metered
+    """
+
+    FLOOR_DB = -120.0
+
+    def __init__(self, max_samples=8192):
+        self._squares = np.zeros(max_samples, dtype=np.float32)
+        self.peak = 0.0
+        self.rms = 0.0
+        self.clips = 0
+
+    def update(self, block):
+        size = block.size
+        if size == 0 or size > len(self._squares):
+            return
+        squares = self._squares[:size].reshape(block.shape)
+        np.square(block, out=squares)
+        self.peak = math.sqrt(float(squares.max()))
+        self.rms = math.sqrt(float(squares.mean()))
+        if self.peak >= 1.0:
+            self.clips += 1
+
+    def _db(self, level):
+        return 20 * math.log10(level) if level > 0 else self.FLOOR_DB
+
+    def snapshot(self):
+        """Levels in dBFS and the clip count as plain Python values."""
+        return {'peak_db': self._db(self.peak), 'rms_db': self._db(self.rms), 'clips': self.clips}
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import soundfile as sf
+from ir_convolver import PartitionedIRProcessor
+from model_cache import create_nam_processor
+from effects.gate.gate_effect import NoiseGateEffect
+from effects.chorus.chorus_effect import ChorusEffect
+from effects.drive.drive_effect import DriveEffect
+from effects.delay.delay_effect import DelayEffect
+from effects.reverb.reverb_effect import ReverbEffect
+from engine import DEFAULT_CHAIN_ORDER
+from signal_chain import SignalChain, GainControl, order_from_config
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.aiff', '.aif', '.ogg')
+
+class OfflineChain:
+    """The AudioPlayer signal chain, built from a saved chain config.
+
+    Stages run in the saved order, or in AudioPlayer's default order
+    (gate, chorus, drive, NAM pedal, NAM, IR, delay, reverb) for configs that
+    do not store one.
+    """
+
+    def __init__(self, config, sample_rate, block_size):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.states = config.get('effect_states', {})
+        params = config.get('effect_params', {})
+        models = config.get('models', {})
+
+        self.gate = NoiseGateEffect(sample_rate, **params.get('gate', {}))
+        self.chorus = ChorusEffect(sample_rate, stereo=True, **params.get('chorus', {}))
+        self.drive = DriveEffect(sample_rate, **params.get('drive', {}))
+        self.delay = DelayEffect(sample_rate, **params.get('delay', {}))
+        self.reverb = ReverbEffect(sample_rate, **params.get('reverb', {}))
+        self.ir_volume = params.get('ir', {}).get('volume', 1.0)
+
+        self.nam_pedal_processor = None
+        self.nam_processor = None
+        self.ir_processor = None
+        if models.get('nam_pedal'):
+            self.nam_pedal_processor = create_nam_processor(models['nam_pedal'], sample_rate,
+                                                            block_size, 'linear')
+        if models.get('nam'):
+            self.nam_processor = create_nam_processor(models['nam'], sample_rate, block_size, 'linear')
+        if models.get('ir'):
+            self.ir_processor = PartitionedIRProcessor(models['ir'], sample_rate, block_size)
+
+        order = order_from_config(config.get('order', DEFAULT_CHAIN_ORDER))
+        if 'gate' not in order:
+            # Configs saved before the gate existed keep it at the front
+            order.insert(0, 'gate')
+        self.chain = SignalChain(order, block_size=block_size, sample_rate=sample_rate,
+                                 crossfade_toggles=False)
+        stages = {
+            'gate': self.gate,
+            'chorus': self.chorus,
+            'drive': self.drive,
+            'nam_pedal': self.nam_pedal_processor,
+            'nam': self.nam_processor,
+            'ir': self.ir_processor,
+            'delay': self.delay,
+            'reverb': self.reverb
+        }
+        for name, processor in stages.items():
+            gain = GainControl(self.ir_volume) if name == 'ir' else None
+            self.chain.add_stage(name, processor, bool(self.states.get(name)), gain)
+
+    @property
+    def output_channels(self):
+        return self.chain.compiled.output_channels
+
+    def reset(self):
+        """Clear all stage state before rendering a new file."""
+        for effect in (self.gate, self.chorus, self.drive, self.delay, self.reverb):
+            effect.reset()
+        for processor in (self.nam_pedal_processor, self.nam_processor, self.ir_processor):
+            if processor is not None:
+                processor.reset(self.sample_rate, self.block_size)
+
+    def process(self, audio):
+        return self.chain.process(audio)
+
+# Per-worker state: the config and one chain per sample rate, so each
+# process loads its models once and reuses them for every file it renders
+_worker_config = None
+_worker_block_size = None
+_worker_chains = {}
+
+def _init_worker(config, block_size):
+    global _worker_config, _worker_block_size
+    _worker_config = config
+    _worker_block_size = block_size
+    _worker_chains.clear()
+
+def _get_chain(sample_rate):
+    chain = _worker_chains.get(sample_rate)
+    if chain is None:
+        chain = OfflineChain(_worker_config, sample_rate, _worker_block_size)
+        _worker_chains[sample_rate] = chain
+    return chain
+
+def render_file(input_path, output_path):
+    """Stream one file through the chain and return render statistics.
+
+    Args:
+        input_path (str): DI audio file
+        output_path (str): Destination file, written with the input's
+            sample rate and subtype
+
+    Returns:
+        dict: Input path, output path, audio seconds, wall seconds and
+            real-time factor
+    """
+    start = time.perf_counter()
+    info = sf.info(input_path)
+    chain = _get_chain(info.samplerate)
+    chain.reset()
+
+    with sf.SoundFile(output_path, 'w', samplerate=info.samplerate,
+                      channels=chain.output_channels, subtype=info.subtype) as out_file:
+        for block in sf.blocks(input_path, blocksize=_worker_block_size,
+                               dtype='float32', always_2d=True):
+            # DI takes are mono; fold anything wider down before the chain
+            audio = block[:, 0] if block.shape[1] == 1 else np.mean(block, axis=1)
+            processed = chain.process(audio)
+            if processed.ndim == 1 and chain.output_channels > 1:
+                processed = np.column_stack((processed, processed))
+            out_file.write(processed)
+
+    elapsed = time.perf_counter() - start
+    duration = info.frames / info.samplerate
+    return {
+        'input': input_path,
+        'output': output_path,
+        'duration': duration,
+        'elapsed': elapsed,
+        'realtime_factor': duration / elapsed if elapsed > 0 else float('inf')
+    }
+
+def load_config(config_path):
+    """Load a chain config saved by AudioPlayer.save_chain_config."""
+    with open(config_path, 'r') as f:
+        return json.load(f)
+
+def find_audio_files(paths):
+    """Expand files and folders into a sorted list of audio files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif path.lower().endswith(AUDIO_EXTENSIONS):
+            files.append(path)
+    return sorted(files)
+
+def render_batch(config, input_files, output_dir, block_size=65536, workers=None, suffix='_reamp'):
+    """Render every input file through the chain on a process pool.
+
+    Returns:
+        list: One statistics dict per file, in completion order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for input_path in input_files:
+        name, ext = os.path.splitext(os.path.basename(input_path))
+        jobs.append((input_path, os.path.join(output_dir, f'{name}{suffix}{ext}')))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, block_size)) as pool:
+        futures = {pool.submit(render_file, *job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                results.append(result)
+                print(f"{os.path.basename(result['input'])}: {result['duration']:.1f}s audio "
+                      f"in {result['elapsed']:.2f}s ({result['realtime_factor']:.1f}x real time)")
+            except Exception as e:
+                print(f'Error rendering {futures[future][0]}: {e}')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-amp DI files through a saved signal chain.')
+    parser.add_argument('config', help='Chain config JSON saved from the player')
+    parser.add_argument('inputs', nargs='+', help='DI files or folders')
+    parser.add_argument('-o', '--output-dir', default='reamped', help='Output folder')
+    parser.add_argument('-b', '--block-size', type=int, default=65536, help='Frames per block')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--suffix', default='_reamp', help='Suffix added to output file names')
+    args = parser.parse_args()
+
+    input_files = find_audio_files(args.inputs)
+    if not input_files:
+        print('No audio files found')
+        return
+
+    start = time.perf_counter()
+    results = render_batch(load_config(args.config), input_files, args.output_dir,
+                           args.block_size, args.workers, args.suffix)
+    elapsed = time.perf_counter() - start
+    total = sum(r['duration'] for r in results)
+    print(f'Rendered {len(results)}/{len(input_files)} files, {total:.1f}s audio '
+          f'in {elapsed:.2f}s ({total / elapsed:.1f}x real time)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+from fractions import Fraction
+import numpy as np
+from scipy import signal
+
+class StreamingResampler:
+    """Rational-ratio polyphase resampler that carries its state across blocks.
+
+    The anti-aliasing low-pass is designed once at ``up`` times the input
+    rate and split into ``up`` phases of ``taps`` coefficients (the filter
+    bank). Each output sample is the dot product of one bank row with the
+    last ``taps`` input samples: a block gathers the (outputs, taps) input
+    windows and the bank rows of its outputs with one ``take`` each and
+    reduces them with one ``einsum``, all in preallocated scratch, so
+    processing does not allocate. Blocks of up to ``max_block`` input frames are accepted.
+
+    Args:
+        in_rate (int): Input sample rate
+        out_rate (int): Output sample rate
+        max_block (int): Largest input block
+        channels (int): 1 for 1-D buffers, otherwise (frames, channels)
+        taps (int): Filter taps per phase
+    """
+
+    def __init__(self, in_rate, out_rate, max_block, channels=1, taps=32):
+        ratio = Fraction(int(out_rate), int(in_rate))
+        self.up, self.down = ratio.numerator, ratio.denominator
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.max_block = max_block
+        self.channels = channels
+        self.taps = taps
+
+        cutoff = 0.9 / max(self.up, self.down)
+        h = signal.firwin(self.up * taps, cutoff, window=('kaiser', 8.6)) * self.up
+        # bank[phase, m] multiplies the m-th oldest of the last taps inputs
+        self.bank = np.ascontiguousarray(h.reshape(taps, self.up).T[:, ::-1])
+        # Group delay of the filter, in input samples
+        self.latency = (len(h) - 1) / 2 / self.up
+
+        self.max_output = -(-max_block * self.up // self.down) + 1
+        frame_shape = () if channels == 1 else (channels,)
+        self.extended = np.zeros((taps - 1 + max_block,) + frame_shape)
+        self.position = 0  # Next output time, in 1/up input samples from the block start
+        self.output = np.zeros((self.max_output,) + frame_shape, dtype=np.float32)
+        self._accumulator = np.zeros((self.max_output,) + frame_shape)
+        self._window = np.zeros((self.max_output, taps) + frame_shape)
+        self._window_indices = np.zeros((self.max_output, taps), dtype=np.int64)
+        # Tap offsets spelled out per row: broadcasting in a ufunc makes
+        # NumPy allocate iterator buffers on every call
+        self._tap_offsets = np.tile(np.arange(taps, dtype=np.int64), (self.max_output, 1))
+        self._coefficients = np.zeros((self.max_output, taps))
+        self._positions = np.zeros(self.max_output, dtype=np.int64)
+        self._indices = np.zeros(self.max_output, dtype=np.int64)
+        self._phases = np.zeros(self.max_output, dtype=np.int64)
+        self._steps = np.arange(self.max_output, dtype=np.int64) * self.down
+        self._subscripts = 'ij,ij->i' if channels == 1 else 'ijc,ij->ic'
+
+    def output_count(self, frames):
+        """Output frames produced by the next block of ``frames`` inputs."""
+        return max(-(-(frames * self.up - self.position) // self.down), 0)
+
+    def process(self, block):
+        """Resample one block; returns a view of the internal output buffer,
+        valid until the next call."""
+        frames = len(block)
+        taps = self.taps
+        count = self.output_count(frames)
+        extended = self.extended[:taps - 1 + frames]
+        extended[taps - 1:] = block
+
+        positions = self._positions[:count]
+        np.add(self._steps[:count], self.position, out=positions)
+        indices = self._indices[:count]
+        phases = self._phases[:count]
+        np.floor_divide(positions, self.up, out=indices)
+        np.remainder(positions, self.up, out=phases)
+
+        # The output at input index i reads extended[i:i + taps]
+        window_indices = self._window_indices[:count]
+        np.copyto(window_indices, indices[:, None])
+        np.add(window_indices, self._tap_offsets[:count], out=window_indices)
+        window = self._window[:count]
+        np.take(extended, window_indices, axis=0, out=window, mode='clip')
+        coefficients = self._coefficients[:count]
+        np.take(self.bank, phases, axis=0, out=coefficients, mode='clip')
+        accumulator = self._accumulator[:count]
+        np.einsum(self._subscripts, window, coefficients, out=accumulator)
+
+        self.position += count * self.down - frames * self.up
+        # Keep the last taps - 1 inputs for the next block
+        extended[:taps - 1] = extended[frames:frames + taps - 1]
+        output = self.output[:count]
+        output[...] = accumulator
+        return output
+
+    def reset(self):
+        self.extended.fill(0)
+        self.position = 0
+
+class ResampledProcessor:
+    """Runs a native processor at its own rate inside a chain at another rate.
+
+    Each block is resampled to ``inner_rate``, processed, resampled back
+    and passed through a small FIFO primed with a few samples of silence,
+    so every call returns exactly as many frames as it was given. The
+    added delay is reported in ``latency`` (host samples).
+
+    Args:
+        processor: Object with ``process_into`` and ``reset(rate, block)``
+        sample_rate (int): Rate of the surrounding chain
+        inner_rate (int): Rate the processor runs at
+        max_block (int): Largest host block
+    """
+
+    FIFO_PRIME = 4  # Absorbs the +-1 sample jitter of both resamplers
+
+    def __init__(self, processor, sample_rate, inner_rate, max_block):
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self.inner_rate = inner_rate
+        self.max_block = max_block
+        self.upsampler = StreamingResampler(sample_rate, inner_rate, max_block)
+        self.inner_block = self.upsampler.max_output
+        self.downsampler = StreamingResampler(inner_rate, sample_rate, self.inner_block)
+        self.inner_output = np.zeros(self.inner_block, dtype=np.float32)
+        self.latency = (self.FIFO_PRIME + self.upsampler.latency
+                        + self.downsampler.latency * sample_rate / inner_rate)
+
+        self.fifo = np.zeros(2 * (self.downsampler.max_output + self.FIFO_PRIME))
+        self.fifo_read = 0
+        self.fifo_write = 0
+        self.reset()
+
+    def reset(self, sample_rate=None, block_size=None):
+        """Clear all state; the processor is reset at its own rate and block."""
+        self.processor.reset(self.inner_rate, self.inner_block)
+        self.upsampler.reset()
+        self.downsampler.reset()
+        self.fifo.fill(0)
+        self.fifo_read = 0
+        self.fifo_write = self.FIFO_PRIME
+
+    def process(self, input):
+        output = np.empty(len(input), dtype=np.float64)
+        self.process_into(np.ascontiguousarray(input), output)
+        return output
+
+    def process_into(self, input, output):
+        for start in range(0, len(input), self.max_block):
+            self._process_block(input[start:start + self.max_block],
+                                output[start:start + self.max_block])
+
+    def _process_block(self, input, output):
+        upsampled = self.upsampler.process(input)
+        inner = self.inner_output[:len(upsampled)]
+        self.processor.process_into(upsampled, inner)
+        self._fifo_write(self.downsampler.process(inner))
+        self._fifo_read(output)
+
+    def _fifo_write(self, data):
+        size = len(self.fifo)
+        start = self.fifo_write % size
+        first = min(len(data), size - start)
+        self.fifo[start:start + first] = data[:first]
+        self.fifo[:len(data) - first] = data[first:]
+        self.fifo_write += len(data)
+
+    def _fifo_read(self, out):
+        size = len(self.fifo)
+        n = min(len(out), self.fifo_write - self.fifo_read)
+        start = self.fifo_read % size
+        first = min(n, size - start)
+        out[:first] = self.fifo[start:start + first]
+        out[first:n] = self.fifo[:n - first]
+        out[n:] = 0  # Only if the resamplers drifted past the primed margin
+        self.fifo_read += n
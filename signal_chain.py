@@ -0,0 +1,735 @@
+import threading
+from time import perf_counter
+import numpy as np
+from effects.base_effect import AudioEffect, copy_signal as _copy_signal
+from param_queue import ParameterControl
+from pipeline import PipelineWorker
+
+NO_STAGE = -1  # Steps that are not timed on their own
+SILENCE_LEVEL = 10 ** (-80 / 20)  # Output peak treated as silence by the idle check
+
+def _fit(buffer, frames):
+    """Return buffer itself for a full block, otherwise a view of its head."""
+    return buffer if len(buffer) == frames else buffer[:frames]
+
+def _run_steps(steps, current, frames, profiler):
+    """Run (node, buffer, stage) steps in order and return the last output."""
+    for node, buffer, stage in steps:
+        out = _fit(buffer, frames)
+        if profiler is not None and stage != NO_STAGE:
+            start = perf_counter()
+            node(current, out)
+            profiler.add(stage, perf_counter() - start)
+        else:
+            node(current, out)
+        current = out
+    return current
+
+def _is_native(processor):
+    return processor is not None and not isinstance(processor, AudioEffect)
+
+def _channel_layout(processor):
+    """(input, output) channels of a native processor; mono unless it says otherwise."""
+    return getattr(processor, 'input_channels', 1), getattr(processor, 'output_channels', 1)
+
+def _per_frame(value, out):
+    """Shape a scalar or per-sample gain so it broadcasts against out."""
+    if isinstance(value, np.ndarray) and out.ndim > 1:
+        return value[:, None]
+    return value
+
+class GainControl:
+    """A smoothable post-stage gain (e.g. the IR volume)."""
+    smoothed_params = ('value',)
+
+    def __init__(self, value=1.0):
+        self.value = value
+
+class StageFader:
+    """Bypass crossfade gain of one stage: 0.0 is bypassed, 1.0 is fully on."""
+
+    def __init__(self, enabled):
+        self.gain = 1.0 if enabled else 0.0
+
+class ModelSlot:
+    """The native processor behind a stage, with a crossfaded hot-swap.
+
+    A loader thread hands over a new, already prewarmed processor with
+    ``post``. The audio thread picks it up at its next block, runs old and
+    new side by side for ``fade_samples`` and then switches over. The
+    outgoing processor is parked in ``retired`` until another thread calls
+    ``collect``, so it is never freed on the audio thread; the next swap
+    waits until the parked processor has been collected.
+    """
+
+    def __init__(self, fade_samples, processor=None):
+        self.processor = processor
+        self.pending = None
+        self.requests = 0  # Written by the loader thread only
+        self.taken = 0  # Written by the audio thread only
+        self.incoming = None
+        self.fade_pos = 0
+        self.retired = None
+        self.ramp = np.arange(1, fade_samples + 1) / fade_samples
+
+    def post(self, processor):
+        """Queue a replacement; a later post supersedes one not yet taken."""
+        self.pending = processor
+        self.requests += 1
+
+    def reset(self, processor):
+        """Switch immediately, for use while no audio thread is running."""
+        self.processor = processor
+        self.pending = self.incoming = self.retired = None
+        self.taken = self.requests
+
+    def collect(self):
+        """Release the processor retired by the last swap, if any."""
+        retired = self.retired
+        self.retired = None
+        return retired
+
+    @property
+    def swapping(self):
+        return self.incoming is not None or self.requests != self.taken
+
+class IdleState:
+    """Whether the stages behind the idle stage are currently skipped.
+
+    Written by the audio thread only; read by meters.
+    """
+
+    def __init__(self):
+        self.idle = False
+        self.silent_samples = 0  # Output frames below SILENCE_LEVEL with the gate closed
+        self.fade_pos = 0
+
+class ParallelSplit:
+    """Runs several serial branches on the same input and sums them.
+
+    An empty branch is the dry path, so ``ParallelSplit([[], ['reverb']],
+    gains=[1.0, 0.5])`` is a wet/dry reverb send.
+
+    Args:
+        branches (list): Lists of stage names (or nested splits)
+        gains (list): Gain applied to each branch before summing
+    """
+
+    def __init__(self, branches, gains=None):
+        self.branches = [list(branch) for branch in branches]
+        self.gains = list(gains) if gains is not None else [1.0] * len(self.branches)
+        if len(self.gains) != len(self.branches):
+            raise ValueError('ParallelSplit needs one gain per branch')
+
+def order_to_config(order):
+    """Convert a chain order into JSON-serializable lists and dicts."""
+    items = []
+    for item in order:
+        if isinstance(item, ParallelSplit):
+            items.append({'parallel': [order_to_config(branch) for branch in item.branches],
+                          'gains': list(item.gains)})
+        else:
+            items.append(item)
+    return items
+
+def order_from_config(items):
+    """Inverse of order_to_config."""
+    order = []
+    for item in items:
+        if isinstance(item, dict):
+            order.append(ParallelSplit([order_from_config(branch) for branch in item['parallel']],
+                                       item.get('gains')))
+        else:
+            order.append(item)
+    return order
+
+class BufferPool:
+    """Audio buffers allocated once per block size and handed out at compile time."""
+
+    def __init__(self, block_size, dtype=np.float32):
+        self.block_size = block_size
+        self.dtype = dtype
+        self.buffers = []
+
+    def acquire(self, channels):
+        shape = (self.block_size,) if channels == 1 else (self.block_size, channels)
+        buffer = np.zeros(shape, dtype=self.dtype)
+        self.buffers.append(buffer)
+        return buffer
+
+class CompiledChain:
+    """A flat list of (node, output buffer, stage) steps produced by SignalChain.
+
+    Every node is a callable ``node(inp, out)`` that reads one buffer and
+    writes the next. Nothing is allocated while processing a full block.
+    With a profiler attached, each step is timed under its stage slot.
+    """
+
+    def __init__(self, steps, input_buffer, block_size, output_channels=1, parameters=None,
+                 profiler=None, generation=0):
+        self.steps = steps
+        self.input_buffer = input_buffer
+        self.block_size = block_size
+        self.output_channels = output_channels
+        self.parameters = parameters
+        self.profiler = profiler
+        self.generation = generation  # Rebuild count of the SignalChain
+        self.started = False  # Set by the audio thread on its first block
+
+    def process(self, audio):
+        """Run one block. The returned array is owned by the chain and is
+        overwritten on the next call."""
+        frames = len(audio)
+        if frames > self.block_size:
+            # Larger host blocks are split; every stage is a continuous stream
+            output = None
+            for start in range(0, frames, self.block_size):
+                block = self.process(audio[start:start + self.block_size])
+                if output is None:
+                    output = np.empty((frames,) + block.shape[1:], dtype=block.dtype)
+                output[start:start + len(block)] = block
+            return output
+
+        self.started = True
+        parameters = self.parameters
+        if parameters is not None:
+            parameters.begin_block(frames)
+        current = _fit(self.input_buffer, frames)
+        _copy_signal(audio, current)
+        current = _run_steps(self.steps, current, frames, self.profiler)
+        if parameters is not None:
+            parameters.end_block()
+        return current
+
+class SignalChain:
+    """Ordered, compiled signal chain.
+
+    Stages are registered by name and ordered by ``order`` (stage names or
+    ParallelSplit entries). Structural changes (reorder, new model) compile
+    a new CompiledChain off the audio thread and swap it in with a single
+    attribute assignment, so the audio callback always sees either the old
+    or the new chain, never a half-built one.
+
+    With ``crossfade_toggles`` every loaded stage is compiled in behind a
+    StageFader, and enable/disable goes through the parameter queue as a
+    short per-sample crossfade instead of a rebuild. Without it (offline
+    rendering) disabled stages are simply left out.
+
+    Native processors run through a ModelSlot. While the chain is live
+    (``parameters.realtime``), replacing one native processor with another
+    crossfades over ``swap_time`` seconds instead of recompiling.
+
+    Buffers are (frames, channels) from the ``input_channels`` wide input
+    to the output; 1 channel is a 1-D buffer. Effects keep the channels
+    they are given, or widen them to their ``output_channels``. Mono
+    native processors get a downmix and run once per block.
+
+    In a live chain ``idle_stage`` names a top-level gate stage (an
+    effect with a ``closed`` flag). While it is enabled and closed and the chain output
+    has stayed below SILENCE_LEVEL for ``idle_time`` seconds, the stages
+    behind it are skipped and the chain outputs silence. When the gate
+    opens again the effects behind it are reset and the output fades in
+    over ``resume_time`` seconds. Native processors are not reset: they
+    ran into silence before going idle, which is the state a reset would
+    leave them in.
+
+    Native stages named in ``pipelined`` run on PipelineWorker threads,
+    one call behind the rest of the chain, so that several models use
+    several cores. Each adds one call of latency, reported by
+    ``latency()``; a live stage's dry path is delayed to match, so the
+    latency stays the same while the stage is bypassed. Effects are never
+    pipelined: their parameter ramps belong to the audio thread.
+    """
+
+    def __init__(self, order=None, block_size=1024, dtype=np.float32, sample_rate=44100,
+                 crossfade_toggles=True, toggle_time=0.01, swap_time=0.03, input_channels=1,
+                 idle_stage=None, idle_time=0.5, resume_time=0.005, pipelined=()):
+        self.stages = {}
+        self.enabled = {}
+        self.gains = {}
+        self.faders = {}
+        self.slots = {}
+        self.parked = []  # (generation, name, slot) of slots a running chain may still hold
+        self.generation = 0
+        self.sample_rate = sample_rate
+        self.swap_time = swap_time
+        self.swap_samples = max(int(swap_time * sample_rate), 1)
+        self._lock = threading.RLock()  # Serializes rebuilds from GUI and loader threads
+        self.order = list(order) if order is not None else []
+        self.block_size = block_size
+        self.dtype = dtype
+        self.input_channels = input_channels
+        self.crossfade_toggles = crossfade_toggles
+        self.toggle_time = toggle_time
+        self.idle_stage = idle_stage
+        self.idle_time = idle_time
+        self.resume_time = resume_time
+        self.idle_state = IdleState()
+        self.pipelined = set(pipelined)
+        self.workers = {}
+        self.parameters = ParameterControl(sample_rate, max_block=block_size)
+        self.profiler = None
+        self.compiled = CompiledChain([], BufferPool(block_size, dtype).acquire(input_channels),
+                                      block_size, input_channels, self.parameters)
+
+    def add_stage(self, name, processor=None, enabled=False, gain=None):
+        """Register a stage.
+
+        Args:
+            name (str): Stage name used in ``order``
+            processor: An AudioEffect, or a native processor with
+                ``process_into(input, output)``; None leaves the slot empty
+            enabled (bool): Initial on/off state
+            gain (GainControl): Optional post-stage gain
+        """
+        self.stages[name] = processor
+        self.enabled[name] = enabled
+        if gain is not None:
+            self.gains[name] = gain
+        self.faders[name] = StageFader(enabled)
+        self.parameters.register(('enable', name), self.faders[name], 'gain',
+                                 per_sample=True, ramp_time=self.toggle_time)
+        if name not in self._stage_names(self.order):
+            self.order.append(name)
+        self.rebuild()
+
+    def set_stage(self, name, processor):
+        """Replace the processor behind a stage, e.g. after loading a model.
+        Returns the processors that left the chain, as set_stages."""
+        return self.set_stages({name: processor})
+
+    def set_stages(self, processors, order=None):
+        """Replace several processors (and optionally the order) with one rebuild.
+
+        A native processor replacing another while the chain is live is
+        crossfaded in by the audio thread and needs no rebuild. One with
+        another channel layout gets a new slot in a rebuilt chain; the old
+        slot is left as it is for the running chain (see collect_retired).
+
+        Args:
+            processors (dict): Stage name -> processor (or None)
+            order (list): Optional new stage order, as for set_order
+
+        Returns:
+            list: Native processors that left the chain and that no thread
+                runs any more; crossfaded ones follow from collect_retired
+        """
+        with self._lock:
+            if order is not None:
+                known = set(self.stages) | set(processors)
+                unknown = [name for name in self._stage_names(order) if name not in known]
+                if unknown:
+                    raise ValueError(f'Unknown stages in chain order: {unknown}')
+                self.order = list(order)
+
+            released = self.collect_retired()
+            rebuild = order is not None
+            for name, processor in processors.items():
+                previous = self.stages.get(name)
+                self.stages[name] = processor
+                slot = self.slots.get(name)
+                if not _is_native(processor):
+                    rebuild = True
+                elif slot is not None and slot.processor is not None and _is_native(previous) \
+                        and _channel_layout(processor) == _channel_layout(slot.processor) \
+                        and self.parameters.realtime:
+                    if processor is not slot.processor or slot.swapping:
+                        slot.post(processor)
+                elif slot is not None and self.parameters.realtime:
+                    # The running chain may still hold the slot, e.g. for a
+                    # new channel layout: the rebuilt chain gets a new slot
+                    # and this one is parked until the audio thread moved on
+                    self.parked.append((self.compiled.generation, name, slot))
+                    del self.slots[name]
+                    rebuild = True
+                else:
+                    # No stream is running, so no audio thread uses the slot
+                    if slot is not None:
+                        released.extend(p for p in self.slot_processors(name) if p is not processor)
+                        slot.reset(processor)
+                    rebuild = True
+            if rebuild:
+                self.rebuild()
+            return released
+
+    def slot_processors(self, name):
+        """Processors a stage's slot may still run: current, incoming, posted
+        and retired but not yet collected."""
+        slots = [parked for _, parked_name, parked in self.parked if parked_name == name]
+        if name in self.slots:
+            slots.append(self.slots[name])
+        return tuple(processor for slot in slots
+                     for processor in (slot.processor, slot.incoming, slot.pending, slot.retired)
+                     if processor is not None)
+
+    def collect_retired(self):
+        """Drop processors swapped out by the audio thread (never call from it).
+
+        Parked slots are dropped too, once the audio thread has started a
+        chain compiled without them, or no stream is running.
+
+        Returns:
+            list: The collected processors
+        """
+        with self._lock:
+            retired = [slot.collect() for slot in self.slots.values()]
+            compiled = self.compiled
+            while self.parked and (not self.parameters.realtime
+                                   or compiled.started and compiled.generation > self.parked[0][0]):
+                _, _, slot = self.parked.pop(0)
+                retired.extend((slot.processor, slot.incoming, slot.pending, slot.retired))
+            return [processor for processor in retired if processor is not None]
+
+    def set_enabled(self, name, enabled):
+        """Turn a stage on or off, crossfading when the chain is live."""
+        self.enabled[name] = enabled
+        if self.crossfade_toggles:
+            self.parameters.push(('enable', name), 1.0 if enabled else 0.0)
+        else:
+            self.rebuild()
+
+    def set_order(self, order):
+        """Set a user-defined stage order (names and ParallelSplit entries)."""
+        unknown = [name for name in self._stage_names(order) if name not in self.stages]
+        if unknown:
+            raise ValueError(f'Unknown stages in chain order: {unknown}')
+        self.order = list(order)
+        self.rebuild()
+
+    def prepare(self, block_size):
+        """Reallocate the buffer pool for a new block size."""
+        self.block_size = block_size
+        self.parameters.prepare(block_size)
+        self.rebuild()
+
+    def set_sample_rate(self, sample_rate):
+        """Rescale parameter ramps and swap crossfades for a new rate and
+        recompile. Call while no audio thread is running the chain; the
+        stages themselves are rebuilt by their owner."""
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.parameters.set_sample_rate(sample_rate)
+            self.swap_samples = max(int(self.swap_time * sample_rate), 1)
+            for slot in self.slots.values():
+                slot.ramp = np.arange(1, self.swap_samples + 1) / self.swap_samples
+            self.rebuild()
+
+    def set_pipelined(self, names):
+        """Choose the native stages that run on worker threads and recompile.
+
+        Call while no audio thread is running the chain: a stage leaving
+        the pipeline would otherwise be run by two threads at once.
+        """
+        with self._lock:
+            self.pipelined = set(names)
+            self.rebuild()
+            for name in [name for name in self.workers if name not in self.pipelined]:
+                self.workers.pop(name).close()
+
+    def pipeline_late(self):
+        """Calls answered with silence because a worker fell behind."""
+        return sum(worker.late for worker in self.workers.values())
+
+    def close(self):
+        """Stop the pipeline workers; call once the stream is stopped."""
+        with self._lock:
+            for worker in self.workers.values():
+                worker.close()
+            self.workers.clear()
+
+    def set_profiler(self, profiler):
+        """Attach a CallbackProfiler (or None) that times every stage."""
+        self.profiler = profiler
+        self.rebuild()
+
+    def rebuild(self):
+        """Compile the enabled stages and swap the result in atomically."""
+        with self._lock:
+            pool = BufferPool(self.block_size, self.dtype)
+            input_buffer = pool.acquire(self.input_channels)
+            order = self.order
+            split = order.index(self.idle_stage) + 1 if self.idle_stage in order else 0
+            steps, channels = self._compile(order[:split], self.input_channels, pool)
+            tail_steps, channels = self._compile(order[split:], channels, pool)
+            if split and self.crossfade_toggles and self.stages.get(self.idle_stage) is not None:
+                steps.append(self._idle_step(tail_steps, order[split:], channels, pool))
+            else:
+                steps.extend(tail_steps)
+            self.generation += 1
+            self.compiled = CompiledChain(steps, input_buffer, self.block_size, channels,
+                                          self.parameters, self.profiler, self.generation)
+
+    def process(self, audio):
+        return self.compiled.process(audio)
+
+    def latency(self):
+        """Delay of the enabled stages, from their ``latency`` attributes.
+
+        Returns:
+            tuple: (total samples, {stage name: samples}); a parallel split
+                counts with its slowest branch
+        """
+        stages = {}
+        return self._latency(self.order, stages), stages
+
+    def _latency(self, items, stages):
+        total = 0
+        for item in items:
+            if isinstance(item, ParallelSplit):
+                total += max(self._latency(branch, stages) for branch in item.branches)
+                continue
+            processor = self.stages.get(item)
+            if processor is None or not self.enabled.get(item):
+                continue
+            slot = self.slots.get(item)
+            if slot is not None and slot.processor is not None:
+                processor = slot.processor
+            stages[item] = getattr(processor, 'latency', 0)
+            if item in self.pipelined and item in self.workers:
+                stages[item] += self.workers[item].latency
+            total += stages[item]
+        return total
+
+    def _stage_names(self, items):
+        names = []
+        for item in items:
+            if isinstance(item, ParallelSplit):
+                for branch in item.branches:
+                    names.extend(self._stage_names(branch))
+            else:
+                names.append(item)
+        return names
+
+    def _compile(self, items, channels, pool):
+        """Turn order entries into steps; returns (steps, output channels)."""
+        steps = []
+        for item in items:
+            if isinstance(item, ParallelSplit):
+                step, channels = self._compile_split(item, channels, pool)
+                steps.append(step)
+                continue
+
+            processor = self.stages.get(item)
+            if processor is None:
+                continue
+            if not self.crossfade_toggles and not self.enabled.get(item):
+                continue
+
+            stage = self.profiler.stage_index(item) if self.profiler is not None else NO_STAGE
+            stage_steps = []
+            if isinstance(processor, AudioEffect):
+                processor.prepare(self.sample_rate, self.block_size, channels)
+                out_channels = max(processor.output_channels, channels)
+                stage_steps.append((self._effect_node(processor), pool.acquire(out_channels), stage))
+            else:
+                # Native processors take mono 1-D buffers unless they declare
+                # more input channels (true-stereo IRs); mono is then fed as is
+                in_channels, out_channels = _channel_layout(processor)
+                if channels > 1 and in_channels == 1:
+                    stage_steps.append((self._downmix_node, pool.acquire(1), stage))
+                slot = self.slots.get(item)
+                if slot is None:
+                    slot = self.slots[item] = ModelSlot(self.swap_samples, processor)
+                elif slot.processor is None:
+                    slot.reset(processor)
+                node = self._native_node(slot, pool.acquire(out_channels))
+                if item in self.pipelined:
+                    worker = self.workers.get(item)
+                    if worker is None:
+                        worker = self.workers[item] = PipelineWorker(item, self.block_size,
+                                                                     dtype=self.dtype)
+                    worker.configure(node, out_channels, self.block_size)
+                    node = worker.process_into
+                stage_steps.append((node, pool.acquire(out_channels), stage))
+
+            gain = self.gains.get(item)
+            if gain is not None:
+                stage_steps.append((self._gain_node(gain), pool.acquire(out_channels), stage))
+
+            if self.crossfade_toggles:
+                # The fader step is timed as a whole; its inner steps are not
+                inner_steps = [(node, buffer, NO_STAGE) for node, buffer, _ in stage_steps]
+                dry = pool.acquire(out_channels)
+                worker = self.workers.get(item) if item in self.pipelined and _is_native(processor) else None
+                delay = None
+                if worker is not None:
+                    delay = [(pool.acquire(channels), np.zeros(self.block_size)) for _ in range(2)]
+                node = self._fader_node(inner_steps, self.faders[item], dry, worker, delay)
+                steps.append((node, stage_steps[-1][1], stage))
+            else:
+                steps.extend(stage_steps)
+            channels = out_channels
+        return steps, channels
+
+    def _compile_split(self, split, channels, pool):
+        branches = []
+        out_channels = channels
+        for branch in split.branches:
+            steps, branch_channels = self._compile(branch, channels, pool)
+            branches.append(steps)
+            out_channels = max(out_channels, branch_channels)
+
+        # Holds the scaled dry signal; branch outputs are scaled in place
+        scratch = pool.acquire(channels)
+        gains = split.gains
+        profiler = self.profiler
+
+        def node(inp, out):
+            frames = len(inp)
+            out.fill(0)
+            for steps, gain in zip(branches, gains):
+                # Branch stages are timed individually, the split itself is not
+                current = _run_steps(steps, inp, frames, profiler)
+                if current is inp:
+                    current = _fit(scratch, frames)
+                    np.multiply(inp, gain, out=current)
+                else:
+                    current *= gain
+                if current.ndim == out.ndim:
+                    out += current
+                else:
+                    # Mono branch into a stereo sum
+                    for channel in range(out.shape[1]):
+                        out[:, channel] += current
+
+        return (node, pool.acquire(out_channels), NO_STAGE), out_channels
+
+    def _idle_step(self, steps, items, channels, pool):
+        """Run the stages behind the idle stage unless the rig is idle."""
+        gate = self.stages[self.idle_stage]
+        fader = self.faders[self.idle_stage]
+        effects = [self.stages[name] for name in self._stage_names(items)
+                   if isinstance(self.stages.get(name), AudioEffect)]
+        state = self.idle_state = IdleState()
+        state.fade_pos = fade_samples = max(int(self.resume_time * self.sample_rate), 1)
+        ramp = np.arange(1, fade_samples + 1) / fade_samples
+        idle_samples = int(self.idle_time * self.sample_rate)
+        profiler = self.profiler
+
+        def node(inp, out):
+            frames = len(inp)
+            gain = fader.gain
+            gated = gate.closed and not isinstance(gain, np.ndarray) and gain == 1.0
+            if gated and state.silent_samples >= idle_samples:
+                state.idle = True
+                out.fill(0)
+                return
+            if state.idle:
+                # Skipped stages start again from silence
+                for effect in effects:
+                    effect.reset()
+                state.idle = False
+                state.fade_pos = 0
+
+            # Stages are timed individually, the idle step itself is not
+            _copy_signal(_run_steps(steps, inp, frames, profiler), out)
+            pos = state.fade_pos
+            if pos < fade_samples:
+                k = min(frames, fade_samples - pos)
+                out[:k] *= _per_frame(ramp[pos:pos + k], out[:k])
+                state.fade_pos = pos + k
+
+            if gated and frames and max(out.max(), -out.min()) < SILENCE_LEVEL:
+                state.silent_samples += frames
+            else:
+                state.silent_samples = 0
+
+        return node, pool.acquire(channels), NO_STAGE
+
+    @staticmethod
+    def _effect_node(effect):
+        return effect.process_into
+
+    @staticmethod
+    def _native_node(slot, scratch):
+        """Run the slot's processor, crossfading to a posted replacement."""
+        fade_samples = len(slot.ramp)
+
+        def node(inp, out):
+            if slot.incoming is None and slot.requests != slot.taken and slot.retired is None:
+                slot.taken = slot.requests
+                if slot.pending is not slot.processor:
+                    slot.incoming = slot.pending
+                    slot.fade_pos = 0
+
+            processor = slot.processor
+            processor.process_into(inp, out)
+            incoming = slot.incoming
+            if incoming is None:
+                return
+
+            # out = old + ramp * (new - old), fully new past the ramp
+            frames = len(inp)
+            new = _fit(scratch, frames)
+            incoming.process_into(inp, new)
+            pos = slot.fade_pos
+            k = min(frames, fade_samples - pos)
+            new -= out
+            new[:k] *= _per_frame(slot.ramp[pos:pos + k], new)
+            out += new
+            slot.fade_pos = pos + k
+            if slot.fade_pos >= fade_samples:
+                slot.retired = processor
+                slot.processor = incoming
+                slot.incoming = None
+        return node
+
+    @staticmethod
+    def _gain_node(gain):
+        def node(inp, out):
+            np.multiply(inp, _per_frame(gain.value, out), out=out)
+        return node
+
+    @staticmethod
+    def _fader_node(steps, fader, dry_buffer, worker=None, delay_buffers=None):
+        """Run a stage's steps and crossfade against its input while the
+        fader moves; a fully bypassed stage only copies its input.
+
+        A pipelined stage outputs the previous call's block, so its input
+        and fader gain are delayed by one call to match, alternating
+        between the two ``delay_buffers`` (input, gain) pairs. Its worker
+        is fed as soon as the current gain opens and skipped while both
+        gains are closed.
+        """
+        gain = fader.gain
+        # Buffer pair in use, gain of the previous call
+        delayed = [0, float(gain[-1]) if isinstance(gain, np.ndarray) else gain]
+
+        def node(inp, out):
+            frames = len(inp)
+            gain = fader.gain
+            source = inp
+            if delay_buffers is not None:
+                previous = _fit(delay_buffers[delayed[0]][0], frames)
+                delayed[0] ^= 1
+                stored_input, stored_gain = delay_buffers[delayed[0]]
+                _copy_signal(inp, _fit(stored_input, frames))
+                if isinstance(gain, np.ndarray):
+                    # The parameter ramp buffer is rewritten every block
+                    np.copyto(stored_gain[:frames], gain)
+                    gain, delayed[1] = delayed[1], stored_gain[:frames]
+                else:
+                    gain, delayed[1] = delayed[1], gain
+                source = previous
+                if not isinstance(delayed[1], np.ndarray) and delayed[1] == 0.0 \
+                        and not isinstance(gain, np.ndarray) and gain == 0.0:
+                    worker.skip()
+                    _copy_signal(source, out)
+                    return
+            ramping = isinstance(gain, np.ndarray)
+            if delay_buffers is None and not ramping and gain == 0.0:
+                _copy_signal(inp, out)
+                return
+            _run_steps(steps, inp, frames, None)
+            if ramping or gain != 1.0:
+                # out = dry + gain * (wet - dry)
+                dry = _fit(dry_buffer, frames)
+                _copy_signal(source, dry)
+                out -= dry
+                out *= _per_frame(gain, out)
+                out += dry
+        return node
+
+    @staticmethod
+    def _downmix_node(inp, out):
+        np.mean(inp, axis=1, out=out)
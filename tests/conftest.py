@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+# The modules live at the repository root, which is not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Scale:
+    """Minimal native processor: process_into with a fixed gain."""
+
+    def __init__(self, gain=1.0, latency=0):
+        self.gain = gain
+        self.latency = latency
+        self.calls = 0
+        self.resets = 0
+
+    def process_into(self, input, output):
+        self.calls += 1
+        np.multiply(input, self.gain, out=output)
+
+    def reset(self, sample_rate=None, block_size=None):
+        self.resets += 1
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+@pytest.fixture
+def write_wav(tmp_path):
+    """Write float samples to a wav file in tmp_path and return its path."""
+    def write(name, data, sample_rate=48000):
+        path = str(tmp_path / name)
+        sf.write(path, data, sample_rate, subtype='FLOAT')
+        return path
+    return write
+
+@pytest.fixture
+def write_nam(tmp_path):
+    """Write a small .nam model file to tmp_path and return its path."""
+    def write(name, weights=(0.5, -0.25, 1.0), architecture='WaveNet', **fields):
+        model = {'version': '0.5.2', 'architecture': architecture,
+                 'config': {'layers': [{'channels': 4}, {'channels': 2}]},
+                 'sample_rate': 48000, 'weights': list(weights)}
+        model.update(fields)
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(model))
+        return str(path)
+    return write
+
+@pytest.fixture
+def engine():
+    """An AudioEngine without streams; its threads are stopped afterwards."""
+    from engine import AudioEngine
+    engine = AudioEngine()
+    yield engine
+    engine.chain.close()
+    engine.model_cache.shutdown()
+    engine.scan_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,40 @@
+from block_scheduler import BlockSizeTuner
+
+RATE = 48000
+
+def stats(block_size, load=0.1, xruns=0, seconds=2.0):
+    return {'callbacks': int(seconds * RATE / block_size) + 1,
+            'dsp_load': {'p99': load},
+            'xruns': {'output_underflow': xruns, 'input_overflow': 0}}
+
+def test_waits_for_a_full_window():
+    tuner = BlockSizeTuner()
+    assert tuner.block_size == 256
+    assert tuner.update(stats(256, seconds=1.0), RATE) is None
+    assert tuner.update(stats(256), RATE) == 128
+
+def test_steps_down_to_the_smallest_size_with_headroom():
+    tuner = BlockSizeTuner()
+    sizes = []
+    while (size := tuner.update(stats(tuner.block_size), RATE)) is not None:
+        sizes.append(size)
+    assert sizes == [128, 64, 32] and tuner.settled
+
+def test_overload_steps_back_up_and_settles():
+    tuner = BlockSizeTuner(max_load=0.6)
+    tuner.update(stats(256), RATE)
+    assert tuner.update(stats(128, load=0.7), RATE) == 256
+    assert tuner.settled
+    assert tuner.update(stats(256), RATE) is None
+
+def test_settled_tuner_steps_up_on_new_xruns_only():
+    tuner = BlockSizeTuner(sizes=(32, 64, 128))
+    tuner.update(stats(128), RATE)
+    assert tuner.update(stats(64, xruns=1), RATE) == 128
+    assert tuner.update(stats(128, xruns=2), RATE) is None  # Already at the top
+    tuner = BlockSizeTuner(sizes=(32, 64, 128))
+    tuner.update(stats(128), RATE)
+    tuner.update(stats(64), RATE)
+    assert tuner.update(stats(32, load=0.9), RATE) == 64
+    assert tuner.update(stats(64, xruns=0), RATE) is None
+    assert tuner.update(stats(64, xruns=1), RATE) == 128
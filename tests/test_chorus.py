@@ -0,0 +1,42 @@
+import numpy as np
+
+from effects.chorus.chorus_effect import ChorusEffect
+
+RATE = 48000
+
+def run(effect, x, sizes):
+    out = np.zeros(x.shape[:1] + ((2,) if effect.stereo else x.shape[1:]), dtype=np.float32)
+    start, i = 0, 0
+    while start < len(x):
+        n = sizes[i % len(sizes)]
+        effect.process_into(x[start:start + n], out[start:start + n])
+        start, i = start + n, i + 1
+    return out
+
+def test_zero_depth_delays_by_the_minimum(rng):
+    x = rng.standard_normal(1024).astype(np.float32)
+    effect = ChorusEffect(RATE, depth=0.0, mix=1.0)
+    out = run(effect, x, [256])
+    np.testing.assert_allclose(out[2:], x[:-2], atol=1e-6)
+
+def test_output_does_not_depend_on_block_sizes(rng):
+    x = (rng.standard_normal((8192, 2)) * 0.3).astype(np.float32)
+    whole = ChorusEffect(RATE, rate=3.0, voices=3)
+    whole.prepare(RATE, 4096, 2)
+    split = ChorusEffect(RATE, rate=3.0, voices=3)
+    split.prepare(RATE, 4096, 2)
+    np.testing.assert_allclose(run(split, x, [1, 64, 333, 4096]), run(whole, x, [4096]), atol=1e-5)
+
+def test_stereo_sides_are_modulated_apart(rng):
+    x = (rng.standard_normal(4096) * 0.3).astype(np.float32)
+    effect = ChorusEffect(RATE, rate=2.0, depth=0.005, mix=1.0, stereo=True)
+    out = run(effect, x, [512])
+    assert out.shape == (4096, 2)
+    assert not np.allclose(out[:, 0], out[:, 1], atol=1e-3)
+
+def test_reset_restarts_the_lfo_and_clears_the_buffer(rng):
+    x = (rng.standard_normal(2048) * 0.3).astype(np.float32)
+    effect = ChorusEffect(RATE)
+    first = run(effect, x, [512])
+    effect.reset()
+    np.testing.assert_array_equal(run(effect, x, [512]), first)
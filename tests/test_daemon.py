@@ -0,0 +1,83 @@
+import json
+import socket
+import threading
+
+import pytest
+
+import engine as engine_module
+from daemon import ControlServer
+
+@pytest.fixture
+def server(engine):
+    server = ControlServer(engine, port=0, poll_time=0.05)
+    yield server
+    server.close()
+
+def run(server, message):
+    return server.handle(json.dumps(message).encode())
+
+def test_engine_start_does_not_open_the_library(monkeypatch):
+    opened = []
+
+    def open_library():
+        opened.append(object())
+        return opened[-1]
+
+    monkeypatch.setattr(engine_module, 'ModelLibrary', open_library)
+    engine = engine_module.AudioEngine()
+    try:
+        assert not opened
+        assert engine.library is engine.library
+        assert len(opened) == 1
+    finally:
+        engine.model_cache.shutdown()
+        engine.scan_executor.shutdown()
+
+def test_ping(server, engine):
+    [result] = run(server, {'cmd': 'ping'})
+    assert result == {'ok': True, 'sample_rate': engine.sample_rate,
+                      'block_size': engine.device_block_size, 'monitoring': False, 'preset': None}
+
+def test_toggle_and_set(server, engine):
+    assert run(server, {'cmd': 'toggle', 'effect': 'reverb'}) == [{'ok': True, 'enabled': True}]
+    assert run(server, {'cmd': 'toggle', 'effect': 'reverb', 'enabled': True}) == \
+        [{'ok': True, 'enabled': True}]
+    assert run(server, {'cmd': 'set', 'effect': 'delay', 'param': 'mix', 'value': 0.25}) == \
+        [{'ok': True, 'value': 0.25}]
+    assert engine.delay.mix == 0.25
+
+def test_errors_are_reported_per_command(server):
+    results = run(server, [{'cmd': 'ping'}, {'cmd': 'fly'}, {'cmd': 'toggle', 'effect': 'fuzz'},
+                           {'cmd': 'set', 'effect': 'delay', 'param': 'mix'}, 'ping'])
+    assert [result['ok'] for result in results] == [True, False, False, False, False]
+    assert server.handle(b'{')[0]['ok'] is False
+    assert run(server, {'cmd': 'preset', 'step': 1})[0]['error'] == 'No presets loaded'
+
+def test_batch_is_published_together(server, engine):
+    engine.chain.parameters.realtime = True
+    queue = engine.chain.parameters.queue
+    published = []
+    original = server._set
+
+    def record(command):
+        published.append(queue.write_index)
+        return original(command)
+
+    server.handlers['set'] = record
+    run(server, [{'cmd': 'set', 'effect': 'delay', 'param': 'mix', 'value': 0.1},
+                 {'cmd': 'set', 'effect': 'reverb', 'param': 'mix', 'value': 0.2}])
+    assert published == [0, 0] and queue.write_index == 2
+
+def test_udp_round_trip(server):
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(2)
+    try:
+        client.sendto(json.dumps({'cmd': 'latency'}).encode(), server.address)
+        [result] = json.loads(client.recvfrom(65507)[0])
+        assert result['ok'] and result['total_ms'] > 0
+    finally:
+        client.close()
+        server.stop()
+        thread.join(2)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from effects.delay.delay_effect import DelayEffect
+
+RATE = 48000
+DELAY = 480  # 10 ms
+
+def run(effect, x, sizes):
+    out = np.zeros(x.shape[:1] + ((2,) if effect.ping_pong else x.shape[1:]), dtype=np.float32)
+    start, i = 0, 0
+    while start < len(x):
+        n = sizes[i % len(sizes)]
+        effect.process_into(x[start:start + n], out[start:start + n])
+        start, i = start + n, i + 1
+    return out
+
+def impulse(n=4 * DELAY):
+    x = np.zeros(n, dtype=np.float32)
+    x[0] = 1.0
+    return x
+
+@pytest.mark.parametrize('sizes', [[64], [1000], [1, 479, 2048]])
+def test_repeats_decay_by_the_feedback(sizes):
+    effect = DelayEffect(RATE, delay_time=DELAY / RATE, feedback=0.5, mix=1.0, max_delay_time=0.1)
+    effect.prepare(RATE, 2048)
+    out = run(effect, impulse(), sizes)
+    expected = np.zeros_like(out)
+    expected[[DELAY, 2 * DELAY, 3 * DELAY]] = [1.0, 0.5, 0.25]
+    np.testing.assert_allclose(out, expected, atol=1e-7)
+
+def test_time_change_crossfades_to_the_new_head():
+    effect = DelayEffect(RATE, delay_time=DELAY / RATE, feedback=0.0, mix=1.0,
+                         max_delay_time=0.1, crossfade_time=0.001)
+    x = np.ones(4096, dtype=np.float32)
+    run(effect, x[:1024], [256])
+    effect.set_delay_time(2 * DELAY / RATE)
+    out = run(effect, x[1024:], [256])
+    # Constant input reads the same from both heads, so the fade is seamless
+    np.testing.assert_allclose(out, 1.0, atol=1e-6)
+    assert effect.delay_samples == 2 * DELAY and effect.next_delay_samples is None
+    effect.reset()
+    out = run(effect, impulse(), [256])
+    assert np.flatnonzero(out).tolist() == [2 * DELAY]
+
+def test_ping_pong_alternates_sides():
+    effect = DelayEffect(RATE, delay_time=DELAY / RATE, feedback=0.5, mix=1.0,
+                         max_delay_time=0.1, ping_pong=True)
+    out = run(effect, impulse(), [256])
+    assert out.shape == (4 * DELAY, 2)
+    np.testing.assert_allclose(out[DELAY], [1.0, 0.0])
+    np.testing.assert_allclose(out[2 * DELAY], [0.0, 0.5])
+    np.testing.assert_allclose(out[3 * DELAY], [0.25, 0.0])
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from effects.drive.drive_effect import DriveEffect
+
+RATE = 48000
+BLOCK = 256
+
+def run(effect, x, sizes):
+    out = np.zeros_like(x)
+    start, i = 0, 0
+    while start < len(x):
+        n = sizes[i % len(sizes)]
+        effect.process_into(x[start:start + n], out[start:start + n])
+        start, i = start + n, i + 1
+    return out
+
+def test_without_oversampling_matches_tanh_and_tone(rng):
+    x = (rng.standard_normal(BLOCK) * 0.3).astype(np.float32)
+    effect = DriveEffect(RATE, drive=4.0, tone=0.3, level=0.8)
+    expected = np.zeros(BLOCK)
+    y = 0.0
+    for t, driven in enumerate(np.tanh(4.0 * x.astype(np.float64))):
+        y = 0.7 * driven + 0.3 * y
+        expected[t] = y
+    np.testing.assert_allclose(effect.process(x), 0.8 * expected, atol=1e-6)
+
+@pytest.mark.parametrize('factor', [2, 4, 8])
+def test_oversampled_output_does_not_depend_on_block_sizes(rng, factor):
+    x = (rng.standard_normal((4 * BLOCK, 2)) * 0.3).astype(np.float32)
+    whole = DriveEffect(RATE, oversampling=factor)
+    whole.prepare(RATE, BLOCK, 2)
+    split = DriveEffect(RATE, oversampling=factor)
+    split.prepare(RATE, BLOCK, 2)
+    np.testing.assert_allclose(run(split, x, [32, 7, 200, BLOCK]), run(whole, x, [BLOCK]), atol=1e-6)
+
+def test_oversampling_keeps_a_low_sine_and_reports_its_delay():
+    t = np.arange(8 * BLOCK)
+    x = (0.01 * np.sin(2 * np.pi * 0.01 * t)).astype(np.float32)
+    effect = DriveEffect(RATE, drive=1.0, tone=0.0, level=1.0, oversampling=4)
+    assert effect.oversampling == 4 and 0 < effect.latency < 10
+    y = run(effect, x, [BLOCK])
+    delayed = 0.01 * np.sin(2 * np.pi * 0.01 * (t - effect.latency))
+    np.testing.assert_allclose(y[BLOCK:], delayed[BLOCK:], atol=1e-4)
+
+def test_rejects_unknown_oversampling_factor():
+    effect = DriveEffect(RATE)
+    with pytest.raises(ValueError):
+        effect.set_oversampling(3)
+    assert effect.oversampling == 1 and effect.latency == 0
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from engine import AudioEngine
+
+@pytest.mark.parametrize('shape', [(32,), (32, 1)])
+def test_mono_output_reaches_every_device_channel(rng, shape):
+    processed = rng.standard_normal(shape).astype(np.float32)
+    outdata = np.zeros((32, 2), dtype=np.float32)
+    AudioEngine._write_output(processed, outdata)
+    np.testing.assert_array_equal(outdata, np.repeat(processed.reshape(32, 1), 2, axis=1))
+
+def test_stereo_output_is_copied(rng):
+    processed = rng.standard_normal((32, 2)).astype(np.float32)
+    outdata = np.zeros((32, 2), dtype=np.float32)
+    AudioEngine._write_output(processed, outdata)
+    np.testing.assert_array_equal(outdata, processed)
+
+def test_stereo_output_repeats_on_wider_devices(rng):
+    processed = rng.standard_normal((32, 2)).astype(np.float32)
+    outdata = np.zeros((32, 3), dtype=np.float32)
+    AudioEngine._write_output(processed, outdata)
+    np.testing.assert_array_equal(outdata, processed[:, [0, 1, 0]])
+
+def test_stereo_output_folds_onto_narrower_devices(rng):
+    processed = rng.standard_normal((32, 4)).astype(np.float32)
+    outdata = np.zeros((32, 2), dtype=np.float32)
+    AudioEngine._write_output(processed, outdata)
+    mono = processed.mean(axis=1)
+    np.testing.assert_allclose(outdata, np.column_stack((mono, mono)), rtol=1e-6)
+
+def test_drive_oversampling_is_applied_on_the_loader_thread(engine):
+    assert ('drive', 'oversampling') not in engine.chain.parameters.ids
+    engine.update_effect_parameter('drive', 'oversampling', 4.0).result()
+    assert engine.drive.oversampling == 4
+    assert engine.get_chain_config()['effect_params']['drive']['oversampling'] == 4
+    assert engine.update_effect_parameter('drive', 'oversampling', 3) is None
+    assert engine.drive.oversampling == 4
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+import pytest
+
+from file_streamer import FileStreamer, FrameRing
+
+RATE = 8000
+FRAMES = 5000
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.001)
+
+@pytest.fixture
+def audio(rng):
+    return rng.uniform(-1, 1, (FRAMES, 2)).astype(np.float32)
+
+@pytest.fixture
+def open_streamer(write_wav, audio):
+    streamers = []
+
+    def open_streamer(**kwargs):
+        streamer = FileStreamer(write_wav('song.wav', audio, RATE), chunk_frames=512, **kwargs)
+        streamers.append(streamer)
+        return streamer
+    yield open_streamer
+    for streamer in streamers:
+        streamer.close()
+
+def read(streamer, frames, block=256):
+    """Read frames from the streamer, waiting for the prefetch thread."""
+    data = []
+    total = 0
+    out = np.empty((block, streamer.channels), dtype=np.float32)
+    deadline = time.monotonic() + 5.0
+    while total < frames and not streamer.finished:
+        assert time.monotonic() < deadline
+        n = streamer.read_into(out[:min(block, frames - total)])
+        data.append(out[:n].copy())
+        total += n
+        if not n:
+            time.sleep(0.001)
+    return np.concatenate(data)
+
+def buffered(streamer):
+    """Wait until the whole file is in the ring; returns its write index."""
+    wait_for(lambda: streamer.end_index is not None)
+    return streamer.ring.write_index
+
+def test_ring_wraps_and_skips_discarded_frames():
+    ring = FrameRing(8, 1)
+    ring.write(np.arange(6, dtype=np.float32)[:, None], position=100)
+    out = np.zeros((4, 1), dtype=np.float32)
+    assert ring.read_into(out) == 4
+    ring.write(np.arange(6, 12, dtype=np.float32)[:, None], position=106)
+    assert ring.writable() == 0
+    ring.discard_index = 9
+    assert ring.writable() == 5
+    assert ring.read_into(out) == 3
+    np.testing.assert_array_equal(out[:3, 0], [9, 10, 11])
+    assert ring.positions[(ring.read_index - 1) % 8] == 111
+
+def test_streams_the_whole_file(open_streamer, audio):
+    streamer = open_streamer()
+    assert streamer.duration == FRAMES / RATE
+    buffered(streamer)
+    np.testing.assert_array_equal(read(streamer, 2 * FRAMES), audio)
+    assert streamer.finished and streamer.position == FRAMES / RATE
+    out = np.ones((64, 2), dtype=np.float32)
+    assert streamer.read_into(out) == 0 and not np.any(out)
+    assert streamer.underruns == 0
+
+def test_empty_ring_counts_an_underrun(open_streamer):
+    streamer = open_streamer(buffer_seconds=0.1)
+    wait_for(lambda: streamer.ring.writable() < 512)
+    streamer.close()  # Keeps the ring as it is
+    streamer.ring.read_index = streamer.ring.write_index
+    out = np.ones((64, 2), dtype=np.float32)
+    assert streamer.read_into(out) == 0 and not np.any(out)
+    assert streamer.underruns == 1
+
+def test_ring_is_smaller_than_the_file(open_streamer, audio):
+    streamer = open_streamer(buffer_seconds=0.1)
+    assert streamer.ring.capacity < FRAMES
+    np.testing.assert_array_equal(read(streamer, 2 * FRAMES), audio)
+
+def test_seek(open_streamer, audio):
+    streamer = open_streamer()
+    read(streamer, 1000)
+    written = buffered(streamer)
+    streamer.seek(0.25)
+    wait_for(lambda: streamer.ring.discard_index == written and streamer.end_index is not None)
+    np.testing.assert_array_equal(read(streamer, 300), audio[2000:2300])
+    assert streamer.position == 2300 / RATE
+
+def test_loop(open_streamer, audio):
+    streamer = open_streamer()
+    written = buffered(streamer)
+    streamer.set_loop(0.1, 0.2)
+    wait_for(lambda: streamer.ring.discard_index == written)
+    np.testing.assert_array_equal(read(streamer, 2500), np.tile(audio[800:1600], (4, 1))[:2500])
+    assert not streamer.finished
+
+def test_resamples_to_the_output_rate(open_streamer):
+    streamer = open_streamer(output_rate=2 * RATE)
+    data = read(streamer, 4 * FRAMES)
+    assert abs(len(data) - 2 * FRAMES) <= 2
+    assert streamer.position == pytest.approx(FRAMES / RATE, abs=2 / RATE)
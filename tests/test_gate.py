@@ -0,0 +1,80 @@
+import numpy as np
+
+from conftest import Scale
+from effects.base_effect import AudioEffect
+from effects.gate.gate_effect import NoiseGateEffect
+from signal_chain import SignalChain
+
+RATE = 44100
+BLOCK = 64
+
+class CountingEffect(AudioEffect):
+    def __init__(self):
+        super().__init__(RATE)
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+def make_chain():
+    chain = SignalChain(block_size=BLOCK, sample_rate=RATE, idle_stage='gate',
+                        idle_time=4 * BLOCK / RATE, resume_time=BLOCK / RATE)
+    gate = NoiseGateEffect(RATE, threshold=-40.0, hold=0.0, release=1.0)
+    amp = Scale(2.0)
+    effect = CountingEffect()
+    chain.add_stage('gate', gate, enabled=True)
+    chain.add_stage('amp', amp, enabled=True)
+    chain.add_stage('fx', effect, enabled=True)
+    return chain, gate, amp, effect
+
+def test_gate_closes_on_silence():
+    gate = NoiseGateEffect(RATE, threshold=-40.0, hold=0.0, release=1.0)
+    loud = np.full(BLOCK, 0.5, dtype=np.float32)
+    gate.process(loud)
+    assert gate.is_open and not gate.closed
+    quiet = np.zeros(BLOCK, dtype=np.float32)
+    for _ in range(8):
+        out = gate.process(quiet)
+    assert gate.closed and not np.any(out)
+
+def test_stages_behind_a_closed_gate_go_idle():
+    chain, gate, amp, _ = make_chain()
+    quiet = np.zeros(BLOCK, dtype=np.float32)
+    for _ in range(10):
+        chain.process(quiet)
+    assert chain.idle_state.idle
+    calls = amp.calls
+    for _ in range(5):
+        assert not np.any(chain.process(quiet))
+    assert amp.calls == calls
+
+def test_open_gate_resumes_with_reset_and_fade_in():
+    chain, gate, amp, effect = make_chain()
+    quiet = np.zeros(BLOCK, dtype=np.float32)
+    for _ in range(10):
+        chain.process(quiet)
+    resets = effect.resets
+    loud = np.full(BLOCK, 0.5, dtype=np.float32)
+    out = chain.process(loud).copy()
+    assert not chain.idle_state.idle
+    assert effect.resets == resets + 1
+    # Faded in from silence over resume_time
+    assert abs(out[0]) < abs(out[-1])
+    np.testing.assert_allclose(chain.process(loud), 2 * loud * gate.gain, rtol=1e-6)
+
+def test_disabled_gate_never_idles():
+    chain, gate, amp, _ = make_chain()
+    chain.set_enabled('gate', False)
+    quiet = np.zeros(BLOCK, dtype=np.float32)
+    for _ in range(10):
+        chain.process(quiet)
+    assert not chain.idle_state.idle
+    assert amp.calls >= 10
+
+def test_loud_signal_never_idles():
+    chain, _, amp, _ = make_chain()
+    loud = np.full(BLOCK, 0.5, dtype=np.float32)
+    for _ in range(10):
+        chain.process(loud)
+    assert not chain.idle_state.idle
+    assert amp.calls == 10
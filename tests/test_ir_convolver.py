@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from ir_convolver import IRSpectrumCache, PartitionedIRProcessor, load_ir
+
+RATE = 48000
+BLOCK = 128
+
+@pytest.fixture
+def cache(tmp_path):
+    return IRSpectrumCache(str(tmp_path / 'spectra'))
+
+def decaying_noise(rng, frames, channels):
+    envelope = np.exp(-np.arange(frames) / (frames / 5))[:, None]
+    return 0.5 * rng.standard_normal((frames, channels)) * envelope
+
+def run(processor, x, sizes):
+    channels = processor.output_channels
+    y = np.zeros((len(x),) if channels == 1 else (len(x), channels))
+    start = 0
+    while start < len(x):
+        for n in sizes:
+            block = x[start:start + n].astype(np.float32)
+            out = np.empty(block.shape[:1] + y.shape[1:], dtype=np.float32)
+            processor.process_into(block, out)
+            y[start:start + len(block)] = out
+            start += n
+    return y
+
+@pytest.mark.parametrize('ir_frames', [1, BLOCK, 1000])
+def test_matches_fftconvolve(rng, write_wav, cache, ir_frames):
+    path = write_wav('ir.wav', decaying_noise(rng, ir_frames, 1), RATE)
+    processor = PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+    assert processor.latency == 0
+    x = rng.standard_normal(3000)
+    y = run(processor, x, [BLOCK, 37, 1, 90])
+    reference = signal.fftconvolve(x, load_ir(path, RATE)[:, 0])[:len(x)]
+    np.testing.assert_allclose(y, reference, atol=1e-4)
+
+def test_resamples_the_ir(rng, write_wav, cache):
+    path = write_wav('ir.wav', decaying_noise(rng, 500, 1), 44100)
+    processor = PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+    x = rng.standard_normal(1000)
+    reference = signal.fftconvolve(x, load_ir(path, RATE)[:, 0])[:len(x)]
+    np.testing.assert_allclose(run(processor, x, [BLOCK]), reference, atol=1e-4)
+
+def test_stereo_ir_widens_mono_input(rng, write_wav, cache):
+    path = write_wav('ir.wav', decaying_noise(rng, 300, 2), RATE)
+    processor = PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+    assert processor.input_channels == 1 and processor.output_channels == 2
+    x = rng.standard_normal(700)
+    y = run(processor, x, [BLOCK, 50])
+    ir = load_ir(path, RATE)
+    for channel in range(2):
+        reference = signal.fftconvolve(x, ir[:, channel])[:len(x)]
+        np.testing.assert_allclose(y[:, channel], reference, atol=1e-4)
+
+def test_true_stereo_ir(rng, write_wav, cache):
+    path = write_wav('ir.wav', decaying_noise(rng, 300, 4), RATE)
+    processor = PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+    assert processor.input_channels == 2
+    x = rng.standard_normal((700, 2))
+    y = run(processor, x, [BLOCK, 50])
+    ir = load_ir(path, RATE)
+    left = signal.fftconvolve(x[:, 0], ir[:, 0]) + signal.fftconvolve(x[:, 1], ir[:, 2])
+    right = signal.fftconvolve(x[:, 0], ir[:, 1]) + signal.fftconvolve(x[:, 1], ir[:, 3])
+    np.testing.assert_allclose(y[:, 0], left[:len(x)], atol=1e-4)
+    np.testing.assert_allclose(y[:, 1], right[:len(x)], atol=1e-4)
+
+def test_unsupported_channel_count(rng, write_wav, cache):
+    path = write_wav('ir.wav', decaying_noise(rng, 100, 3), RATE)
+    with pytest.raises(ValueError):
+        PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+
+def test_reset_clears_the_tail(rng, write_wav, cache):
+    path = write_wav('ir.wav', decaying_noise(rng, 1000, 1), RATE)
+    processor = PartitionedIRProcessor(path, RATE, BLOCK, cache=cache)
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    first = processor.process(x)
+    processor.process(rng.standard_normal(200).astype(np.float32))
+    processor.reset()
+    np.testing.assert_array_equal(processor.process(x), first)
+
+def test_spectra_are_cached_in_memory_and_on_disk(rng, write_wav, cache, tmp_path):
+    path = write_wav('ir.wav', decaying_noise(rng, 1000, 1), RATE)
+    spectra = cache.get(path, RATE, BLOCK)
+    assert cache.get(path, RATE, BLOCK) is spectra
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 1
+
+    reloaded = IRSpectrumCache(str(tmp_path / 'spectra'))
+    np.testing.assert_array_equal(reloaded.get(path, RATE, BLOCK), spectra)
+    assert reloaded.stats()['disk_hits'] == 1 and reloaded.stats()['misses'] == 0
+    reloaded.get(path, RATE, 2 * BLOCK)
+    assert reloaded.stats()['misses'] == 1
@@ -0,0 +1,166 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import Scale
+import ir_convolver
+import model_cache
+from model_cache import ModelCache, ProcessFallback, with_process_into
+
+RATE = 48000
+BLOCK = 64
+
+@pytest.fixture(autouse=True)
+def spectra(tmp_path, monkeypatch):
+    # Keep partition spectra out of the user's cache directory
+    monkeypatch.setattr(ir_convolver, 'spectrum_cache',
+                        ir_convolver.IRSpectrumCache(str(tmp_path / 'spectra')))
+
+@pytest.fixture
+def cache():
+    cache = ModelCache()
+    yield cache
+    cache.shutdown()
+
+@pytest.fixture
+def ir_path(rng, write_wav):
+    return write_wav('cab.wav', 0.1 * rng.standard_normal(300), RATE)
+
+def test_hit_returns_the_cached_processor(cache, ir_path):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    assert isinstance(processor, ir_convolver.PartitionedIRProcessor)
+    assert cache.get_ir(ir_path, RATE, BLOCK, in_use=(processor,)) is processor
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert cache.get_ir(ir_path, RATE, 2 * BLOCK) is not processor
+
+def test_each_slot_gets_its_own_processor(cache, ir_path):
+    first = cache.get_ir(ir_path, RATE, BLOCK, slot='ir')
+    second = cache.get_ir(ir_path, RATE, BLOCK, slot='ir_b')
+    assert first is not second
+    assert cache.ir_key(ir_path, RATE, BLOCK, 'ir') != cache.ir_key(ir_path, RATE, BLOCK, 'ir_b')
+
+@pytest.fixture
+def counting(monkeypatch):
+    """Replace IR loading by Scale processors, prewarmed like real ones."""
+    def load(path, sample_rate, block_size):
+        processor = Scale()
+        processor.reset(sample_rate, block_size)
+        return processor
+
+    monkeypatch.setattr(model_cache, 'create_ir_processor', load)
+
+def test_preloaded_hit_is_not_reset_again(cache, ir_path, counting):
+    processor = cache.preload_ir(ir_path, RATE, BLOCK).result(timeout=5)
+    assert cache.get_ir(ir_path, RATE, BLOCK) is processor
+    assert processor.resets == 1
+
+def test_taken_processor_not_in_use_is_reset(cache, ir_path, counting):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    cache.get_ir(ir_path, RATE, BLOCK, in_use=(processor,))
+    assert processor.resets == 1
+    cache.get_ir(ir_path, RATE, BLOCK)
+    assert processor.resets == 2
+
+def test_released_processor_is_reset_on_the_loader_thread(cache, ir_path, counting):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    assert cache.release(processor).result(timeout=5) is True
+    assert processor.resets == 2
+    assert cache.get_ir(ir_path, RATE, BLOCK) is processor
+    assert processor.resets == 2
+    assert cache.release(object()) is None
+
+def test_hit_on_a_queued_release_resets_it_once(cache, ir_path, counting):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    busy = threading.Event()
+    cache.submit(busy.wait, 5)  # Holds the loader thread
+    future = cache.release(processor)
+    cache.get_ir(ir_path, RATE, BLOCK)
+    busy.set()
+    assert future.result(timeout=5) is None
+    assert processor.resets == 2
+
+def test_reset_clears_an_ir_processor(cache, ir_path):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    processor.process(np.ones(10, dtype=np.float32))
+    cache.get_ir(ir_path, RATE, BLOCK, in_use=(processor,))
+    assert processor.position == 10
+    cache.release(processor).result(timeout=5)
+    assert processor.position == 0 and not np.any(processor.window)
+
+def test_saved_file_is_loaded_again(cache, ir_path):
+    processor = cache.get_ir(ir_path, RATE, BLOCK)
+    stat = os.stat(ir_path)
+    os.utime(ir_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get_ir(ir_path, RATE, BLOCK) is not processor
+
+def test_missing_file(cache, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cache.get_ir(str(tmp_path / 'missing.wav'), RATE, BLOCK)
+
+def test_memory_budget_evicts_least_recently_used(cache, rng, write_wav):
+    paths = [write_wav(f'cab{i}.wav', 0.1 * rng.standard_normal(300), RATE) for i in range(3)]
+    size = os.path.getsize(paths[0])
+    cache.set_memory_budget(2 * size)
+    keys = [cache.ir_key(path, RATE, BLOCK) for path in paths]
+    for path in paths[:2]:
+        cache.get_ir(path, RATE, BLOCK)
+    cache.get_ir(paths[0], RATE, BLOCK)
+    cache.get_ir(paths[2], RATE, BLOCK)
+    assert [cache.contains(key) for key in keys] == [True, False, True]
+    assert cache.stats()['memory_used'] == 2 * size
+    # The most recent entry is kept even when it alone is over budget
+    cache.set_memory_budget(0)
+    assert [cache.contains(key) for key in keys] == [False, False, True]
+
+def test_preload_then_hit(cache, ir_path):
+    processor = cache.preload_ir(ir_path, RATE, BLOCK).result(timeout=5)
+    assert cache.get_ir(ir_path, RATE, BLOCK) is processor
+    assert cache.stats()['misses'] == 1
+
+def test_concurrent_requests_load_once(cache, ir_path, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def slow_load(path, sample_rate, block_size):
+        loads.append(path)
+        started.set()
+        release.wait(5)
+        return Scale()
+
+    monkeypatch.setattr(model_cache, 'create_ir_processor', slow_load)
+    future = cache.preload_ir(ir_path, RATE, BLOCK)
+    assert started.wait(5)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.get_ir(ir_path, RATE, BLOCK)))
+    waiter.start()
+    release.set()
+    waiter.join(5)
+    assert results == [future.result(timeout=5)]
+    assert len(loads) == 1
+
+def test_failed_load_is_not_cached(cache, ir_path, monkeypatch):
+    def broken(path, sample_rate, block_size):
+        raise RuntimeError('corrupt file')
+
+    monkeypatch.setattr(model_cache, 'create_ir_processor', broken)
+    with pytest.raises(RuntimeError):
+        cache.get_ir(ir_path, RATE, BLOCK)
+    assert not cache.contains(cache.ir_key(ir_path, RATE, BLOCK))
+
+def test_process_fallback():
+    class Legacy:
+        def process(self, input):
+            return input * 2
+
+    legacy = Legacy()
+    wrapped = with_process_into(legacy)
+    assert isinstance(wrapped, ProcessFallback)
+    out = np.empty(4, dtype=np.float32)
+    wrapped.process_into(np.arange(4, dtype=np.float32), out)
+    np.testing.assert_array_equal(out, [0, 2, 4, 6])
+    wrapped.reset(RATE, BLOCK)  # No reset on the processor: ignored
+    processor = ir_convolver.PartitionedIRProcessor
+    assert with_process_into(processor) is processor
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+
+from model_library import ModelLibrary, escape_like
+
+def make_library(tmp_path, write_nam, write_wav):
+    write_nam('models/plexi_50%.nam', metadata={'gear_model': 'Super Lead'})
+    write_nam('models/lstm_clean.nam', weights=np.zeros(10).tolist(), architecture='LSTM')
+    write_nam('models/plexi_500.nam', weights=np.zeros(5).tolist())
+    (tmp_path / 'models' / 'broken.nam').write_text('{not json')
+    os.makedirs(tmp_path / 'irs', exist_ok=True)
+    write_wav('irs/cab.wav', np.zeros((2400, 2), dtype=np.float32))
+    (tmp_path / 'irs' / 'readme.txt').write_text('')
+    return ModelLibrary(str(tmp_path / 'index' / 'library.sqlite'))
+
+def names(rows):
+    return [row['name'] for row in rows]
+
+def test_scan_indexes_models_and_irs(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    result = library.scan([str(tmp_path)], workers=1)
+    assert result == {'files': 5, 'indexed': 5, 'removed': 0, 'errors': 1}
+    cab, = library.query(kind='ir')
+    assert (cab['ir_frames'], cab['ir_channels'], cab['ir_seconds']) == (2400, 2, 0.05)
+    plexi, = library.query(text='Super Lead')
+    assert plexi['metadata'] == {'gear_model': 'Super Lead'} and plexi['num_layers'] == 2
+    assert names(library.query(include_errors=True, kind='nam')) == \
+        ['broken.nam', 'lstm_clean.nam', 'plexi_50%.nam', 'plexi_500.nam']
+    assert sorted((row['kind'], row['architecture'], row['count']) for row in library.stats()) == \
+        [('ir', None, 1), ('nam', 'LSTM', 1), ('nam', 'WaveNet', 2)]
+
+def test_queries_filter_in_the_index(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    library.scan([str(tmp_path)], workers=1)
+    assert names(library.query(architecture='lstm')) == ['lstm_clean.nam']
+    assert names(library.query(kind='nam', min_weights=5)) == ['lstm_clean.nam', 'plexi_500.nam']
+    assert names(library.query(kind='nam', max_weights=5)) == ['plexi_50%.nam', 'plexi_500.nam']
+    assert names(library.query(sample_rate=48000, limit=2)) == ['cab.wav', 'lstm_clean.nam']
+
+def test_text_search_is_literal(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    library.scan([str(tmp_path)], workers=1)
+    assert names(library.query(text='50%')) == ['plexi_50%.nam']
+    assert names(library.query(text='lstm_')) == ['lstm_clean.nam']
+    assert escape_like('a_b%c\\') == 'a\\_b\\%c\\\\'
+
+def test_rescan_reads_only_changed_files_and_prunes(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    library.scan([str(tmp_path)], workers=1)
+    assert library.scan([str(tmp_path)], workers=1)['indexed'] == 0
+    write_nam('models/plexi_500.nam', weights=np.zeros(7).tolist())
+    os.remove(tmp_path / 'models' / 'lstm_clean.nam')
+    result = library.scan([str(tmp_path)], workers=1)
+    assert (result['indexed'], result['removed']) == (1, 1)
+    assert [row['num_weights'] for row in library.query(text='plexi_500')] == [7]
+    assert library.query(architecture='LSTM') == []
+
+def test_the_index_persists(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    library.scan([str(tmp_path / 'irs')], workers=1)
+    reopened = ModelLibrary(library.db_path)
+    assert names(reopened.query()) == ['cab.wav']
+
+def test_parallel_scan_matches_serial(tmp_path, write_nam, write_wav):
+    library = make_library(tmp_path, write_nam, write_wav)
+    library.scan([str(tmp_path)], workers=2)
+    serial = ModelLibrary(str(tmp_path / 'serial.sqlite'))
+    serial.scan([str(tmp_path)], workers=1)
+
+    def entries(library):
+        return [{k: v for k, v in row.items() if k != 'indexed_at'}
+                for row in library.query(include_errors=True)]
+
+    assert entries(library) == entries(serial)
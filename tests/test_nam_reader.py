@@ -0,0 +1,56 @@
+import json
+import os
+
+import numpy as np
+
+from nam_reader import NAMReader
+
+def test_first_open_writes_the_cache(write_nam, tmp_path):
+    path = write_nam('amp.nam', metadata={'gear_make': 'Marshall'})
+    cache = str(tmp_path / 'cache')
+    reader = NAMReader(path, cache_dir=cache)
+    assert reader.architecture == 'WaveNet' and reader.sample_rate == 48000
+    assert reader.metadata == {'gear_make': 'Marshall'}
+    np.testing.assert_array_equal(reader.weights, [0.5, -0.25, 1.0])
+    assert sorted(name.split('.', 1)[1] for name in os.listdir(cache)) == ['float64.npy', 'json']
+
+def test_cached_open_parses_nothing_until_used(write_nam, tmp_path, monkeypatch):
+    path = write_nam('amp.nam')
+    cache = str(tmp_path / 'cache')
+    NAMReader(path, cache_dir=cache)
+
+    parsed = []
+    load = json.load
+
+    def counting_load(f):
+        parsed.append(f.name)
+        return load(f)
+
+    monkeypatch.setattr(json, 'load', counting_load)
+    reader = NAMReader(path, cache_dir=cache)
+    assert parsed == [] and reader._weights is None
+    assert isinstance(reader.weights, np.memmap) and not reader.weights.flags.writeable
+    assert reader.get_model_info() == {'version': '0.5.2', 'architecture': 'WaveNet',
+                                       'num_layers': 2, 'num_weights': 3}
+    assert reader.get_layer_info(1) == {'channels': 2}
+    assert len(parsed) == 1 and parsed[0].endswith('.json')
+
+def test_an_edited_model_gets_a_fresh_entry(write_nam, tmp_path):
+    path = write_nam('amp.nam')
+    cache = str(tmp_path / 'cache')
+    NAMReader(path, cache_dir=cache)
+    write_nam('amp.nam', weights=(1.0, 2.0, 3.0, 4.0))
+    np.testing.assert_array_equal(NAMReader(path, cache_dir=cache).weights, [1.0, 2.0, 3.0, 4.0])
+    assert len(os.listdir(cache)) == 4
+
+def test_dtypes_are_cached_apart(write_nam, tmp_path):
+    path = write_nam('amp.nam')
+    cache = str(tmp_path / 'cache')
+    assert NAMReader(path, cache_dir=cache, dtype=np.float32).weights.dtype == np.float32
+    assert NAMReader(path, cache_dir=cache).weights.dtype == np.float64
+
+def test_without_a_cache_dir_nothing_is_written(write_nam, tmp_path):
+    path = write_nam('amp.nam')
+    reader = NAMReader(path, cache_dir=None)
+    assert reader.version == '0.5.2' and len(reader.weights) == 3
+    assert os.listdir(tmp_path) == ['amp.nam']
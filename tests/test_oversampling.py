@@ -0,0 +1,101 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from conftest import Scale
+from oversampling import (BLOCKED_OUTPUTS, FIRST_STAGE_TAPS, LATER_STAGE_TAPS, HalfbandStage,
+                          OversampledStage, Oversampler, halfband_taps)
+
+BLOCK = 64
+
+def run(process, x, block=BLOCK):
+    return np.concatenate([process(x[start:start + block]).copy()
+                           for start in range(0, len(x), block)])
+
+@pytest.mark.parametrize('mode', ['minimum', 'linear'])
+def test_halfband_stage_matches_scipy(rng, mode):
+    taps = halfband_taps(47, mode)
+    x = rng.standard_normal(10 * BLOCK)
+    up = run(HalfbandStage(taps, BLOCK).upsample, x)
+    np.testing.assert_allclose(up, signal.upfirdn(2 * taps, x, 2)[:len(up)], atol=1e-12)
+    down = run(HalfbandStage(taps, BLOCK).downsample, up, 2 * BLOCK)
+    np.testing.assert_allclose(down, signal.upfirdn(taps, up, 1, 2)[:len(down)], atol=1e-12)
+
+@pytest.mark.parametrize('factor', [2, 4, 8])
+@pytest.mark.parametrize('mode', ['minimum', 'linear'])
+def test_round_trip_delays_a_low_sine_by_latency(factor, mode):
+    oversampler = Oversampler(factor, mode, BLOCK)
+    t = np.arange(64 * BLOCK)
+    x = np.sin(2 * np.pi * 0.01 * t)
+    y = run(lambda block: oversampler.downsample(oversampler.upsample(block)), x)
+    delayed = np.sin(2 * np.pi * 0.01 * (t - oversampler.latency))
+    np.testing.assert_allclose(y[512:], delayed[512:], atol=1e-3)
+
+@pytest.mark.parametrize('block', [BLOCK, 2 * BLOCKED_OUTPUTS])
+@pytest.mark.parametrize('mode', ['minimum', 'linear'])
+def test_oversampler_matches_a_cascade_of_halfband_stages(rng, mode, block):
+    x = rng.standard_normal((6 * block, 2))
+    oversampler = Oversampler(8, mode, block, channels=2)
+    stages = [HalfbandStage(halfband_taps(FIRST_STAGE_TAPS, mode), block, (2,)),
+              HalfbandStage(halfband_taps(LATER_STAGE_TAPS, mode), 2 * block, (2,)),
+              HalfbandStage(halfband_taps(LATER_STAGE_TAPS, mode), 4 * block, (2,))]
+
+    def cascade_up(x):
+        for stage in stages:
+            x = stage.upsample(x)
+        return x
+
+    def cascade_down(x):
+        for stage in reversed(stages):
+            x = stage.downsample(x)
+        return x
+
+    up = run(oversampler.upsample, x, block)
+    np.testing.assert_allclose(up, run(cascade_up, x, block), atol=1e-12)
+    np.testing.assert_allclose(run(oversampler.downsample, up, 8 * block),
+                               run(cascade_down, up, 8 * block), atol=1e-12)
+
+def test_stereo_matches_mono(rng):
+    x = rng.standard_normal((8 * BLOCK, 2))
+    stereo = Oversampler(4, 'minimum', BLOCK, channels=2)
+    up = run(stereo.upsample, x)
+    for channel in range(2):
+        mono = Oversampler(4, 'minimum', BLOCK)
+        np.testing.assert_allclose(up[:, channel], run(mono.upsample, x[:, channel]), atol=1e-12)
+
+def test_multichannel_oversampler_takes_mono(rng):
+    x = rng.standard_normal(BLOCK)
+    stereo = Oversampler(2, 'minimum', BLOCK, channels=2)
+    np.testing.assert_allclose(stereo.upsample(x), Oversampler(2, 'minimum', BLOCK).upsample(x))
+
+def test_rejects_unknown_factor_and_mode():
+    with pytest.raises(ValueError):
+        Oversampler(3)
+    with pytest.raises(ValueError):
+        Oversampler(2, 'maximum')
+
+def test_oversampled_stage_runs_at_the_high_rate():
+    stage = Scale(0.5)
+    oversampled = OversampledStage(stage, 48000, 4, 'linear', BLOCK)
+    assert stage.resets == 1 and oversampled.inner_rate == 192000
+    t = np.arange(32 * BLOCK)
+    x = np.sin(2 * np.pi * 0.01 * t)
+    y = np.empty_like(x)
+    oversampled.process_into(x, y)
+    delayed = 0.5 * np.sin(2 * np.pi * 0.01 * (t - oversampled.latency))
+    np.testing.assert_allclose(y[512:], delayed[512:], atol=1e-3)
+    assert stage.calls == len(x) // BLOCK
+
+def test_processing_does_not_allocate(rng):
+    oversampler = Oversampler(8, 'minimum', BLOCK, channels=2)
+    x = rng.standard_normal((BLOCK, 2))
+    for _ in range(3):
+        oversampler.downsample(oversampler.upsample(x))
+    tracemalloc.start()
+    for _ in range(10):
+        oversampler.downsample(oversampler.upsample(x))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 4096
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from param_queue import ParameterControl, ParameterQueue
+
+class Target:
+    def __init__(self):
+        self.level = 0.0
+        self.gain = 1.0
+
+def test_queue_drops_when_full():
+    queue = ParameterQueue(capacity=4)
+    assert all(queue.push(i, float(i)) for i in range(4))
+    assert not queue.push(4, 4.0)
+    queue.read_index += 1
+    assert queue.push(4, 4.0)
+    assert queue.ids[0] == 4 and queue.values[0] == 4.0
+
+def test_unpublished_entries_are_hidden():
+    queue = ParameterQueue()
+    queue.push(0, 1.0, publish=False)
+    queue.push(1, 2.0, publish=False)
+    assert queue.write_index == 0
+    queue.publish()
+    assert queue.write_index == 2
+
+def test_pushes_apply_immediately_while_offline():
+    control = ParameterControl()
+    target = Target()
+    control.register('level', target, 'level')
+    assert control.push('level', 0.5)
+    assert target.level == 0.5
+    assert not control.push('unknown', 1.0)
+
+def test_block_parameter_ramps_per_block():
+    control = ParameterControl(sample_rate=1000, ramp_time=0.1)
+    target = Target()
+    control.register('level', target, 'level')
+    control.realtime = True
+    control.push('level', 1.0)
+    assert target.level == 0.0  # Only the audio thread applies it
+    values = []
+    for _ in range(4):
+        control.begin_block(25)
+        values.append(target.level)
+        control.end_block()
+    assert values == pytest.approx([0.25, 0.5, 0.75, 1.0])
+    assert not control.active
+
+def test_per_sample_parameter_ramps_within_the_block():
+    control = ParameterControl(sample_rate=1000, ramp_time=0.01, max_block=32)
+    target = Target()
+    control.register('gain', target, 'gain', per_sample=True)
+    control.realtime = True
+    control.push('gain', 0.0)
+    control.begin_block(32)
+    ramp = target.gain
+    assert isinstance(ramp, np.ndarray) and len(ramp) == 32
+    np.testing.assert_allclose(ramp[:10], 1.0 - np.arange(1, 11) / 10)
+    assert np.all(ramp[10:] == 0.0)
+    control.end_block()
+    assert target.gain == 0.0
+
+def test_batch_takes_effect_in_one_block():
+    control = ParameterControl(sample_rate=1000, ramp_time=0.001)
+    first, second = Target(), Target()
+    control.register('first', first, 'level')
+    control.register('second', second, 'level')
+    control.realtime = True
+    control.begin_batch()
+    control.push('first', 1.0)
+    control.begin_batch()
+    control.push('second', 2.0)
+    control.end_batch()
+    control.begin_block(8)
+    assert first.level == 0.0 and second.level == 0.0
+    control.end_block()
+    control.end_batch()
+    control.begin_block(8)
+    assert first.level == 1.0 and second.level == 2.0
+    control.end_block()
+
+def test_full_queue_counts_dropped_changes():
+    control = ParameterControl(capacity=2)
+    control.register('level', Target(), 'level')
+    control.realtime = True
+    assert control.push('level', 1.0) and control.push('level', 2.0)
+    assert not control.push('level', 3.0)
+    assert control.dropped == 1
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import Scale
+from pipeline import BlockQueue, PipelineWorker
+from signal_chain import SignalChain
+
+BLOCK = 32
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.001)
+
+@pytest.fixture
+def worker():
+    worker = PipelineWorker('test', BLOCK)
+    yield worker
+    worker.close()
+
+def test_block_queue_is_bounded():
+    queue = BlockQueue(2, BLOCK)
+    for sequence in range(2):
+        slot = queue.write_slot(BLOCK, 2, sequence)
+        assert slot.shape == (BLOCK, 2) and slot.flags.c_contiguous
+        slot[...] = sequence
+        queue.publish()
+    assert queue.write_slot(BLOCK, 1, 2) is None
+    block, sequence = queue.read_slot()
+    assert sequence == 0 and not np.any(block)
+    queue.release()
+    assert queue.read_slot()[1] == 1
+
+def test_output_is_one_call_late(worker):
+    worker.configure(Scale(2.0).process_into, 1, BLOCK)
+    out = np.empty(BLOCK, dtype=np.float32)
+    blocks = [np.full(BLOCK, i + 1, dtype=np.float32) for i in range(4)]
+    worker.process_into(blocks[0], out)
+    assert not np.any(out)
+    for previous, block in zip(blocks, blocks[1:]):
+        wait_for(lambda: len(worker.outputs) == 1)
+        worker.process_into(block, out)
+        np.testing.assert_array_equal(out, 2 * previous)
+    assert worker.late == 0 and worker.latency == BLOCK
+
+def test_skip_silences_the_next_call(worker):
+    worker.configure(Scale(2.0).process_into, 1, BLOCK)
+    out = np.empty(BLOCK, dtype=np.float32)
+    block = np.ones(BLOCK, dtype=np.float32)
+    worker.process_into(block, out)
+    worker.skip()
+    wait_for(lambda: len(worker.inputs) == 0)
+    out.fill(1)
+    worker.process_into(block, out)
+    assert not np.any(out) and worker.late == 0
+
+def test_slow_worker_is_counted_late_without_blocking(worker):
+    release = threading.Event()
+
+    def slow(inp, out):
+        release.wait()
+        out[...] = inp
+
+    worker.configure(slow, 1, BLOCK)
+    out = np.empty(BLOCK, dtype=np.float32)
+    block = np.ones(BLOCK, dtype=np.float32)
+    start = time.monotonic()
+    for _ in range(3):
+        worker.process_into(block, out)
+        assert not np.any(out)
+    assert time.monotonic() - start < 0.5
+    assert worker.late == 2
+    release.set()
+
+def test_errors_are_kept_and_output_silence(worker):
+    def broken(inp, out):
+        raise RuntimeError('boom')
+
+    worker.configure(broken, 1, BLOCK)
+    out = np.empty(BLOCK, dtype=np.float32)
+    block = np.ones(BLOCK, dtype=np.float32)
+    worker.process_into(block, out)
+    wait_for(lambda: worker.errors == 1)
+    worker.process_into(block, out)
+    assert not np.any(out)
+    assert isinstance(worker.last_error, RuntimeError)
+
+def test_pipelined_stage_in_a_chain():
+    chain = SignalChain(block_size=BLOCK, pipelined=['amp'])
+    try:
+        chain.add_stage('amp', Scale(2.0), enabled=True)
+        assert chain.latency()[0] == BLOCK
+        blocks = [np.full(BLOCK, i + 1, dtype=np.float32) for i in range(4)]
+        chain.process(blocks[0])
+        for previous, block in zip(blocks, blocks[1:]):
+            wait_for(lambda: len(chain.workers['amp'].outputs) == 1)
+            np.testing.assert_array_equal(chain.process(block), 2 * previous)
+        # Bypassed, the dry path keeps the same one-call delay
+        chain.set_enabled('amp', False)
+        wait_for(lambda: len(chain.workers['amp'].outputs) == 1)
+        chain.process(blocks[0])
+        np.testing.assert_array_equal(chain.process(blocks[1]), blocks[0])
+        assert chain.pipeline_late() == 0
+    finally:
+        chain.close()
+    assert not chain.workers
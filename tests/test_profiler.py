@@ -0,0 +1,92 @@
+import csv
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from profiler import CallbackProfiler, LevelMeter
+
+RATE = 48000
+FRAMES = 480  # 10 ms
+
+def callback(profiler, stage_times, elapsed, status=None):
+    for stage, seconds in stage_times.items():
+        profiler.add(stage, seconds)
+    profiler.end_callback(elapsed, FRAMES, RATE, status)
+
+def test_stage_times_and_load():
+    profiler = CallbackProfiler()
+    gate, amp = profiler.stage_index('gate'), profiler.stage_index('amp')
+    assert profiler.stage_index('gate') == gate
+    callback(profiler, {gate: 100e-6, amp: 2e-3}, 5e-3)
+    callback(profiler, {gate: 300e-6, amp: 1e-3}, 2.5e-3)
+    snapshot = profiler.snapshot()
+    assert snapshot['callbacks'] == 2
+    assert snapshot['stages']['gate']['mean_us'] == pytest.approx(200.0)
+    assert snapshot['stages']['amp']['max_us'] == pytest.approx(2000.0)
+    assert snapshot['stages']['amp']['last_us'] == pytest.approx(1000.0)
+    assert snapshot['dsp_load']['peak'] == pytest.approx(0.5)
+    assert snapshot['dsp_load']['mean'] == pytest.approx(0.375)
+    assert snapshot['dsp_load']['last'] == pytest.approx(0.25)
+    assert profiler.heaviest_stage(snapshot) == ('amp', pytest.approx(1500.0))
+
+def test_percentiles_come_from_the_histograms():
+    profiler = CallbackProfiler()
+    stage = profiler.stage_index('amp')
+    for _ in range(99):
+        callback(profiler, {stage: 10e-6}, 1e-3)
+    callback(profiler, {stage: 10e-3}, 1e-3)
+    stats = profiler.snapshot()['stages']['amp']
+    # Twenty log bins per decade, reported at their upper edge
+    assert 10.0 <= stats['p50_us'] < 10.0 * 1.13
+    assert stats['p99_us'] < 100.0
+
+def test_xruns_are_counted_by_flag():
+    profiler = CallbackProfiler()
+    callback(profiler, {}, 1e-3, SimpleNamespace(output_underflow=True, input_overflow=False))
+    callback(profiler, {}, 1e-3, SimpleNamespace(output_underflow=True, input_overflow=True))
+    xruns = profiler.snapshot()['xruns']
+    assert xruns['output_underflow'] == 2 and xruns['input_overflow'] == 1
+    assert xruns['input_underflow'] == 0
+
+def test_reset_is_applied_by_the_next_callback():
+    profiler = CallbackProfiler()
+    stage = profiler.stage_index('amp')
+    callback(profiler, {stage: 1e-3}, 5e-3)
+    profiler.reset()
+    assert profiler.snapshot()['callbacks'] == 1
+    callback(profiler, {stage: 1e-3}, 5e-3)
+    snapshot = profiler.snapshot()
+    assert snapshot['callbacks'] == 0 and snapshot['stages']['amp']['count'] == 0
+    assert snapshot['dsp_load']['peak'] == 0.0
+
+def test_stages_past_the_limit_share_the_last_slot():
+    profiler = CallbackProfiler(max_stages=2)
+    assert [profiler.stage_index(name) for name in ('a', 'b', 'c')] == [0, 1, 1]
+
+def test_dump_writes_json_or_csv(tmp_path):
+    profiler = CallbackProfiler()
+    callback(profiler, {profiler.stage_index('amp'): 1e-3}, 2e-3)
+    profiler.dump(str(tmp_path / 'stats.json'))
+    assert json.loads((tmp_path / 'stats.json').read_text())['stages']['amp']['count'] == 1
+    profiler.dump(str(tmp_path / 'stats.csv'))
+    with open(tmp_path / 'stats.csv', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == 'stage' and rows[1][:2] == ['amp', '1']
+
+def test_level_meter():
+    meter = LevelMeter(max_samples=64)
+    block = np.zeros((16, 2), dtype=np.float32)
+    block[0, 0] = 0.5
+    meter.update(block)
+    assert meter.peak == pytest.approx(0.5)
+    assert meter.rms == pytest.approx(0.5 / np.sqrt(32))
+    assert meter.snapshot()['peak_db'] == pytest.approx(-6.02, abs=0.01)
+    meter.update(np.full(8, -1.0, dtype=np.float32))
+    assert meter.clips == 1
+    meter.update(np.zeros(128, dtype=np.float32))
+    assert meter.peak == 1.0  # Blocks larger than the scratch are skipped
+    meter.update(np.zeros(8, dtype=np.float32))
+    assert meter.snapshot() == {'peak_db': LevelMeter.FLOOR_DB, 'rms_db': LevelMeter.FLOOR_DB,
+                                'clips': 1}
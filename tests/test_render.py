@@ -0,0 +1,61 @@
+import numpy as np
+import soundfile as sf
+
+import render
+from effects.drive.drive_effect import DriveEffect
+
+RATE = 48000
+BLOCK = 256
+
+def config(states, params=None):
+    return {'effect_states': states, 'effect_params': params or {}, 'models': {}}
+
+def test_render_file_matches_the_effect(rng, write_wav, tmp_path):
+    params = {'drive': {'drive': 3.0, 'tone': 0.4, 'level': 0.9}}
+    dry = (rng.standard_normal(1000) * 0.3).astype(np.float32)
+    input_path = write_wav('di.wav', dry)
+    render._init_worker(config({'drive': True}, params), BLOCK)
+    stats = render.render_file(input_path, str(tmp_path / 'out.wav'))
+    assert stats['duration'] == len(dry) / RATE and stats['realtime_factor'] > 0
+
+    effect = DriveEffect(RATE, **params['drive'])
+    expected = np.concatenate([effect.process(dry[start:start + BLOCK])
+                               for start in range(0, len(dry), BLOCK)])
+    rendered, rate = sf.read(stats['output'], dtype='float32')
+    assert rate == RATE
+    np.testing.assert_allclose(rendered, expected, atol=1e-6)
+
+def test_stereo_input_is_folded_and_stereo_stages_write_two_channels(rng, write_wav, tmp_path):
+    dry = (rng.standard_normal((1000, 2)) * 0.3).astype(np.float32)
+    input_path = write_wav('di.wav', dry)
+    render._init_worker(config({'reverb': True}, {'reverb': {'mix': 0.0}}), BLOCK)
+    stats = render.render_file(input_path, str(tmp_path / 'out.wav'))
+    rendered, _ = sf.read(stats['output'], dtype='float32')
+    mono = dry.mean(axis=1)
+    np.testing.assert_allclose(rendered, np.column_stack((mono, mono)), atol=1e-6)
+
+def test_chains_are_kept_per_sample_rate(rng, write_wav, tmp_path):
+    render._init_worker(config({}), BLOCK)
+    first = write_wav('a.wav', np.zeros(100, dtype=np.float32), 44100)
+    second = write_wav('b.wav', np.zeros(100, dtype=np.float32), 44100)
+    render.render_file(first, str(tmp_path / 'a_out.wav'))
+    chain = render._worker_chains[44100]
+    render.render_file(second, str(tmp_path / 'b_out.wav'))
+    assert render._worker_chains == {44100: chain}
+
+def test_find_audio_files_walks_folders(tmp_path):
+    (tmp_path / 'takes').mkdir()
+    for name in ('takes/b.WAV', 'takes/a.flac', 'takes/notes.txt', 'c.ogg'):
+        (tmp_path / name).write_bytes(b'')
+    found = render.find_audio_files([str(tmp_path / 'takes'), str(tmp_path / 'c.ogg')])
+    assert [path.replace(str(tmp_path), '') for path in found] == \
+        ['/c.ogg', '/takes/a.flac', '/takes/b.WAV']
+
+def test_render_batch_writes_every_file(rng, write_wav, tmp_path):
+    inputs = [write_wav(f'take{i}.wav', (rng.standard_normal(500) * 0.3).astype(np.float32))
+              for i in range(2)]
+    results = render.render_batch(config({'drive': True}), inputs, str(tmp_path / 'out'),
+                                  block_size=BLOCK, workers=1)
+    assert sorted(r['output'] for r in results) == \
+        [str(tmp_path / 'out' / f'take{i}_reamp.wav') for i in range(2)]
+    assert all(sf.info(r['output']).frames == 500 for r in results)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from conftest import Scale
+from resampler import ResampledProcessor, StreamingResampler
+
+def stream(resampler, x, sizes):
+    outputs = []
+    start = 0
+    while start < len(x):
+        for n in sizes:
+            block = x[start:start + n]
+            if not len(block):
+                break
+            assert resampler.output_count(len(block)) <= resampler.max_output
+            outputs.append(resampler.process(block).copy())
+            start += n
+    return np.concatenate(outputs), start
+
+@pytest.mark.parametrize('in_rate, out_rate', [(44100, 48000), (48000, 44100), (48000, 96000)])
+def test_matches_one_shot_polyphase_filter(rng, in_rate, out_rate):
+    resampler = StreamingResampler(in_rate, out_rate, 256)
+    h = signal.firwin(resampler.up * resampler.taps, 0.9 / max(resampler.up, resampler.down),
+                      window=('kaiser', 8.6)) * resampler.up
+    x = rng.standard_normal(4000)
+    y, frames = stream(resampler, x, [256, 17, 100, 1, 200])
+    reference = signal.upfirdn(h, x[:frames], resampler.up, resampler.down)
+    np.testing.assert_allclose(y, reference[:len(y)], atol=1e-5)
+
+def test_output_count_tracks_the_ratio():
+    resampler = StreamingResampler(44100, 48000, 512)
+    total = sum(len(resampler.process(np.zeros(512))) for _ in range(441))
+    assert abs(total - 441 * 512 * 48000 / 44100) <= 1
+
+def test_stereo_matches_mono(rng):
+    x = rng.standard_normal((1000, 2))
+    stereo = StreamingResampler(44100, 48000, 128, channels=2)
+    y, _ = stream(stereo, x, [128, 50])
+    for channel in range(2):
+        mono, _ = stream(StreamingResampler(44100, 48000, 128), x[:, channel], [128, 50])
+        np.testing.assert_allclose(y[:, channel], mono, atol=1e-6)
+
+def test_reset_restarts_the_stream(rng):
+    resampler = StreamingResampler(44100, 48000, 64)
+    x = rng.standard_normal(64)
+    first = resampler.process(x).copy()
+    resampler.process(rng.standard_normal(37))
+    resampler.reset()
+    np.testing.assert_array_equal(resampler.process(x), first)
+
+def test_resampled_processor_keeps_block_length_and_delays_a_sine():
+    rate, inner_rate, block = 44100, 48000, 128
+    processor = ResampledProcessor(Scale(), rate, inner_rate, block)
+    t = np.arange(8192)
+    x = np.sin(2 * np.pi * 500 * t / rate)
+    y = np.empty_like(x)
+    for start in range(0, len(x), 100):
+        processor.process_into(x[start:start + 100], y[start:start + 100])
+    delayed = np.sin(2 * np.pi * 500 * (t - processor.latency) / rate)
+    np.testing.assert_allclose(y[1000:], delayed[1000:], atol=5e-3)
@@ -0,0 +1,79 @@
+import numpy as np
+
+from effects.base_effect import OnePoleFilter
+from effects.reverb.reverb_effect import ReverbEffect
+
+RATE = 48000
+
+def freeverb(effect, dry):
+    """Sample-by-sample Freeverb over the effect's own lines and gains."""
+    lengths = effect.lines.lengths
+    combs, half = effect.num_combs, effect.num_combs // 2
+    feedback = effect.room_size * 0.28 + 0.7
+    damp = effect.damping * 0.4
+    wet1 = effect.wet_gain * (effect.width / 2 + 0.5) * effect.mix
+    wet2 = effect.wet_gain * ((1 - effect.width) / 2) * effect.mix
+    buffers = [np.zeros(n) for n in lengths]
+    stores = np.zeros(combs)
+    out = np.zeros((len(dry), 2))
+    for t in range(len(dry)):
+        wet = [0.0, 0.0]
+        for i in range(combs):
+            pos = t % lengths[i]
+            read = buffers[i][pos]
+            stores[i] = read * (1 - damp) + stores[i] * damp
+            buffers[i][pos] = dry[t] * effect.input_gain + stores[i] * feedback
+            wet[i // half] += read
+        for line in range(combs, len(lengths)):
+            side = (line - combs) % 2
+            pos = t % lengths[line]
+            read = buffers[line][pos]
+            buffers[line][pos] = wet[side] + read * effect.allpass_feedback
+            wet[side] = read - wet[side]
+        for side in range(2):
+            out[t, side] = wet1 * wet[side] + wet2 * wet[1 - side] + (1 - effect.mix) * dry[t]
+    return np.clip(out, -1, 1)
+
+def run(effect, dry, sizes):
+    out = np.zeros((len(dry), 2), dtype=np.float32)
+    start, i = 0, 0
+    while start < len(dry):
+        n = sizes[i % len(sizes)]
+        effect.process_into(dry[start:start + n], out[start:start + n])
+        start, i = start + n, i + 1
+    return out
+
+def test_matches_sample_by_sample_freeverb(rng):
+    dry = (rng.standard_normal(3000) * 0.3).astype(np.float32)
+    effect = ReverbEffect(RATE, room_size=0.7, damping=0.4, mix=0.5, width=0.8)
+    effect.prepare(RATE, 512)
+    out = run(effect, dry, [512])
+    np.testing.assert_allclose(out, freeverb(effect, dry.astype(np.float64)), atol=1e-5)
+
+def test_output_does_not_depend_on_block_sizes(rng):
+    dry = (rng.standard_normal(4000) * 0.3).astype(np.float32)
+    whole = ReverbEffect(RATE)
+    whole.prepare(RATE, 4000)
+    expected = run(whole, dry, [4000])
+    split = ReverbEffect(RATE)
+    split.prepare(RATE, 4000)
+    np.testing.assert_allclose(run(split, dry, [1, 37, 244, 245, 1000]), expected, atol=1e-6)
+
+def test_reset_clears_the_tail(rng):
+    effect = ReverbEffect(RATE, mix=1.0)
+    effect.process((rng.standard_normal(2048) * 0.3).astype(np.float32))
+    effect.reset()
+    assert not np.any(effect.process(np.zeros(2048, dtype=np.float32)))
+
+def test_one_pole_filter_matches_the_recursion(rng):
+    x = rng.standard_normal((3, 200))
+    expected = np.zeros_like(x)
+    y = np.zeros(3)
+    for t in range(x.shape[1]):
+        y = 0.25 * x[:, t] + 0.75 * y
+        expected[:, t] = y
+    f = OnePoleFilter(3, 64)
+    out = np.zeros_like(x)
+    for start in range(0, 200, 64):
+        f.process(x[:, start:start + 64], out[:, start:start + 64], 0.75, 0.25)
+    np.testing.assert_allclose(out, expected, atol=1e-12)
@@ -0,0 +1,146 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from conftest import Scale
+from signal_chain import ParallelSplit, SignalChain, order_from_config, order_to_config
+
+BLOCK = 64
+
+def make_chain(**kwargs):
+    chain = SignalChain(block_size=BLOCK, **kwargs)
+    chain.add_stage('a', Scale(2.0), enabled=True)
+    chain.add_stage('b', Scale(3.0), enabled=True)
+    chain.add_stage('c', Scale(5.0), enabled=True)
+    return chain
+
+@pytest.mark.parametrize('crossfade', [True, False])
+def test_serial_stages(rng, crossfade):
+    chain = make_chain(crossfade_toggles=crossfade)
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    np.testing.assert_allclose(chain.process(x), 30 * x, rtol=1e-6)
+
+@pytest.mark.parametrize('crossfade', [True, False])
+def test_disabled_stage_is_bypassed(rng, crossfade):
+    chain = make_chain(crossfade_toggles=crossfade)
+    chain.set_enabled('b', False)
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    np.testing.assert_allclose(chain.process(x), 10 * x, rtol=1e-6)
+
+def test_live_toggle_crossfades(rng):
+    chain = SignalChain(block_size=BLOCK, toggle_time=BLOCK / 44100)
+    chain.add_stage('a', Scale(2.0), enabled=True)
+    chain.parameters.realtime = True
+    x = np.ones(BLOCK, dtype=np.float32)
+    chain.set_enabled('a', False)
+    ramp = chain.process(x).copy()
+    # From wet (2) to dry (1) over one block
+    assert ramp[0] > 1.9 and ramp[-1] == pytest.approx(1.0)
+    assert np.all(np.diff(ramp) <= 0)
+    np.testing.assert_array_equal(chain.process(x), x)
+
+def test_parallel_split(rng):
+    chain = SignalChain(block_size=BLOCK)
+    chain.add_stage('a', Scale(2.0), enabled=True)
+    chain.add_stage('b', Scale(3.0), enabled=True)
+    chain.set_order([ParallelSplit([[], ['a'], ['b']], gains=[1.0, 0.5, 0.25])])
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    np.testing.assert_allclose(chain.process(x), (1.0 + 1.0 + 0.75) * x, rtol=1e-6)
+
+def test_parallel_split_needs_one_gain_per_branch():
+    with pytest.raises(ValueError):
+        ParallelSplit([['a'], ['b']], gains=[1.0])
+
+def test_set_order_rejects_unknown_stages():
+    chain = make_chain()
+    with pytest.raises(ValueError):
+        chain.set_order(['a', 'missing'])
+    assert chain.order == ['a', 'b', 'c']
+
+def test_order_config_round_trip():
+    order = ['a', ParallelSplit([[], ['b', ParallelSplit([['c'], []], [0.5, 0.5])]], [1.0, 0.3])]
+    items = order_to_config(order)
+    assert items == order_to_config(order_from_config(items))
+    assert items[1] == {'parallel': [[], ['b', {'parallel': [['c'], []], 'gains': [0.5, 0.5]}]],
+                        'gains': [1.0, 0.3]}
+
+def test_large_blocks_are_split(rng):
+    chain = make_chain()
+    x = rng.standard_normal(3 * BLOCK + 5).astype(np.float32)
+    np.testing.assert_allclose(chain.process(x), 30 * x, rtol=1e-6)
+
+def test_output_buffer_is_reused(rng):
+    chain = make_chain()
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    first = chain.process(x)
+    assert chain.process(x) is first
+    assert chain.process(x[:10]).base is first
+
+def test_processing_does_not_allocate(rng):
+    chain = make_chain()
+    chain.set_order(['a', ParallelSplit([[], ['b']], [0.5, 0.5]), 'c'])
+    x = rng.standard_normal(BLOCK).astype(np.float32)
+    for _ in range(3):
+        chain.process(x)
+    tracemalloc.start()
+    for _ in range(20):
+        chain.process(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1024
+
+def test_latency_counts_enabled_stages():
+    chain = SignalChain(block_size=BLOCK)
+    chain.add_stage('a', Scale(latency=3), enabled=True)
+    chain.add_stage('b', Scale(latency=7), enabled=False)
+    chain.add_stage('c', Scale(latency=11), enabled=True)
+    assert chain.latency() == (14, {'a': 3, 'c': 11})
+
+def test_hot_swap_crossfades_without_rebuild():
+    chain = SignalChain(block_size=BLOCK, swap_time=BLOCK / 44100)
+    chain.add_stage('a', Scale(1.0), enabled=True)
+    chain.parameters.realtime = True
+    compiled = chain.compiled
+    x = np.ones(BLOCK, dtype=np.float32)
+    chain.set_stage('a', Scale(3.0))
+    assert chain.compiled is compiled
+    fade = chain.process(x)
+    assert fade[0] > 1.0 and fade[-1] == pytest.approx(3.0)
+    np.testing.assert_allclose(chain.process(x), 3 * x)
+    chain.collect_retired()
+    assert chain.slots['a'].processor.gain == 3.0 and chain.slots['a'].retired is None
+
+def test_processors_that_leave_the_chain_are_returned():
+    chain = SignalChain(block_size=BLOCK, swap_time=BLOCK / 44100)
+    old, new, newest = Scale(1.0), Scale(2.0), Scale(3.0)
+    chain.add_stage('a', old, enabled=True)
+    assert chain.set_stage('a', new) == [old]
+    chain.parameters.realtime = True
+    assert chain.set_stage('a', newest) == []
+    chain.process(np.ones(BLOCK, dtype=np.float32))
+    assert chain.collect_retired() == [new]
+
+def test_live_layout_change_leaves_the_running_slot_alone():
+    class Wide(Scale):
+        output_channels = 2
+
+        def process_into(self, input, output):
+            np.multiply(input[:, None], self.gain, out=output)
+
+    chain = SignalChain(block_size=BLOCK)
+    old = Scale(1.0)
+    chain.add_stage('a', old, enabled=True)
+    chain.parameters.realtime = True
+    running = chain.compiled
+    slot = chain.slots['a']
+    assert chain.set_stage('a', Wide(2.0)) == []
+    assert chain.compiled is not running
+    assert slot.processor is old and chain.slots['a'] is not slot
+    assert old in chain.slot_processors('a')
+    running.process(np.ones(BLOCK, dtype=np.float32))  # The callback is still on the old chain
+    assert chain.collect_retired() == []
+    x = np.ones(BLOCK, dtype=np.float32)
+    np.testing.assert_array_equal(chain.process(x), np.full((BLOCK, 2), 2.0))
+    assert chain.collect_retired() == [old]
+    assert old not in chain.slot_processors('a')